@@ -1,20 +1,38 @@
 from typing import Any, Dict, List, Optional, Literal, AsyncIterable
 from pydantic import BaseModel
+import asyncio
 import httpx
+import json
 
 from langchain_google_genai import ChatGoogleGenerativeAI
 
 from langgraph.prebuilt import create_react_agent
 from langgraph.checkpoint.memory import MemorySaver
-from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
 
 from app.core.config import settings
-from app.core.database import db, schema_manager
+from app.core.excel import XLSX_MEDIA_TYPE
 from app.core.models import QueryRequest, QueryResponse, SQLResultMessage
-from app.agents.database_agent.tools import get_database_schema, get_table_list, get_table_sample, run_custom_query
+from app.agents.database_agent.tools import (
+    REQUEST_TIMEOUT,
+    export_excel,
+    export_query,
+    find_joins,
+    get_column_stats,
+    get_database_schema,
+    get_table_list,
+    get_table_sample,
+    run_custom_query,
+    run_parameterized_query,
+    run_query_batch,
+    search_schema,
+)
 
 memory = MemorySaver()
 
+# Seconds between progress checks of a running Excel export
+EXCEL_POLL_INTERVAL = 2.0
+
 class DBAgentResponse(BaseModel):
     """Respond to the user in this format."""
     status: Literal["input_required", "completed", "error"] = "input_required"
@@ -24,10 +42,17 @@ class DBAgent:
     SYSTEM_INSTRUCTION = (
         "You are a database assistant specialized in interacting with relational databases. "
         "You can use the following tools to fulfill user requests:\n\n"
-        "- get_database_schema: Retrieve the overall database schema, including tables and their columns.\n"
+        "- get_database_schema: Retrieve the database schema as CREATE TABLE lines; pass table names to limit it to the tables you need.\n"
+        "- search_schema: Find the tables relevant to a question, with their CREATE TABLE lines. Start with it on large databases instead of retrieving the whole schema.\n"
+        "- find_joins: Get the join path between two or more tables with ON clauses and a FROM clause to build on. Use it instead of working out joins from foreign keys yourself.\n"
         "- get_table_list: Retrieve a list of all available tables in the database.\n"
         "- get_table_sample: Fetch a small sample of rows from a specific table (default limit is 5 rows).\n"
-        "- run_custom_query: Execute a custom SQL query provided by the user and return the results.\n\n"
+        "- get_column_stats: Get estimated row count, null fraction, distinct count, most common values and histogram bounds of a table's columns. Check it before probing values with DISTINCT or COUNT(*) queries.\n"
+        "- run_custom_query: Execute a custom SQL query provided by the user and return the results, 100 rows per page. Fetch further pages with next_page_token only when they are needed.\n"
+        "- run_parameterized_query: Execute a SQL template with :name placeholders and a dict of values. Prefer it whenever a query filters on literal values.\n"
+        "- run_query_batch: Run several small independent queries in one call, e.g. counts or distinct values of several tables. Prefer it over consecutive run_custom_query calls when exploring.\n"
+        "- export_query: Export all rows of a query as a CSV or Parquet file. Use it when the user asks to export or download data, and give them the returned uri instead of rows.\n"
+        "- export_excel: Write all rows of a query to an Excel workbook when the user asks for a spreadsheet, and give them the returned uri.\n\n"
         "Use these tools appropriately based on the user's intent. "
         "You must not attempt to answer questions beyond the scope of database exploration and query execution. "
         "If you need more information from the user to proceed, set the response status to 'input_required'. "
@@ -39,9 +64,16 @@ class DBAgent:
         self.model = ChatGoogleGenerativeAI(model="gemini-2.0-flash")
         self.tools = [
             get_database_schema,
+            search_schema,
+            find_joins,
             get_table_list,
             get_table_sample,
-            run_custom_query
+            get_column_stats,
+            run_custom_query,
+            run_parameterized_query,
+            run_query_batch,
+            export_query,
+            export_excel
         ]
         self.graph = create_react_agent(
             self.model, tools=self.tools, checkpointer=memory, prompt = self.SYSTEM_INSTRUCTION, response_format=DBAgentResponse
@@ -77,10 +109,16 @@ class DBAgent:
         current_state = self.graph.get_state(config)
         structured_response = current_state.values.get('structured_response')
         if structured_response and isinstance(structured_response, DBAgentResponse):
+            exports = self.get_exports(current_state)
+            async for progress in self.track_excel(exports):
+                yield progress
+            failures = "".join(f"\n\nExcel export failed: {export['error']}"
+                               for export in exports if export.get("state") == "failed")
             yield {
                 "is_task_complete": True if structured_response.status == "completed" else False,
                 "require_user_input": structured_response.status == "input_required",
-                "content": structured_response.message,
+                "content": structured_response.message + failures,
+                "files": self.file_parts(exports),
             }
         else:
             yield {
@@ -110,7 +148,8 @@ class DBAgent:
                 return {
                     "is_task_complete": True,
                     "require_user_input": False,
-                    "content": structured_response.message
+                    "content": structured_response.message,
+                    "files": self.file_parts(self.get_exports(current_state)),
                 }
 
         return {
@@ -119,4 +158,65 @@ class DBAgent:
             "content": "We are unable to process your request at the moment. Please try again.",
         }
 
+    def get_exports(self, state):
+        """Results of export_query and export_excel calls since the last user message"""
+        exports = []
+        for message in reversed(state.values.get("messages", [])):
+            if isinstance(message, HumanMessage):
+                break
+            if not isinstance(message, ToolMessage) or message.name not in ("export_query", "export_excel"):
+                continue
+            try:
+                export = json.loads(message.content)
+            except (TypeError, ValueError):
+                continue
+            if isinstance(export, dict) and "uri" in export:
+                exports.append(export)
+        return exports[::-1]
+
+    async def track_excel(self, exports):
+        """
+        Wait for the Excel exports among exports, yielding progress updates
+
+        Each export's "state", "rows" and "error" are updated in place.
+        """
+        pending = [export for export in exports if "excel_id" in export]
+        last = None
+        async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as client:
+            while pending:
+                for export in pending:
+                    try:
+                        status = (await client.get(export["status_uri"])).json()
+                    except Exception as e:
+                        status = {"error": str(e)}
+                    export.update(state=status.get("state", "failed"), rows=status.get("rows", 0),
+                                  sheets=status.get("sheets", 0), error=status.get("error"))
+                pending = [export for export in pending if export["state"] == "running"]
+                if not pending:
+                    break
+                content = "Writing Excel file: " + ", ".join(
+                    f"{export['rows']:,} rows in {export['sheets']} sheet(s)" for export in pending)
+                if content != last:
+                    yield {
+                        "is_task_complete": False,
+                        "require_user_input": False,
+                        "content": content,
+                    }
+                    last = content
+                await asyncio.sleep(EXCEL_POLL_INTERVAL)
+
+    @staticmethod
+    def file_parts(exports):
+        """A2A file parts linking to the exports, leaving out failed ones"""
+        files = []
+        for export in exports:
+            if export.get("state") == "failed":
+                continue
+            if "excel_id" in export:
+                name, mime_type = f"export-{export['excel_id']}.xlsx", XLSX_MEDIA_TYPE
+            else:
+                name, mime_type = f"export-{export['export_id']}.{export['format']}", export["media_type"]
+            files.append({"type": "file", "file": {"name": name, "mimeType": mime_type, "uri": export["uri"]}})
+        return files
+
     SUPPORTED_CONTENT_TYPES = ["text", "text/plain"]
@@ -63,7 +63,7 @@ class AgentTaskManager(InMemoryTaskManager):
                     end_stream = True
                 else:
                     task_state = TaskState.COMPLETED
-                    artifact = Artifact(parts=parts, index=0, append=False)
+                    artifact = Artifact(parts=parts + item.get("files", []), index=0, append=False)
                     end_stream = True
 
                 task_status = TaskStatus(state=task_state, message=message)
@@ -194,7 +194,7 @@ class AgentTaskManager(InMemoryTaskManager):
             )
         else:
             task_status = TaskStatus(state=TaskState.COMPLETED)
-            artifact = Artifact(parts=parts)
+            artifact = Artifact(parts=parts + agent_response.get("files", []))
         task = await self.update_store(
             task_id, task_status, None if artifact is None else [artifact]
         )
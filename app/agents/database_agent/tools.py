@@ -1,14 +1,19 @@
-from typing import Any
+from typing import Any, Dict, List, Literal, Optional
 from langchain_core.tools import tool
 import httpx
 from app.core.config import settings
+from app.core.models import ExcelRequestMessage
 BASE_URL = settings.BASE_URL
+# Seconds a tool waits on the backend; queries are given the same statement timeout
+REQUEST_TIMEOUT = 5.0
+# Rows per page handed back to the model; later pages are fetched only on request
+QUERY_PAGE_SIZE = 100
 
 
 def request_helper(method: str, endpoint: str, **kwargs) -> Any:
     url = f"{BASE_URL}{endpoint}"
     try:
-        with httpx.Client(timeout=5.0) as client:
+        with httpx.Client(timeout=REQUEST_TIMEOUT) as client:
             if method.lower() == "get":
                 response = client.get(url, **kwargs)
             elif method.lower() == "post":
@@ -21,9 +26,25 @@ def request_helper(method: str, endpoint: str, **kwargs) -> Any:
         return {"error": str(e)}
 
 @tool
-def get_database_schema() -> Any:
-    """Fetch the full database schema."""
-    return request_helper("get", "/api/schema")
+def get_database_schema(tables: Optional[List[str]] = None) -> Any:
+    """Fetch the database schema as CREATE TABLE lines, optionally only for the given tables."""
+    params = {"tables": tables or []}
+    if settings.SCHEMA_TEXT_MAX_TOKENS:
+        params["max_tokens"] = settings.SCHEMA_TEXT_MAX_TOKENS
+    return request_helper("get", "/api/schema/text", params=params)
+
+@tool
+def search_schema(question: str, limit: int = 10) -> Any:
+    """Find the tables most relevant to a question or keywords, ranked by how well their names, columns, comments and related tables match, together with their CREATE TABLE lines. Use it first on large databases instead of fetching the whole schema."""
+    params = {"q": question, "limit": limit}
+    if settings.SCHEMA_TEXT_MAX_TOKENS:
+        params["max_tokens"] = settings.SCHEMA_TEXT_MAX_TOKENS
+    return request_helper("get", "/api/schema/search", params=params)
+
+@tool
+def find_joins(tables: List[str]) -> Any:
+    """Find how to join the given tables along foreign keys: returns the join tree with ON clauses and a ready FROM clause, adding intermediate tables where needed. The first table is the root."""
+    return request_helper("get", "/api/joins", params={"tables": tables})
 
 @tool
 def get_table_list() -> Any:
@@ -32,12 +53,63 @@ def get_table_list() -> Any:
 
 @tool
 def get_table_sample(table_name: str, limit: int = 5) -> Any:
-    """Get a sample of rows from a specific table."""
+    """Get a random sample of rows from a specific table."""
     return request_helper(
         "get",
         f"/api/sample/{table_name}?limit={limit}")
 
 @tool
-def run_custom_query(sql_query: str) -> Any:
-    """Run a custom SQL query against the database."""
-    return request_helper("post", "/api/query", json={"query": sql_query})
\ No newline at end of file
+def get_column_stats(table_name: str, columns: Optional[List[str]] = None) -> Any:
+    """Get the planner statistics of a table's columns: estimated row count, null fraction, number of distinct values, most common values with their frequencies and histogram bounds. Use it instead of SELECT DISTINCT or COUNT(*) probes to learn which values a column holds before writing a filter. Figures are estimates from the last ANALYZE."""
+    return request_helper("get", f"/api/stats/{table_name}", params={"columns": columns or []})
+
+@tool
+def run_custom_query(sql_query: str, page_token: Optional[str] = None) -> Any:
+    """Run a custom SQL query against the database. Returns up to 100 rows; if next_page_token is set, call again with the same query and that token for more rows."""
+    return request_helper(
+        "post",
+        "/api/query",
+        json={"query": sql_query, "format": "columnar", "page_size": QUERY_PAGE_SIZE,
+              "page_token": page_token, "cache": True, "timeout": REQUEST_TIMEOUT})
+
+@tool
+def run_parameterized_query(sql_template: str, params: Dict[str, Any], page_token: Optional[str] = None) -> Any:
+    """Run a SQL query with :name placeholders bound to params, e.g. "SELECT * FROM orders WHERE customer_id = :customer_id" with {"customer_id": 42}. Prefer this over inlining values: the same template with different values is planned only once. For dates, times, timestamps, decimals and UUIDs pass a typed value, e.g. {"since": {"type": "date", "value": "2024-01-01"}} for created_at >= :since; type is one of date, datetime, time, interval (seconds), decimal, uuid. Returns up to 100 rows; if next_page_token is set, call again with the same template, params and that token for more rows."""
+    return request_helper(
+        "post",
+        "/api/query",
+        json={"query": sql_template, "params": params, "format": "columnar", "page_size": QUERY_PAGE_SIZE,
+              "page_token": page_token, "cache": True, "timeout": REQUEST_TIMEOUT})
+
+@tool
+def run_query_batch(sql_queries: List[str], consistent: bool = False) -> Any:
+    """Run several independent read queries at once, e.g. row counts of a few tables or distinct values of a few columns, in one call instead of one run_custom_query call each. Keep each query small (aggregates or a LIMIT). Set consistent to true when the results must agree with each other, so all queries see the same snapshot of the data. Returns one entry per query, in order, with its result or error."""
+    return request_helper(
+        "post",
+        "/api/query/batch",
+        json={"queries": [{"query": query} for query in sql_queries], "format": "columnar",
+              "snapshot": consistent, "timeout": REQUEST_TIMEOUT})
+
+@tool
+def export_query(sql_query: str, file_format: Literal["csv", "parquet"] = "csv",
+                 params: Optional[Dict[str, Any]] = None) -> Any:
+    """Export every row of a read-only SQL query as a CSV or Parquet file. Use it when the user wants the data itself (e.g. "export all orders") rather than an answer. Returns a download uri for the user instead of rows; the file is produced when the uri is opened."""
+    result = request_helper(
+        "post",
+        "/api/export",
+        json={"query": sql_query, "params": params, "format": file_format})
+    if "uri" in result:
+        result["uri"] = f"{BASE_URL}{result['uri']}"
+    return result
+
+@tool
+def export_excel(sql_query: str, request: str, sheet_name: Optional[str] = None,
+                 params: Optional[Dict[str, Any]] = None) -> Any:
+    """Write every row of a read-only SQL query to an Excel workbook; request is the user's request in their words. The workbook is written in the background and large results continue on further sheets. Returns the download uri to give the user."""
+    message = ExcelRequestMessage(query=request, sql_query=sql_query, params=params,
+                                  format_options={"sheet_name": sheet_name} if sheet_name else None)
+    result = request_helper("post", "/api/excel", json=message.model_dump(exclude_none=True))
+    for key in ("uri", "status_uri"):
+        if key in result:
+            result[key] = f"{BASE_URL}{result[key]}"
+    return result
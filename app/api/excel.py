@@ -0,0 +1,70 @@
+import asyncio
+from fastapi import APIRouter
+from fastapi.responses import FileResponse, JSONResponse
+from app.core.config import settings
+from app.core.database import async_db
+from app.core.excel import EXCEL_MAX_ROWS, XLSX_MEDIA_TYPE, ExcelJobs, WorkbookWriter
+from app.core.models import ExcelRequestMessage
+from app.core.sql import is_read_only
+
+router = APIRouter()
+
+jobs = ExcelJobs(settings.EXCEL_OUTPUT_DIR, settings.EXPORT_TTL)
+
+@router.post("/excel", summary="Start writing a query result to an Excel workbook")
+async def create_excel(request: ExcelRequestMessage):
+    """
+    Start an Excel export and return its status and download URIs
+
+    Rows are streamed from sql_query (or taken from result when given) in
+    the background; poll the status URI for progress.
+
+    format_options:
+        sheet_name: title of the first sheet (default "Result")
+        max_rows_per_sheet: rows per sheet, header included, before the
+            rest continues on a new sheet (default and upper bound: Excel's limit)
+    """
+    if request.result is None and not is_read_only(request.sql_query):
+        return {"error": "Only read-only statements can be exported"}
+    options = request.format_options or {}
+    try:
+        excel_id, job = jobs.create(request.sql_query)
+    except Exception as e:
+        return {"error": str(e)}
+    try:
+        writer = WorkbookWriter(job.path,
+                                sheet_name = options.get("sheet_name") or "Result",
+                                max_rows   = options.get("max_rows_per_sheet") or EXCEL_MAX_ROWS)
+    except Exception as e:
+        job.fail(e)
+        return {"excel_id": excel_id, **excel_uris(excel_id), **job.status()}
+    if request.result is None:
+        batches = async_db.stream_query(request.sql_query, request.params, timeout=settings.EXPORT_TIMEOUT,
+                                        operation="excel")
+    else:
+        batches = given_batches(request.result, settings.QUERY_STREAM_BATCH_SIZE)
+    job.task = asyncio.create_task(job.run(writer, batches))
+    return {"excel_id": excel_id, **excel_uris(excel_id), **job.status()}
+
+async def given_batches(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+def excel_uris(excel_id):
+    return {"status_uri": f"/api/excel/{excel_id}", "uri": f"/api/excel/{excel_id}/download"}
+
+@router.get("/excel/{excel_id}", summary="Get the progress of an Excel export")
+async def get_excel_status(excel_id: str):
+    job = jobs.get(excel_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown or expired Excel export"}, status_code=404)
+    return {"excel_id": excel_id, **excel_uris(excel_id), **job.status()}
+
+@router.get("/excel/{excel_id}/download", summary="Download a finished Excel export")
+async def download_excel(excel_id: str):
+    job = jobs.get(excel_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown or expired Excel export"}, status_code=404)
+    if job.state != "completed":
+        return JSONResponse({"error": f"Excel export is {job.state}", **job.status()}, status_code=409)
+    return FileResponse(job.path, media_type=XLSX_MEDIA_TYPE, filename=f"export-{excel_id}.xlsx")
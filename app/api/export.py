@@ -0,0 +1,64 @@
+from typing import Any, Dict, Literal, Optional
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from app.api.query import cancel_on_disconnect, prepend
+from app.core.config import settings
+from app.core.database import async_db
+from app.core.export import ExportJob, ExportRegistry
+from app.core.guard import QueryRejected
+from app.core.sql import is_read_only
+
+router = APIRouter()
+
+exports = ExportRegistry(settings.EXPORT_TTL)
+
+class ExportRequest(BaseModel):
+    query: str
+    params: Optional[Dict[str, Any]] = None
+    format: Literal["csv", "parquet"] = "csv"
+    timeout: Optional[float] = None
+
+@router.post("/export", summary="Register a query for bulk export and get its download URI")
+async def create_export(request: ExportRequest):
+    """
+    Check a read-only statement and return the URI that streams its rows
+
+    Nothing runs until the URI is downloaded. Exports are meant for large
+    results, so the cost guard reports its estimate without enforcing it.
+    """
+    if not is_read_only(request.query):
+        return {"error": "Only read-only statements can be exported"}
+    try:
+        try:
+            decision = await async_db.guard_query(request.query, request.params, inject_limit=False)
+        except QueryRejected as e:
+            decision = e.decision
+        if decision["action"] == "unchecked" and "reason" in decision:
+            return {"error": decision["reason"]}
+        job = ExportJob(request.query, request.params, request.format, request.timeout)
+        export_id = exports.put(job)
+        return {
+            "export_id"     : export_id,
+            "uri"           : f"/api/export/{export_id}",
+            "format"        : job.format,
+            "media_type"    : job.media_type,
+            "expires_in"    : exports.ttl,
+            "estimated_rows": decision.get("estimated_rows"),
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
+@router.get("/export/{export_id}", summary="Download a registered export")
+async def download_export(export_id: str, http_request: Request):
+    job = exports.get(export_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown or expired export"}, status_code=404)
+    try:
+        chunks = async_db.export_query(job.query, job.params, export_format=job.format, timeout=job.timeout)
+        # Run the statement before committing to a 200 so SQL errors keep the usual shape
+        first = await cancel_on_disconnect(http_request, anext(chunks, b""))
+    except Exception as e:
+        return {"error": str(e)}
+    headers = {"Content-Disposition": f'attachment; filename="export-{export_id}.{job.format}"'}
+    return StreamingResponse(prepend(first, chunks), media_type=job.media_type, headers=headers)
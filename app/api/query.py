@@ -1,16 +1,206 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
-from app.core.database import db
+import asyncio
+import time
+from typing import Any, Dict, List, Literal, Optional
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, field_validator
+from starlette.requests import ClientDisconnect
+from app.core.database import async_db
+from app.core.guard import QueryRejected
+from app.core.pagination import decode_params
+from app.core.serialization import (
+    ARROW_MEDIA_TYPE,
+    ResultResponse,
+    dumps,
+    encode_json_array,
+    encode_json_columnar,
+    encode_ndjson,
+    encode_ndjson_columnar,
+    to_arrow_ipc,
+)
 
 router = APIRouter()
 
+# Rows per page when only a page_token is given
+DEFAULT_PAGE_SIZE = 100
+
 class QueryRequest(BaseModel):
     query: str
+    # Values for :name placeholders in query; they are bound, never inlined.
+    # {"type": "date", "value": "2024-01-01"} binds a typed value (see decode_params)
+    params: Optional[Dict[str, Any]] = None
+    format: Literal["rows", "columnar", "arrow"] = "rows"
+    stream: bool = False
+    stream_format: Literal["ndjson", "json"] = "ndjson"
+    batch_size: Optional[int] = None
+    cache: bool = False
+    timeout: Optional[float] = None
+    page_size: Optional[int] = None
+    page_token: Optional[str] = None
+    guard: bool = True
+
+    @field_validator("params")
+    @classmethod
+    def typed_params(cls, params):
+        return decode_params(params)
+
+class BatchStatement(BaseModel):
+    query: str
+    params: Optional[Dict[str, Any]] = None
+
+    @field_validator("params")
+    @classmethod
+    def typed_params(cls, params):
+        return decode_params(params)
+
+class BatchQueryRequest(BaseModel):
+    queries: List[BatchStatement]
+    format: Literal["rows", "columnar"] = "rows"
+    timeout: Optional[float] = None
+    guard: bool = True
+    # Run every statement read-only in one snapshot, so they see the same data
+    snapshot: bool = False
+
+@router.post("/query", summary="Run a custom SQL query", response_class=ResultResponse)
+async def run_query(request: QueryRequest, http_request: Request):
+    if request.stream:
+        return await stream_query(request, http_request)
+    if request.page_size or request.page_token:
+        return await page_query(request, http_request)
+    result_format = "columnar" if request.format == "arrow" else request.format
+    try:
+        query, decision = await guard_query(request, inject_limit=True)
+        result = await cancel_on_disconnect(http_request, async_db.execute_query(
+            query, request.params, result_format=result_format, use_cache=request.cache, timeout=request.timeout))
+        if request.format == "arrow":
+            return Response(content=to_arrow_ipc(result), media_type=ARROW_MEDIA_TYPE,
+                            headers=guard_headers(decision))
+        return ResultResponse({"result": result, **guard_metadata(decision)})
+    except QueryRejected as e:
+        return {"error": str(e), "guard": e.decision}
+    except Exception as e:
+        return {"error": str(e)}
 
-@router.post("/query", summary="Run a custom SQL query")
-def run_query(request: QueryRequest):
+@router.post("/query/batch", summary="Run independent SQL queries concurrently", response_class=ResultResponse)
+async def run_batch(request: BatchQueryRequest, http_request: Request):
+    """
+    Run every statement on its own pooled connection, a few at a time
+
+    Results come back in request order, each with its index, elapsed_ms and
+    either result or error; one failing statement does not fail the batch.
+    """
+    started = time.perf_counter()
     try:
-        result = db.execute_query(request.query)
-        return {"result": result}
+        results = await cancel_on_disconnect(http_request, async_db.execute_batch(
+            [(statement.query, statement.params) for statement in request.queries],
+            result_format=request.format, timeout=request.timeout, guard=request.guard, snapshot=request.snapshot))
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+    return ResultResponse({"results": results, "elapsed_ms": round((time.perf_counter() - started) * 1000, 3)})
+
+async def guard_query(request: QueryRequest, inject_limit: bool):
+    """
+    Run the cost guard unless the request opted out
+
+    Returns:
+        (query to execute, guard decision or None)
+    """
+    if not request.guard:
+        return request.query, None
+    decision = await async_db.guard_query(request.query, request.params, inject_limit=inject_limit)
+    if decision["query"] == request.query:
+        del decision["query"]
+        return request.query, decision
+    return decision["query"], decision
+
+def guard_metadata(decision):
+    return {"guard": decision} if decision else {}
+
+def guard_headers(decision):
+    """Guard decision without the plan, for responses whose body is not JSON"""
+    if not decision:
+        return {}
+    return {"X-Query-Guard": dumps({k: v for k, v in decision.items() if k != "plan"})}
+
+async def page_query(request: QueryRequest, http_request: Request):
+    """One page of rows plus next_page_token; send it back with the same query for the next page"""
+    result_format = "columnar" if request.format == "arrow" else request.format
+    try:
+        # Pages are bounded already, so the guard only checks the first one and adds no LIMIT
+        decision = None
+        if not request.page_token:
+            _, decision = await guard_query(request, inject_limit=False)
+        result, token = await cancel_on_disconnect(http_request, async_db.execute_page(
+            request.query, request.params, page_size=request.page_size or DEFAULT_PAGE_SIZE, page_token=request.page_token,
+            result_format=result_format, use_cache=request.cache, timeout=request.timeout))
+        if request.format == "arrow":
+            headers = guard_headers(decision)
+            if token:
+                headers["X-Next-Page-Token"] = token
+            return Response(content=to_arrow_ipc(result), media_type=ARROW_MEDIA_TYPE, headers=headers)
+        return ResultResponse({"result": result, "next_page_token": token, **guard_metadata(decision)})
+    except QueryRejected as e:
+        return {"error": str(e), "guard": e.decision}
+    except Exception as e:
+        return {"error": str(e)}
+
+async def cancel_on_disconnect(request: Request, coroutine):
+    """
+    Await a query, cancelling it if the client disconnects first
+
+    Cancelling the task makes the database cancel the statement on the
+    server, so abandoned queries stop holding a connection.
+    """
+    task = asyncio.ensure_future(coroutine)
+    watcher = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            raise ClientDisconnect()
+    return task.result()
+
+async def wait_for_disconnect(request: Request):
+    # The body has been read already, so the next message is the disconnect
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+@router.get("/query/cache", summary="Get query result cache statistics")
+async def get_cache_stats():
+    return async_db.cache.stats()
+
+async def stream_query(request: QueryRequest, http_request: Request):
+    if request.format == "arrow":
+        return JSONResponse({"error": "Arrow results are not streamed; use format=columnar or drop stream"},
+                            status_code=400)
+    try:
+        # Streams are meant for large results: the guard checks the cost but adds no LIMIT
+        _, decision = await guard_query(request, inject_limit=False)
+        batches = async_db.stream_query(request.query, request.params, batch_size=request.batch_size, use_cache=request.cache,
+                                        timeout=request.timeout)
+        # Run the statement before committing to a 200 so SQL errors keep the usual shape
+        first = await cancel_on_disconnect(http_request, anext(batches, []))
+    except QueryRejected as e:
+        return {"error": str(e), "guard": e.decision}
+    except Exception as e:
+        return {"error": str(e)}
+
+    batches = prepend(first, batches)
+    headers = guard_headers(decision)
+    if request.stream_format == "json":
+        encoder = encode_json_columnar if request.format == "columnar" else encode_json_array
+        return StreamingResponse(encoder(batches), media_type="application/json", headers=headers)
+    if request.format == "columnar":
+        return StreamingResponse(encode_ndjson_columnar(batches), media_type="application/x-ndjson", headers=headers)
+    return StreamingResponse(encode_ndjson(batches), media_type="application/x-ndjson", headers=headers)
+
+async def prepend(first, batches):
+    yield first
+    async for batch in batches:
+        yield batch
@@ -1,12 +1,17 @@
-from fastapi import APIRouter
-from app.core.database import schema_manager
+from typing import Literal
+from fastapi import APIRouter, Response
+from app.core.database import async_schema_manager
+from app.core.serialization import ARROW_MEDIA_TYPE, ResultResponse, to_arrow_ipc
 
 router = APIRouter()
 
-@router.get("/sample/{table_name}", summary="Get sample data of a table")
-def get_table_sample(table_name: str, limit: int = 5):
+@router.get("/sample/{table_name}", summary="Get sample data of a table", response_class=ResultResponse)
+async def get_table_sample(table_name: str, limit: int = 5, format: Literal["rows", "columnar", "arrow"] = "rows"):
     try:
-        sample_data = schema_manager.get_table_sample_data(table_name, limit)
-        return {"sample_data": sample_data}
+        if format == "arrow":
+            sample_data = await async_schema_manager.get_table_sample_data(table_name, limit, result_format="columnar")
+            return Response(content=to_arrow_ipc(sample_data), media_type=ARROW_MEDIA_TYPE)
+        sample_data = await async_schema_manager.get_table_sample_data(table_name, limit, result_format=format)
+        return ResultResponse({"sample_data": sample_data})
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
@@ -1,14 +1,96 @@
-from fastapi import APIRouter
-from app.core.database import schema_manager
+import asyncio
+from typing import List, Optional
+from fastapi import APIRouter, Query, Request, Response
+from app.core.database import async_schema_manager
 
 router = APIRouter()
 
+def snapshot_headers(snapshot):
+    """ETag of a snapshot, and X-Schema-Stale while it could not be revalidated"""
+    headers = {"ETag": f'"{snapshot.version}"'}
+    if async_schema_manager.stale:
+        headers["X-Schema-Stale"] = "true"
+    return headers
+
+def not_modified(request: Request, headers: dict):
+    """304 response when the client already holds this schema version"""
+    if headers["ETag"] in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return None
+
 @router.get("/schema", summary="Get full database schema")
-def get_database_schema():
-    schema = schema_manager.get_schema()
-    return {"schema": schema}
+async def get_database_schema(request: Request, response: Response):
+    snapshot = await async_schema_manager.snapshot()
+    headers = snapshot_headers(snapshot)
+    cached = not_modified(request, headers)
+    if cached:
+        return cached
+    response.headers.update(headers)
+    return {"schema": snapshot.schema}
+
+@router.get("/schema/text", summary="Get the schema as compact DDL text")
+async def get_schema_text(request: Request, response: Response,
+                          tables: Optional[List[str]] = Query(None),
+                          max_chars: Optional[int] = None,
+                          max_tokens: Optional[int] = None):
+    snapshot = await async_schema_manager.snapshot()
+    headers = snapshot_headers(snapshot)
+    cached = not_modified(request, headers)
+    if cached:
+        return cached
+    response.headers.update(headers)
+    text = async_schema_manager.renderer.render(snapshot, tables, max_chars=max_chars, max_tokens=max_tokens)
+    return {"schema": text}
+
+@router.get("/schema/search", summary="Find the tables most relevant to a question")
+async def search_schema(q: str, limit: int = 10, include_schema: bool = True, max_tokens: Optional[int] = None):
+    """
+    Rank tables by BM25 relevance of their names, columns, comments and FK
+    neighbours to q. With include_schema, the CREATE TABLE lines of the
+    found tables follow, best match first.
+    """
+    try:
+        snapshot = await async_schema_manager.snapshot()
+        tables = await asyncio.to_thread(async_schema_manager.search_index.search, snapshot, q, limit)
+        body = {"schema_version": snapshot.version, "tables": tables}
+        if include_schema:
+            body["schema"] = async_schema_manager.renderer.render(
+                snapshot, [table["table"] for table in tables], max_tokens=max_tokens)
+        return body
+    except Exception as e:
+        return {"error": str(e)}
+
+@router.get("/joins", summary="Find how to join a set of tables")
+async def find_joins(tables: List[str] = Query(...)):
+    """
+    Join tree connecting the tables along foreign keys, with fewest joins
+    on each step; intermediate tables are added where needed. The first
+    table is the root of the FROM clause.
+    """
+    try:
+        snapshot = await async_schema_manager.snapshot()
+        tree = await asyncio.to_thread(async_schema_manager.joins.join_tree, snapshot, tables)
+        return {"schema_version": snapshot.version, **tree}
+    except Exception as e:
+        return {"error": str(e)}
 
 @router.get("/tables", summary="Get list of tables")
-def get_table_list():
-    tables = schema_manager.get_tables()
-    return {"tables": tables}
\ No newline at end of file
+async def get_table_list(request: Request, response: Response):
+    snapshot = await async_schema_manager.snapshot()
+    headers = snapshot_headers(snapshot)
+    cached = not_modified(request, headers)
+    if cached:
+        return cached
+    response.headers.update(headers)
+    return {"tables": snapshot.tables}
+
+@router.get("/stats/{table_name}", summary="Get planner statistics of a table's columns")
+async def get_column_stats(table_name: str, columns: Optional[List[str]] = Query(None)):
+    """
+    Row estimate, null fraction, distinct count, most common values and
+    histogram bounds per column, as last gathered by ANALYZE (PostgreSQL only)
+    """
+    try:
+        return await async_schema_manager.get_column_stats(table_name, columns)
+    except Exception as e:
+        return {"error": str(e)}
@@ -0,0 +1,177 @@
+"""Query result cache"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from .serialization import dumps
+from .sql import normalize
+
+class _Entry:
+    __slots__ = ("value", "size", "expires", "tables")
+
+    def __init__(self, value, size, expires, tables):
+        self.value = value
+        self.size = size
+        self.expires = expires
+        self.tables = tables
+
+def estimate_size(value) -> int:
+    """Approximate memory footprint of a result by its JSON length"""
+    return len(dumps(value))
+
+class QueryCache:
+    """
+    Thread-safe LRU cache of query results
+
+    Entries are bounded by their total estimated size in bytes and expire
+    after a TTL. Every entry remembers the tables its query read, so a write
+    to one of them drops the entry (see invalidate).
+
+    Cached values are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, max_bytes, ttl=None, max_entry_bytes=None):
+        """
+        Args:
+            max_bytes: upper bound for the summed size of all entries
+            ttl: (Optional) time to live in seconds, default no expiry
+            max_entry_bytes: (Optional) results larger than this are not cached
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_entry_bytes = min(max_entry_bytes or max_bytes, max_bytes)
+        self._entries = OrderedDict()
+        self._by_table = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(query, params=None, variant="") -> str:
+        """Cache key of the normalized statement and its parameters"""
+        raw = dumps([normalize(query), sorted((params or {}).items()), variant])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key):
+        """
+        Look up a key
+
+        Returns:
+            (hit, value); value is None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry.value
+
+    def set(self, key, value, tables, size=None) -> bool:
+        """
+        Store a result
+
+        Args:
+            key: key from make_key
+            value: result to store
+            tables: tables the query read from
+            size: (Optional) precomputed size in bytes, estimated when omitted
+        Returns:
+            bool: True if stored, False if the value is too large
+        """
+        size = estimate_size(value) if size is None else size
+        if size > self.max_entry_bytes:
+            return False
+        expires = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        tables = {table.lower() for table in tables}
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, size, expires, tables)
+            self._size += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def invalidate(self, tables=None) -> int:
+        """
+        Drop entries that read any of the given tables
+
+        Args:
+            tables: (Optional) changed tables; None or empty clears the whole
+                cache, for writes whose targets could not be determined
+        Returns:
+            int: number of entries removed
+        """
+        with self._lock:
+            if not tables:
+                keys = list(self._entries)
+            else:
+                keys = set()
+                for table in tables:
+                    keys |= self._by_table.get(table.lower(), set())
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        self.invalidate()
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries"      : len(self._entries),
+                "bytes"        : self._size,
+                "max_bytes"    : self.max_bytes,
+                "hits"         : self.hits,
+                "misses"       : self.misses,
+                "hit_ratio"    : round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions"    : self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._size -= entry.size
+        for table in entry.tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+class ResultCapture:
+    """Collect streamed batches for caching until they outgrow a size limit"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.rows = []
+        self.size = 0
+
+    @property
+    def complete(self) -> bool:
+        return self.rows is not None
+
+    def add(self, batch):
+        if self.rows is None:
+            return
+        self.size += estimate_size(batch)
+        if self.size > self.max_bytes:
+            self.rows = None
+        else:
+            self.rows.extend(batch)
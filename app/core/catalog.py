@@ -0,0 +1,160 @@
+"""Catalog fingerprints and versioned schema snapshots"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from sqlalchemy import text
+
+# One row per table in the current schema. The hash covers the xmin of every
+# catalog row that shapes get_schema output, so any DDL on the table (column,
+# default, constraint, index or comment change) produces a new fingerprint
+# while VACUUM/ANALYZE, which update pg_class in place, do not.
+POSTGRES_FINGERPRINTS = text("""
+    SELECT c.relname AS table_name,
+           md5(concat_ws('|',
+               c.xmin::text,
+               (SELECT string_agg(a.attnum || ':' || a.xmin::text, ',' ORDER BY a.attnum)
+                  FROM pg_attribute a
+                 WHERE a.attrelid = c.oid AND a.attnum > 0),
+               (SELECT string_agg(d.adnum || ':' || d.xmin::text, ',' ORDER BY d.adnum)
+                  FROM pg_attrdef d
+                 WHERE d.adrelid = c.oid),
+               (SELECT string_agg(co.oid || ':' || co.xmin::text, ',' ORDER BY co.oid)
+                  FROM pg_constraint co
+                 WHERE co.conrelid = c.oid),
+               (SELECT string_agg(i.indexrelid || ':' || i.xmin::text, ',' ORDER BY i.indexrelid)
+                  FROM pg_index i
+                 WHERE i.indrelid = c.oid),
+               (SELECT string_agg(ds.objsubid || ':' || ds.xmin::text, ',' ORDER BY ds.objsubid)
+                  FROM pg_description ds
+                 WHERE ds.objoid = c.oid AND ds.classoid = 'pg_class'::regclass)
+           )) AS fingerprint
+      FROM pg_class c
+      JOIN pg_namespace n ON n.oid = c.relnamespace
+     WHERE c.relkind IN ('r', 'p')
+       AND n.nspname = current_schema()
+     ORDER BY c.relname
+""")
+
+SQLITE_FINGERPRINTS = text("""
+    SELECT tbl_name AS table_name,
+           group_concat(type || ':' || name || ':' || coalesce(sql, ''), '|') AS fingerprint
+      FROM (SELECT * FROM sqlite_master ORDER BY type, name)
+     WHERE type IN ('table', 'index') AND tbl_name NOT LIKE 'sqlite_%'
+     GROUP BY tbl_name
+    HAVING sum(type = 'table') > 0
+     ORDER BY tbl_name
+""")
+
+FINGERPRINT_QUERIES = {
+    "postgresql": POSTGRES_FINGERPRINTS,
+    "sqlite"    : SQLITE_FINGERPRINTS,
+}
+
+def table_fingerprints(connection):
+    """
+    Cheap per-table DDL fingerprints for the default schema
+
+    Args:
+        connection: sync Connection
+    Returns:
+        dict: {table: fingerprint}, or None when the dialect has no catalog query
+    """
+    query = FINGERPRINT_QUERIES.get(connection.dialect.name)
+    if query is None:
+        return None
+    return {row.table_name: row.fingerprint for row in connection.execute(query)}
+
+def schema_version(fingerprints, schema):
+    """Version string of a snapshot: hash over the fingerprints, or the schema itself without them"""
+    payload = fingerprints if fingerprints is not None else schema
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+# Version 2 added table and column comments
+SNAPSHOT_FORMAT = 2
+
+class SchemaSnapshot:
+    """An immutable, versioned copy of the reflected schema"""
+
+    def __init__(self, schema, fingerprints=None, version=None, checked_at=None):
+        self.schema = schema
+        self.fingerprints = fingerprints
+        self.version = version or schema_version(fingerprints, schema)
+        self.checked_at = time.monotonic() if checked_at is None else checked_at
+
+    @property
+    def tables(self):
+        return list(self.schema)
+
+    def is_stale(self, max_age):
+        """Whether the snapshot was last validated more than max_age seconds ago"""
+        return time.monotonic() - self.checked_at > max_age
+
+    def to_dict(self, source=None):
+        """Serializable form for save_snapshot"""
+        return {
+            "format"      : SNAPSHOT_FORMAT,
+            "source"      : source,
+            "version"     : self.version,
+            "fingerprints": self.fingerprints,
+            "schema"      : self.schema,
+            "saved_at"    : time.time()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a snapshot written by to_dict; it is stale until revalidated"""
+        return cls(data["schema"], data.get("fingerprints"), version=data["version"],
+                   checked_at=float("-inf"))
+
+    def changed_tables(self, fingerprints):
+        """Tables that are new or whose fingerprint differs from this snapshot"""
+        if self.fingerprints is None:
+            return list(fingerprints)
+        return [table for table, fingerprint in fingerprints.items()
+                if self.fingerprints.get(table) != fingerprint]
+
+    def referencing_tables(self, tables):
+        """Tables of this snapshot with a foreign key into any of tables"""
+        tables = set(tables)
+        return [table for table, info in self.schema.items()
+                if any(fk["referred_table"] in tables for fk in info["foreign_keys"])]
+
+def save_snapshot(snapshot, path, source=None):
+    """
+    Write a snapshot to a JSON file atomically
+
+    Args:
+        snapshot: SchemaSnapshot
+        path: destination file
+        source: identifies the database, checked again by load_snapshot
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".schema-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(snapshot.to_dict(source), f, default=str)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def load_snapshot(path, source=None):
+    """
+    Read a snapshot written by save_snapshot
+
+    Returns:
+        SchemaSnapshot, or None if the file is missing, unreadable, in an
+        older format or taken from a different database
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("format") != SNAPSHOT_FORMAT or data.get("source") != source:
+        return None
+    return SchemaSnapshot.from_dict(data)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class DBSettings(BaseSettings):
@@ -13,8 +14,77 @@ class DBSettings(BaseSettings):
     DATABASE_AGENT_URL: str = os.getenv("DATABASE_AGENT_URL", "http://localhost:10001")  # ✅ 추가
     HOST_AGENT_URL: str = os.getenv("HOST_AGENT_URL", "http://localhost:10000")            # ✅ 추가
 
+    # Connection pool
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))   # seconds, -1 disables
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+    DB_POOL_WARMUP: int = int(os.getenv("DB_POOL_WARMUP", "5"))        # connections opened at startup
+    # Prepared statements the async driver keeps per connection, keyed by SQL text (0 disables)
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", "100"))
+
+    # Query result cache (opt-in per request)
+    QUERY_CACHE_MAX_BYTES: int = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    QUERY_CACHE_MAX_ENTRY_BYTES: int = int(os.getenv("QUERY_CACHE_MAX_ENTRY_BYTES", str(8 * 1024 * 1024)))
+    QUERY_CACHE_TTL: float = float(os.getenv("QUERY_CACHE_TTL", "300"))  # seconds
+
+    # Schema snapshot: background revalidation period and max age served without a check
+    SCHEMA_REFRESH_INTERVAL: float = float(os.getenv("SCHEMA_REFRESH_INTERVAL", "30"))
+    SCHEMA_MAX_AGE: float = float(os.getenv("SCHEMA_MAX_AGE", "60"))
+    # File the reflected schema is persisted to for fast cold starts (empty disables)
+    SCHEMA_SNAPSHOT_PATH: str = os.getenv("SCHEMA_SNAPSHOT_PATH", "")
+
+    # Threads used to reflect tables on dialects without bulk catalog queries
+    SCHEMA_REFLECTION_WORKERS: int = int(os.getenv("SCHEMA_REFLECTION_WORKERS", "8"))
+
+    # Token budget of the schema text handed to the agent (0 for no limit)
+    SCHEMA_TEXT_MAX_TOKENS: int = int(os.getenv("SCHEMA_TEXT_MAX_TOKENS", "4000"))
+
+    # Default statement timeout in seconds for execute_query/stream_query (0 disables)
+    QUERY_TIMEOUT: float = float(os.getenv("QUERY_TIMEOUT", "30"))
+
+    # Cost guard for API queries: EXPLAIN estimates over these limits are
+    # rejected ("reject") or reported ("flag"); unbounded SELECTs get LIMIT
+    # QUERY_MAX_ROWS appended. 0 disables a limit.
+    QUERY_MAX_COST: float = float(os.getenv("QUERY_MAX_COST", "10000000"))
+    QUERY_MAX_ROWS: int = int(os.getenv("QUERY_MAX_ROWS", "10000"))
+    QUERY_GUARD_MODE: str = os.getenv("QUERY_GUARD_MODE", "reject")
+
+    # Paged results without a keyset ordering keep a server-side cursor open
+    # between pages: at most this many at a time, closed after TTL idle seconds
+    QUERY_PAGE_CURSORS: int = int(os.getenv("QUERY_PAGE_CURSORS", "4"))
+    QUERY_PAGE_CURSOR_TTL: float = float(os.getenv("QUERY_PAGE_CURSOR_TTL", "120"))
+
+    # Rows fetched per round trip when streaming results through a server-side cursor
+    QUERY_STREAM_BATCH_SIZE: int = int(os.getenv("QUERY_STREAM_BATCH_SIZE", "1000"))
+
+    # Batch queries (/api/query/batch): statements per request, and how many run at once
+    QUERY_BATCH_MAX_STATEMENTS: int = int(os.getenv("QUERY_BATCH_MAX_STATEMENTS", "50"))
+    QUERY_BATCH_CONCURRENCY: int = int(os.getenv("QUERY_BATCH_CONCURRENCY", "4"))
+
+    # Bulk exports: statement timeout (0 disables), rows per Parquet row group and link lifetime
+    EXPORT_TIMEOUT: float = float(os.getenv("EXPORT_TIMEOUT", "600"))
+    EXPORT_ROW_GROUP_ROWS: int = int(os.getenv("EXPORT_ROW_GROUP_ROWS", "32768"))
+    EXPORT_TTL: float = float(os.getenv("EXPORT_TTL", "3600"))  # seconds
+    # Directory Excel workbooks are written to; they are deleted after EXPORT_TTL
+    EXCEL_OUTPUT_DIR: str = os.getenv("EXCEL_OUTPUT_DIR", os.path.join(tempfile.gettempdir(), "database-agent-excel"))
+
+    # Prometheus metrics on /metrics; when off, nothing is recorded
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+    # Read replicas: comma-separated DSNs that serve read-only statements
+    DATABASE_REPLICA_URLS: str = os.getenv("DATABASE_REPLICA_URLS", "")
+    DB_REPLICA_POLICY: str = os.getenv("DB_REPLICA_POLICY", "least_outstanding")  # or round_robin
+    DB_REPLICA_MAX_LAG: float = float(os.getenv("DB_REPLICA_MAX_LAG", "0"))  # seconds, 0 disables lag checks
+    DB_REPLICA_CHECK_INTERVAL: float = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "10"))  # seconds between checks
+
     @property
     def DATABASE_URL(self) -> str:  # noqa: N802
+        # A full SQLAlchemy URL (e.g. sqlite:///local.db) takes precedence over the DB_* parts
+        url = os.getenv("DATABASE_URL")
+        if url:
+            return url
         return (
             f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
             f"@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
@@ -1,185 +1,1574 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
 from .config import settings
+from .cache import QueryCache, ResultCapture
+from .catalog import SchemaSnapshot, load_snapshot, save_snapshot, table_fingerprints
+from .export import compile_statement, copy_statement, encoder_for
+from .guard import QueryRejected, check_query
+from .joins import JoinPlanner
+from .metrics import QueryTimer
+from .pagination import CursorRegistry, HeldCursor, KeysetPlan, decode_token, encode_token
+from .pool import PoolMonitor
+from .reflection import reflect_tables
+from .replicas import Replica, ReplicaRouter, measure_lag
+from .sampling import sample_rows
+from .schema_text import SchemaRenderer
+from .search import SchemaSearch
+from .statistics import StatisticsCatalog
+from .sql import is_read_only, is_select, read_tables, write_tables
+from .serialization import format_page, to_columnar
+import asyncio
 import logging
+import threading
+import time
 from sqlalchemy import inspect, MetaData
 
+# Chunks of COPY output buffered between the database and a slow client
+EXPORT_QUEUE_CHUNKS = 8
+
+# Seconds between revalidation attempts while the catalog is unreachable
+SCHEMA_RETRY_INTERVAL = 5
+
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Sync driver -> async driver used by AsyncDatabase
+ASYNC_DRIVERS = {
+    "postgresql"         : "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite"             : "sqlite+aiosqlite",
+    "sqlite+pysqlite"    : "sqlite+aiosqlite",
+}
+
+def to_async_url(db_url):
+    """Swap a sync database URL to its async driver"""
+    url = make_url(db_url)
+    drivername = ASYNC_DRIVERS.get(url.drivername, url.drivername)
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+def log_query_failure(message, query, params):
+    logger.error(message)
+    logger.error(f"Query: {query}")
+    if params:
+        logger.error(f"Params: {params}")
+
+def track_backend_pids(engine):
+    """Remember the server pid of every new Postgres connection in its pool record"""
+    if engine.dialect.name != "postgresql":
+        return
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT pg_backend_pid()")
+            connection_record.info["backend_pid"] = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+        # End the implicit transaction, so the first checkout can still set its isolation level
+        dbapi_connection.rollback()
+
+    event.listen(engine.pool, "connect", on_connect)
+
+def set_statement_timeout(connection, timeout):
+    """Limit statements of the current transaction to timeout seconds (Postgres only)"""
+    if timeout and connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {max(1, int(timeout * 1000))}")
+
 class Database:
-    """Database management class"""
+    """
+    Database management class
+
+    The engine is created on first use, so importing this module neither
+    loads the driver nor needs a reachable database.
+
+    With replica URLs, read-only statements run on the replicas (see
+    ReplicaRouter) and everything else on the primary db_url.
+    """
 
-    def __init__(self, db_url=None):
+    def __init__(self, db_url=None, replica_urls=None):
         self.db_url = db_url or settings.DATABASE_URL
-        self.engine = None
+        if replica_urls is None:
+            replica_urls = [url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+        self.replica_urls = list(replica_urls)
+        self._engine = None
+        self._init_lock = threading.Lock()
         self.SessionLocal = None
-        self.init_db()
+        self.pool_monitor = None
+        self.router = None
+        self.cache = QueryCache(max_bytes       = settings.QUERY_CACHE_MAX_BYTES,
+                                ttl             = settings.QUERY_CACHE_TTL,
+                                max_entry_bytes = settings.QUERY_CACHE_MAX_ENTRY_BYTES)
+        self.cursors = CursorRegistry(max_cursors = settings.QUERY_PAGE_CURSORS,
+                                      ttl         = settings.QUERY_PAGE_CURSOR_TTL)
+
+    @property
+    def engine(self):
+        """SQLAlchemy engine, created on first access"""
+        if self._engine is None:
+            with self._init_lock:
+                if self._engine is None:
+                    self.init_db()
+        return self._engine
+
+    @property
+    def initialized(self):
+        return self._engine is not None
+
+    def engine_options(self, db_url=None):
+        """Pool settings passed to create_engine"""
+        options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+        # SQLite pools are per-thread/static and reject the queue pool arguments
+        if make_url(db_url or self.db_url).get_backend_name() != "sqlite":
+            options.update(pool_size    = settings.DB_POOL_SIZE,
+                           max_overflow = settings.DB_MAX_OVERFLOW,
+                           pool_recycle = settings.DB_POOL_RECYCLE,
+                           pool_timeout = settings.DB_POOL_TIMEOUT)
+        return options
 
     def init_db(self):
         """Initalize database"""
         try:
-            self.engine = create_engine(self.db_url)
+            engine = create_engine(self.db_url, **self.engine_options())
+            self.pool_monitor = PoolMonitor(engine)
+            track_backend_pids(engine)
+            self.router = self._create_router(create_engine)
             self.SessionLocal = sessionmaker(autocommit = False,
                                              autoflush  = False,
-                                             bind       = self.engine)
+                                             bind       = engine)
             self.Base = declarative_base()
+            self._engine = engine
             logger.info("Database connection established")
         except Exception as e:
             logger.error(f"Database connection failed: {e}")
             raise
     
+    def warm_up_pool(self, count = None):
+        """
+        Open pool connections ahead of the first request
+
+        Args:
+            count: (Optional) Number of connections, defaults to DB_POOL_WARMUP
+        Returns:
+            int: Number of connections opened
+        """
+        count = min(settings.DB_POOL_WARMUP if count is None else count, settings.DB_POOL_SIZE)
+        connections = []
+        try:
+            for _ in range(count):
+                connections.append(self.engine.connect())
+        except Exception as e:
+            logger.warning(f"Pool warm-up stopped after {len(connections)} connections: {e}")
+        finally:
+            for connection in connections:
+                connection.close()
+        logger.info(f"Pool warmed up with {len(connections)} connections")
+        return len(connections)
+
+    def _create_router(self, create):
+        """Engines for the replica URLs behind a ReplicaRouter (None without replicas)"""
+        replicas = []
+        for url in self.replica_urls:
+            engine = create(url, **self.engine_options(url))
+            track_backend_pids(getattr(engine, "sync_engine", engine))
+            replicas.append(Replica(make_url(url).render_as_string(hide_password=True), engine))
+        if not replicas:
+            return None
+        logger.info(f"Routing read-only statements to {len(replicas)} replicas")
+        return ReplicaRouter(replicas,
+                             policy         = settings.DB_REPLICA_POLICY,
+                             max_lag        = settings.DB_REPLICA_MAX_LAG,
+                             check_interval = settings.DB_REPLICA_CHECK_INTERVAL)
+
+    def pool_stats(self):
+        """Return live connection pool statistics"""
+        self.engine
+        stats = self.pool_monitor.stats()
+        if self.router:
+            stats["replicas"] = self.router.stats()
+        return stats
+
+    def dispose(self):
+        """Close the pooled connections of the primary and the replicas"""
+        if not self.initialized:
+            return
+        self.engine.dispose()
+        for replica in self.router.replicas if self.router else []:
+            replica.engine.dispose()
+
+    @contextmanager
+    def connect(self, read_only = False):
+        """
+        Check out a pooled connection, recording how long the checkout waited
+
+        Args:
+            read_only: the work only reads, so it may run on a replica
+        """
+        connection, replica = self._checkout(read_only)
+        try:
+            with connection:
+                yield connection
+        finally:
+            if replica is not None:
+                self.router.release(replica)
+
+    def _checkout(self, read_only = False):
+        """
+        Open a connection on an eligible replica for read-only work, else on the primary
+
+        Returns:
+            (connection, replica or None); release the replica when done
+        """
+        replica = self._acquire_replica() if read_only else None
+        if replica is not None:
+            try:
+                return replica.engine.connect(), replica
+            except Exception as e:
+                logger.warning(f"Replica {replica.url} unavailable, using the primary: {e}")
+                self.router.record_check(replica, None)
+                self.router.release(replica)
+        started = time.perf_counter()
+        connection = self.engine.connect()
+        self.pool_monitor.record_wait(time.perf_counter() - started)
+        return connection, None
+
+    def _acquire_replica(self):
+        self.engine
+        if self.router is None:
+            return None
+        for replica in self.router.due_for_check():
+            self._check_replica(replica)
+        return self.router.acquire()
+
+    def _check_replica(self, replica):
+        """Measure a replica's lag; failures mark it unavailable until the next check"""
+        try:
+            with replica.engine.connect() as connection:
+                lag = measure_lag(connection)
+        except Exception as e:
+            logger.warning(f"Replica {replica.url} check failed: {e}")
+            lag = None
+        self.router.record_check(replica, lag)
+
     def get_session(self):
         """Return database session"""
+        self.engine
         db = self.SessionLocal()
         try:
             yield db
         finally:
             db.close()
 
-    def execute_query(self, query, params = None):
+    def execute_query(self, query, params = None, result_format = "rows", use_cache = False, timeout = None):
         """
         Execute SQL query
 
         Args:
             query: SQL query string
             params: (Optional) Query parameter
+            result_format: "rows" for a dictionary list, "columnar" for
+                {"columns": [...], "types": [...], "rows": [[...]]}
+            use_cache: Serve read-only statements from the result cache.
+                Cached results are shared and must not be mutated.
+            timeout: (Optional) Statement timeout in seconds, default
+                QUERY_TIMEOUT; 0 disables it
         Returns:
-            Query result (Dictionary list)
+            Query result (Dictionary list or columnar dictionary)
         """
+        key = self._cache_key(query, params, result_format) if use_cache else None
+        if key:
+            hit, result = self.cache.get(key)
+            if hit:
+                return result
         try:
-            with self.engine.connect() as connection:
-                if params:
-                    result = connection.execute(text(query), params)
-                else:
-                    result = connection.execute(text(query))
-            
-                if result.returns_rows:
-                    columns = result.keys()
-                    return [dict(zip(columns, row)) for row in result.fetchall()]
-                return []
+            with self.connect(read_only = is_read_only(query)) as connection:
+                result = self._execute(connection, query, params, result_format, self._timeout(timeout))
         except Exception as e:
-            logger.error(f"Query execution failed: {e}")
-            logger.error(f"Query: {query}")
+            log_query_failure(f"Query execution failed: {e}", query, params)
+            raise
+        self._update_cache(key, query, result)
+        return result
+
+    def guard_query(self, query, params = None, inject_limit = True):
+        """
+        Check a statement's planner estimate before it runs (see guard.check_query)
+
+        Limits come from QUERY_MAX_COST, QUERY_MAX_ROWS and QUERY_GUARD_MODE.
+        Without inject_limit (paged or streamed results) only the cost is
+        limited.
+
+        Returns:
+            dict: decision; run decision["query"], which may have a LIMIT added
+        Raises:
+            QueryRejected: the estimate is over the limits
+        """
+        with self.connect(read_only = is_read_only(query)) as connection:
+            return self._guard(connection, query, params, inject_limit)
+
+    @staticmethod
+    def _guard(connection, query, params, inject_limit):
+        set_statement_timeout(connection, settings.QUERY_TIMEOUT)
+        return check_query(connection, query, params,
+                           max_cost     = settings.QUERY_MAX_COST,
+                           max_rows     = settings.QUERY_MAX_ROWS if inject_limit else None,
+                           mode         = settings.QUERY_GUARD_MODE,
+                           inject_limit = inject_limit)
+
+    def execute_batch(self, statements, result_format = "rows", timeout = None, guard = True, snapshot = False):
+        """
+        Run independent statements concurrently, each on its own pooled connection
+
+        At most QUERY_BATCH_CONCURRENCY statements run at once. Each one is
+        guarded and executed like execute_query, and a failing statement
+        does not affect the others.
+
+        Args:
+            statements: list of (query, params)
+            result_format: "rows" or "columnar" (see execute_query)
+            timeout: (Optional) statement timeout in seconds for each statement
+            guard: check each statement's cost first (see guard_query)
+            snapshot: run every statement read-only in one exported snapshot
+                (PostgreSQL), so all of them see the same database state
+        Returns:
+            list: one entry per statement, in order, with index, elapsed_ms
+                and either result or error (plus guard when it was checked)
+        Raises:
+            ValueError: too many statements, or a snapshot on another database
+        """
+        self._check_batch(statements, snapshot)
+        timeout = self._timeout(timeout)
+
+        def run(index, engine = None, snapshot_id = None):
+            query, params = statements[index]
+            started = time.perf_counter()
+            try:
+                with engine.connect() if engine else self.connect(read_only = is_read_only(query)) as connection:
+                    entry = self._batch_statement(connection, query, params, result_format, timeout, guard, snapshot_id)
+            except Exception as e:
+                entry = self._batch_error(e, query, params)
+            return {"index": index, **entry, "elapsed_ms": round((time.perf_counter() - started) * 1000, 3)}
+
+        with ThreadPoolExecutor(max_workers=min(settings.QUERY_BATCH_CONCURRENCY, len(statements)) or 1) as executor:
+            if not snapshot:
+                return list(executor.map(run, range(len(statements))))
+            with self.connect(read_only = True) as leader:
+                snapshot_id = self._begin_snapshot(leader)
+                return list(executor.map(lambda index: run(index, leader.engine, snapshot_id), range(len(statements))))
+
+    def _check_batch(self, statements, snapshot):
+        if len(statements) > settings.QUERY_BATCH_MAX_STATEMENTS:
+            raise ValueError(f"A batch holds at most {settings.QUERY_BATCH_MAX_STATEMENTS} statements")
+        if snapshot and make_url(self.db_url).get_backend_name() != "postgresql":
+            raise ValueError("Snapshot batches are only available on PostgreSQL")
+
+    @staticmethod
+    def _begin_snapshot(connection, snapshot_id = None):
+        """
+        Start a read-only REPEATABLE READ transaction on a fresh connection
+
+        Without snapshot_id the transaction's snapshot is exported and its id
+        returned; it stays importable while this transaction is open.
+        """
+        connection.exec_driver_sql("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        if snapshot_id is None:
+            return connection.exec_driver_sql("SELECT pg_export_snapshot()").scalar()
+        connection.exec_driver_sql(f"SET TRANSACTION SNAPSHOT '{snapshot_id}'")
+        return snapshot_id
+
+    @classmethod
+    def _batch_statement(cls, connection, query, params, result_format, timeout, guard, snapshot_id = None):
+        """Guard and run one batch statement on a sync connection (shared via run_sync)"""
+        if snapshot_id:
+            cls._begin_snapshot(connection, snapshot_id)
+        decision = None
+        if guard:
+            decision = cls._guard(connection, query, params, True)
+            if decision["action"] == "unchecked" and "reason" in decision:
+                # EXPLAIN failed, which also aborted the transaction
+                return {"error": decision["reason"]}
+            if decision["query"] == query:
+                del decision["query"]
+            else:
+                query = decision["query"]
+        result = cls._execute(connection, query, params, result_format, timeout)
+        return {"result": result, **({"guard": decision} if decision else {})}
+
+    @staticmethod
+    def _batch_error(error, query, params):
+        if isinstance(error, QueryRejected):
+            return {"error": str(error), "guard": error.decision}
+        log_query_failure(f"Batch statement failed: {error}", query, params)
+        return {"error": str(error)}
+
+    def _cache_key(self, query, params, result_format):
+        """Cache key for read-only statements, None for anything that may write"""
+        if not is_read_only(query):
+            return None
+        return self.cache.make_key(query, params, result_format)
+
+    def _update_cache(self, key, query, result, size = None):
+        """Store a cacheable result, or invalidate the tables a write touched"""
+        if key:
+            self.cache.set(key, result, read_tables(query), size=size)
+        elif not is_read_only(query):
+            self.cache.invalidate(write_tables(query))
+
+    def _cached_batches(self, key, batch_size):
+        """Cached rows split into stream batches, or None on a miss"""
+        hit, rows = self.cache.get(key)
+        if not hit:
+            return None
+        return [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+
+    @staticmethod
+    def _timeout(timeout):
+        return settings.QUERY_TIMEOUT if timeout is None else timeout
+
+    @staticmethod
+    def backend_pid(connection):
+        """Server pid of a checked-out Postgres connection (None on other databases)"""
+        return connection.info.get("backend_pid")
+
+    def cancel_backend(self, pid, engine = None):
+        """
+        Cancel the statement running on a Postgres backend
+
+        Safe to call from another thread while the statement is running.
+
+        Args:
+            pid: backend pid (see backend_pid)
+            engine: (Optional) engine of the server running it, default the primary
+        Returns:
+            bool: True if the cancel signal was sent
+        """
+        if pid is None:
+            return False
+        try:
+            with (engine or self.engine).connect() as connection:
+                return bool(connection.execute(text("SELECT pg_cancel_backend(:pid)"), {"pid": pid}).scalar())
+        except Exception as e:
+            logger.warning(f"Could not cancel backend {pid}: {e}")
+            return False
+
+    @staticmethod
+    def _execute(connection, query, params, result_format, timeout = None):
+        """Run a statement on a sync connection (shared with AsyncDatabase via run_sync)"""
+        with QueryTimer("execute") as timer:
+            set_statement_timeout(connection, timeout)
             if params:
-                logger.error(f"Params: {params}")
+                result = connection.execute(text(query), params)
+            else:
+                result = connection.execute(text(query))
+            rows = result.fetchall() if result.returns_rows else []
+            timer.rows = len(rows)
+
+        if result_format == "columnar":
+            if result.returns_rows:
+                return to_columnar(list(result.keys()), rows)
+            return to_columnar([], [])
+
+        if result.returns_rows:
+            columns = result.keys()
+            return [dict(zip(columns, row)) for row in rows]
+        return []
+
+    def stream_query(self, query, params = None, batch_size = None, use_cache = False, timeout = None,
+                     operation = "stream"):
+        """
+        Execute SQL query through a server-side cursor
+
+        Rows are fetched in batches, so memory stays flat regardless of
+        result size. The connection is held until the generator is exhausted
+        or closed. Statements other than SELECT run without a cursor.
+
+        Args:
+            query: SQL query string
+            params: (Optional) Query parameter
+            batch_size: (Optional) Rows fetched per round trip
+            use_cache: Serve from / fill the result cache. Only fully
+                consumed results under QUERY_CACHE_MAX_ENTRY_BYTES are stored.
+            timeout: (Optional) Statement timeout in seconds (see execute_query)
+            operation: Metrics label of the statement (see metrics.QueryTimer)
+        Yields:
+            list: Batch of rows (Dictionary list)
+        """
+        batch_size = batch_size or settings.QUERY_STREAM_BATCH_SIZE
+        key = self._cache_key(query, params, "rows") if use_cache else None
+        cached = self._cached_batches(key, batch_size) if key else None
+        if cached is not None:
+            yield from cached
+            return
+
+        capture = ResultCapture(self.cache.max_entry_bytes) if key else None
+        try:
+            with self.connect(read_only = is_read_only(query)) as connection, QueryTimer(operation) as timer:
+                set_statement_timeout(connection, self._timeout(timeout))
+                if is_select(query):
+                    connection = connection.execution_options(stream_results = True,
+                                                              yield_per      = batch_size)
+                result = connection.execute(text(query), params or {})
+
+                if result.returns_rows:
+                    columns = list(result.keys())
+                    timer.rows = 0
+                    # yield_per does not apply to text() statements; size the partitions explicitly
+                    for partition in result.partitions(batch_size):
+                        batch = [dict(zip(columns, row)) for row in partition]
+                        timer.rows += len(batch)
+                        if capture:
+                            capture.add(batch)
+                        yield batch
+        except Exception as e:
+            log_query_failure(f"Query streaming failed: {e}", query, params)
+            raise
+        if capture is None:
+            self._update_cache(None, query, None)
+        elif capture.complete:
+            self._update_cache(key, query, capture.rows, size=capture.size)
+
+    def export_query(self, query, params = None, export_format = "csv", output = None, timeout = None):
+        """
+        Write the rows of a statement to a binary file object as CSV or Parquet
+
+        On Postgres, CSV comes straight from COPY ... TO STDOUT. Everything
+        else is encoded from stream_query batches of EXPORT_ROW_GROUP_ROWS
+        rows (see export.encoder_for), so memory stays bounded by one batch
+        whatever the size of the result.
+
+        Args:
+            query: SQL query string
+            params: (Optional) Query parameter
+            export_format: "csv" or "parquet"
+            output: binary file object the export is written to
+            timeout: (Optional) statement timeout in seconds, default EXPORT_TIMEOUT
+        """
+        timeout = settings.EXPORT_TIMEOUT if timeout is None else timeout
+        if export_format == "csv" and self.engine.dialect.name == "postgresql":
+            with self.connect(read_only = True) as connection, QueryTimer("export") as timer:
+                set_statement_timeout(connection, timeout)
+                sql, values = compile_statement(connection.dialect, query, params)
+                cursor = connection.connection.cursor()
+                try:
+                    cursor.copy_expert(copy_statement(cursor.mogrify(sql, values).decode()), output)
+                    timer.rows = cursor.rowcount
+                finally:
+                    cursor.close()
+            return
+        encoder = encoder_for(export_format)
+        for batch in self.stream_query(query, params, batch_size = settings.EXPORT_ROW_GROUP_ROWS, timeout = timeout,
+                                       operation = "export"):
+            output.write(encoder.write(batch))
+        output.write(encoder.close())
+
+    def execute_page(self, query, params = None, page_size = 100, page_token = None,
+                     result_format = "rows", timeout = None, use_cache = False):
+        """
+        Execute SQL query and return one page of its rows
+
+        Read-only statements ending in ORDER BY plain columns are paged with
+        keyset predicates (Postgres), so every page is a fresh, index-friendly
+        query. Other statements keep a server-side cursor open between pages;
+        at most QUERY_PAGE_CURSORS are held, each for QUERY_PAGE_CURSOR_TTL
+        idle seconds.
+
+        Args:
+            query: SQL query string
+            params: (Optional) Query parameter
+            page_size: Max rows per page
+            page_token: (Optional) Token of the previous page, for the same query and params
+            result_format: "rows" or "columnar" (see execute_query)
+            timeout: (Optional) Statement timeout in seconds (see execute_query)
+            use_cache: Serve and store pages in the query cache. Pages continued
+                on a held cursor are never cached, as their token works only once
+        Returns:
+            (page result, token of the next page or None on the last page)
+        Raises:
+            ValueError: the token is invalid, or its cursor expired
+        """
+        if not is_read_only(query):
+            # Writes run to completion in one go; their rows come back as a single page
+            return self.execute_query(query, params, result_format = result_format, timeout = timeout), None
+        query_key = self.cache.make_key(query, params, "page")
+        state = decode_token(page_token, query_key) if page_token else {}
+        key = self._page_cache_key(query, params, page_size, page_token, state, result_format) if use_cache else None
+        if key:
+            hit, page = self.cache.get(key)
+            if hit:
+                return page
+        self._close_cursors(self.cursors.sweep())
+        if "cursor" in state:
+            return self._cursor_page(self._take_cursor(state["cursor"]), page_size, query_key, result_format)
+
+        after = state.get("after")
+        plan = self._keyset_plan(query)
+        if plan:
+            sql, keys = plan.statement(after, limit = page_size + 1)
+            try:
+                with self.connect(read_only = True) as connection:
+                    columns, rows = self._execute_rows(connection, sql, {**(params or {}), **keys},
+                                                       self._timeout(timeout))
+            except ProgrammingError:
+                # The ORDER BY columns are not output columns; page with a cursor instead
+                if after is not None:
+                    raise
+                plan = None
+            else:
+                count = plan.cut(columns, rows, page_size)
+                if count:
+                    return self._cache_page(key, query, query_key,
+                                            self._keyset_page(plan, columns, rows, count, page_size, query_key,
+                                                              result_format))
+
+        # Not keyset-able, or the whole page shares one key: continue on a cursor
+        sql, keys = plan.statement(after) if plan else (query, {})
+        connection, replica = self._checkout(read_only = True)
+        cursor = HeldCursor(connection, None, [], replica)
+        try:
+            cursor.columns, cursor.result = self._open_result(connection, sql, {**(params or {}), **keys},
+                                                              self._timeout(timeout))
+        except Exception:
+            self._close_cursors([cursor])
+            raise
+        return self._cache_page(key, query, query_key, self._cursor_page(cursor, page_size, query_key, result_format))
+
+    def _keyset_plan(self, query):
+        if self.engine.dialect.name != "postgresql":
+            return None
+        return KeysetPlan.for_query(query)
+
+    def _page_cache_key(self, query, params, page_size, page_token, state, result_format):
+        """Cache key of a page, None for pages served from a held cursor"""
+        if "cursor" in state:
+            return None
+        return self.cache.make_key(query, params, f"page:{page_size}:{result_format}:{page_token or ''}")
+
+    def _cache_page(self, key, query, query_key, page):
+        """Store a page unless its token continues a held cursor"""
+        token = page[1]
+        if key and (token is None or "cursor" not in decode_token(token, query_key)):
+            self.cache.set(key, page, read_tables(query))
+        return page
+
+    @staticmethod
+    def _keyset_page(plan, columns, rows, count, page_size, query_key, result_format):
+        token = None
+        if len(rows) > page_size:
+            token = encode_token(query_key, after = plan.key(columns, rows[count - 1]))
+        return format_page(columns, rows[:count], result_format), token
+
+    def _take_cursor(self, cursor_id):
+        cursor = self.cursors.take(cursor_id)
+        if cursor is None:
+            raise ValueError("Page token expired; run the query again")
+        return cursor
+
+    def _cursor_page(self, cursor, page_size, query_key, result_format):
+        """Return the next page of a held cursor, holding it again if rows remain"""
+        try:
+            rows = cursor.pending + self._fetch_rows(None, cursor.result, page_size + 1 - len(cursor.pending))
+        except Exception:
+            self._close_cursors([cursor])
+            raise
+        page, token = self._split_cursor_page(cursor, rows, page_size, query_key)
+        if token is None:
+            self._close_cursors([cursor])
+        return format_page(cursor.columns, page, result_format), token
+
+    def _split_cursor_page(self, cursor, rows, page_size, query_key):
+        page, cursor.pending = rows[:page_size], rows[page_size:]
+        if not cursor.pending:
+            return page, None
+        self._close_cursors(self.cursors.sweep(reserve = 1))
+        return page, encode_token(query_key, cursor = self.cursors.put(cursor))
+
+    def _close_cursors(self, cursors):
+        for cursor in cursors:
+            try:
+                if cursor.result is not None:
+                    cursor.result.close()
+                cursor.connection.close()
+            except Exception as e:
+                logger.warning(f"Failed to close held cursor: {e}")
+            finally:
+                if cursor.replica is not None:
+                    self.router.release(cursor.replica)
+
+    def close_cursors(self):
+        """Close all held page cursors"""
+        self._close_cursors(self.cursors.clear())
+
+    @staticmethod
+    def _execute_rows(connection, query, params, timeout):
+        """Run a statement and fetch all rows as tuples (shared with AsyncDatabase via run_sync)"""
+        with QueryTimer("page") as timer:
+            set_statement_timeout(connection, timeout)
+            result = connection.execute(text(query), params)
+            if not result.returns_rows:
+                return [], []
+            rows = result.fetchall()
+            timer.rows = len(rows)
+        return list(result.keys()), rows
+
+    @staticmethod
+    def _open_result(connection, query, params, timeout):
+        """Start a statement whose rows are fetched later, through a server-side cursor for SELECTs"""
+        set_statement_timeout(connection, timeout)
+        if is_select(query):
+            connection = connection.execution_options(stream_results = True)
+        result = connection.execute(text(query), params)
+        return (list(result.keys()) if result.returns_rows else []), result
+
+    @staticmethod
+    def _fetch_rows(connection, result, count):
+        """Fetch up to count rows of an open result (connection is unused; for run_sync)"""
+        if not result.returns_rows or count <= 0:
+            return []
+        return result.fetchmany(count)
+
+class AsyncDatabase(Database):
+    """
+    Database management class on SQLAlchemy's async engine (asyncpg)
+
+    Same interface as Database, but the query methods are coroutines, so
+    API handlers wait on Postgres without holding a threadpool thread.
+    """
+
+    def __init__(self, db_url=None, replica_urls=None):
+        super().__init__(to_async_url(db_url or settings.DATABASE_URL), replica_urls)
+        self.replica_urls = [to_async_url(url) for url in self.replica_urls]
+
+    def engine_options(self, db_url=None):
+        """
+        Pool settings plus the asyncpg prepared statement cache
+
+        asyncpg prepares every statement and keeps it on the connection by
+        SQL text, so a parameterized template is planned once per connection
+        however its parameters vary, while inlined literals miss every time.
+        """
+        options = super().engine_options(db_url)
+        if make_url(db_url or self.db_url).get_driver_name() == "asyncpg":
+            options["connect_args"] = {"prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE}
+        return options
+
+    def init_db(self):
+        """Initalize database"""
+        try:
+            engine = create_async_engine(self.db_url, **self.engine_options())
+            self.pool_monitor = PoolMonitor(engine.sync_engine)
+            track_backend_pids(engine.sync_engine)
+            self.router = self._create_router(create_async_engine)
+            self.SessionLocal = async_sessionmaker(autocommit = False,
+                                                   autoflush  = False,
+                                                   bind       = engine)
+            self.Base = declarative_base()
+            self._engine = engine
+            logger.info("Async database connection established")
+        except Exception as e:
+            logger.error(f"Database connection failed: {e}")
+            raise
+
+    async def warm_up_pool(self, count = None):
+        """Open pool connections ahead of the first request (see Database.warm_up_pool)"""
+        count = min(settings.DB_POOL_WARMUP if count is None else count, settings.DB_POOL_SIZE)
+        connections = []
+        try:
+            for _ in range(count):
+                connections.append(await self.engine.connect())
+        except Exception as e:
+            logger.warning(f"Pool warm-up stopped after {len(connections)} connections: {e}")
+        finally:
+            for connection in connections:
+                await connection.close()
+        logger.info(f"Pool warmed up with {len(connections)} connections")
+        return len(connections)
+
+    async def dispose(self):
+        """Close the pooled connections of the primary and the replicas"""
+        if not self.initialized:
+            return
+        await self.engine.dispose()
+        for replica in self.router.replicas if self.router else []:
+            await replica.engine.dispose()
+
+    @asynccontextmanager
+    async def connect(self, read_only = False):
+        """Check out a pooled connection, on a replica if read_only (see Database.connect)"""
+        connection, replica = await self._checkout(read_only)
+        try:
+            yield connection
+        finally:
+            await connection.close()
+            if replica is not None:
+                self.router.release(replica)
+
+    async def _checkout(self, read_only = False):
+        """Open a connection on a replica or the primary (see Database._checkout)"""
+        replica = await self._acquire_replica() if read_only else None
+        if replica is not None:
+            try:
+                return await replica.engine.connect(), replica
+            except Exception as e:
+                logger.warning(f"Replica {replica.url} unavailable, using the primary: {e}")
+                self.router.record_check(replica, None)
+                self.router.release(replica)
+        started = time.perf_counter()
+        connection = await self.engine.connect()
+        self.pool_monitor.record_wait(time.perf_counter() - started)
+        return connection, None
+
+    async def _acquire_replica(self):
+        self.engine
+        if self.router is None:
+            return None
+        for replica in self.router.due_for_check():
+            await self._check_replica(replica)
+        return self.router.acquire()
+
+    async def _check_replica(self, replica):
+        try:
+            async with replica.engine.connect() as connection:
+                lag = await connection.run_sync(measure_lag)
+        except Exception as e:
+            logger.warning(f"Replica {replica.url} check failed: {e}")
+            lag = None
+        self.router.record_check(replica, lag)
+
+    async def get_session(self):
+        """Return database session"""
+        self.engine
+        async with self.SessionLocal() as db:
+            yield db
+
+    async def cancel_backend(self, pid, engine = None):
+        """Cancel the statement running on a Postgres backend (see Database.cancel_backend)"""
+        if pid is None:
+            return False
+        try:
+            async with (engine or self.engine).connect() as connection:
+                result = await connection.execute(text("SELECT pg_cancel_backend(:pid)"), {"pid": pid})
+                return bool(result.scalar())
+        except Exception as e:
+            logger.warning(f"Could not cancel backend {pid}: {e}")
+            return False
+
+    async def execute_query(self, query, params = None, result_format = "rows", use_cache = False, timeout = None):
+        """
+        Execute SQL query (see Database.execute_query)
+
+        Cancelling the awaiting task also cancels the statement on the server.
+        """
+        key = self._cache_key(query, params, result_format) if use_cache else None
+        if key:
+            hit, result = self.cache.get(key)
+            if hit:
+                return result
+        try:
+            async with self.connect(read_only = is_read_only(query)) as connection:
+                pid = self.backend_pid(connection)
+                try:
+                    result = await connection.run_sync(self._execute, query, params, result_format,
+                                                       self._timeout(timeout))
+                except asyncio.CancelledError:
+                    await self.cancel_backend(pid, connection.engine)
+                    raise
+        except Exception as e:
+            log_query_failure(f"Query execution failed: {e}", query, params)
             raise
+        self._update_cache(key, query, result)
+        return result
+
+    async def guard_query(self, query, params = None, inject_limit = True):
+        """Check a statement's planner estimate before it runs (see Database.guard_query)"""
+        async with self.connect(read_only = is_read_only(query)) as connection:
+            return await connection.run_sync(self._guard, query, params, inject_limit)
+
+    async def execute_batch(self, statements, result_format = "rows", timeout = None, guard = True, snapshot = False):
+        """
+        Run independent statements concurrently (see Database.execute_batch)
+
+        Cancelling the awaiting task cancels every statement still running.
+        """
+        self._check_batch(statements, snapshot)
+        timeout = self._timeout(timeout)
+        slots = asyncio.Semaphore(settings.QUERY_BATCH_CONCURRENCY)
+
+        async def run(index, engine = None, snapshot_id = None):
+            query, params = statements[index]
+            async with slots:
+                started = time.perf_counter()
+                try:
+                    async with engine.connect() if engine else self.connect(read_only = is_read_only(query)) as connection:
+                        pid = self.backend_pid(connection)
+                        try:
+                            entry = await connection.run_sync(self._batch_statement, query, params, result_format,
+                                                              timeout, guard, snapshot_id)
+                        except asyncio.CancelledError:
+                            await self.cancel_backend(pid, connection.engine)
+                            raise
+                except Exception as e:
+                    entry = self._batch_error(e, query, params)
+                return {"index": index, **entry, "elapsed_ms": round((time.perf_counter() - started) * 1000, 3)}
+
+        if not snapshot:
+            return list(await asyncio.gather(*(run(index) for index in range(len(statements)))))
+        async with self.connect(read_only = True) as leader:
+            snapshot_id = await leader.run_sync(self._begin_snapshot)
+            return list(await asyncio.gather(*(run(index, leader.engine, snapshot_id)
+                                               for index in range(len(statements)))))
+
+    async def stream_query(self, query, params = None, batch_size = None, use_cache = False, timeout = None,
+                           operation = "stream"):
+        """
+        Execute SQL query through a server-side cursor (see Database.stream_query)
+
+        Cancelling the consuming task, as Starlette does when a streaming
+        client disconnects, also cancels the statement on the server.
+        """
+        batch_size = batch_size or settings.QUERY_STREAM_BATCH_SIZE
+        key = self._cache_key(query, params, "rows") if use_cache else None
+        cached = self._cached_batches(key, batch_size) if key else None
+        if cached is not None:
+            for batch in cached:
+                yield batch
+            return
+
+        capture = ResultCapture(self.cache.max_entry_bytes) if key else None
+        try:
+            async with self.connect(read_only = is_read_only(query)) as connection:
+                pid = self.backend_pid(connection)
+                try:
+                    with QueryTimer(operation) as timer:
+                        await connection.run_sync(set_statement_timeout, self._timeout(timeout))
+                        if is_select(query):
+                            result = await connection.stream(text(query), params or {})
+                            columns = list(result.keys())
+                            timer.rows = 0
+                            async for partition in result.partitions(batch_size):
+                                batch = [dict(zip(columns, row)) for row in partition]
+                                timer.rows += len(batch)
+                                if capture:
+                                    capture.add(batch)
+                                yield batch
+                        else:
+                            result = await connection.execute(text(query), params or {})
+                            if result.returns_rows:
+                                batch = [dict(row) for row in result.mappings()]
+                                timer.rows = len(batch)
+                                yield batch
+                except asyncio.CancelledError:
+                    await self.cancel_backend(pid, connection.engine)
+                    raise
+        except Exception as e:
+            log_query_failure(f"Query streaming failed: {e}", query, params)
+            raise
+        if capture is None:
+            self._update_cache(None, query, None)
+        elif capture.complete:
+            self._update_cache(key, query, capture.rows, size=capture.size)
+
+    async def export_query(self, query, params = None, export_format = "csv", timeout = None):
+        """
+        Stream the rows of a statement as CSV or Parquet (see Database.export_query)
+
+        Yields:
+            bytes: chunks of the export file
+        """
+        timeout = settings.EXPORT_TIMEOUT if timeout is None else timeout
+        if export_format == "csv" and self.engine.dialect.name == "postgresql":
+            async for chunk in self._copy_csv(query, params, timeout):
+                yield chunk
+            return
+        encoder = encoder_for(export_format)
+        async for batch in self.stream_query(query, params, batch_size = settings.EXPORT_ROW_GROUP_ROWS,
+                                             timeout = timeout, operation = "export"):
+            chunk = encoder.write(batch)
+            if chunk:
+                yield chunk
+        yield encoder.close()
+
+    async def _copy_csv(self, query, params, timeout):
+        """
+        CSV chunks of COPY ... TO STDOUT, read through asyncpg's copy protocol
+
+        The copy runs in a task feeding a small bounded queue, so a slow
+        client slows the copy down instead of buffering the result. A client
+        that goes away cancels the statement on the server.
+        """
+        async with self.connect(read_only = True) as connection:
+            pid = self.backend_pid(connection)
+            await connection.run_sync(set_statement_timeout, timeout)
+            sql, args = compile_statement(connection.dialect, query, params)
+            driver = (await connection.get_raw_connection()).driver_connection
+            chunks = asyncio.Queue(maxsize = EXPORT_QUEUE_CHUNKS)
+            abandoned = False
+
+            async def output(chunk):
+                if not abandoned:
+                    await chunks.put(chunk if chunk is None else bytes(chunk))
+
+            async def copy():
+                try:
+                    # Status is "COPY <rows>"
+                    status = await driver.copy_from_query(sql, *args, output = output, format = "csv", header = True)
+                    timer.rows = int(status.split()[-1])
+                finally:
+                    await output(None)
+
+            timer = QueryTimer("export")
+            task = asyncio.ensure_future(copy())
+            try:
+                with timer:
+                    while (chunk := await chunks.get()) is not None:
+                        yield chunk
+                    await task
+            finally:
+                if not task.done():
+                    # Stop the copy on the server, then let the task read the error to the end
+                    abandoned = True
+                    while not chunks.empty():
+                        chunks.get_nowait()
+                    await self.cancel_backend(pid, connection.engine)
+                    await asyncio.gather(task, return_exceptions = True)
+
+    async def execute_page(self, query, params = None, page_size = 100, page_token = None,
+                           result_format = "rows", timeout = None, use_cache = False):
+        """Execute SQL query and return one page of its rows (see Database.execute_page)"""
+        if not is_read_only(query):
+            return await self.execute_query(query, params, result_format = result_format, timeout = timeout), None
+        query_key = self.cache.make_key(query, params, "page")
+        state = decode_token(page_token, query_key) if page_token else {}
+        key = self._page_cache_key(query, params, page_size, page_token, state, result_format) if use_cache else None
+        if key:
+            hit, page = self.cache.get(key)
+            if hit:
+                return page
+        await self._close_cursors(self.cursors.sweep())
+        if "cursor" in state:
+            return await self._cursor_page(self._take_cursor(state["cursor"]), page_size, query_key, result_format)
+
+        after = state.get("after")
+        plan = self._keyset_plan(query)
+        if plan:
+            sql, keys = plan.statement(after, limit = page_size + 1)
+            try:
+                async with self.connect(read_only = True) as connection:
+                    pid = self.backend_pid(connection)
+                    try:
+                        columns, rows = await connection.run_sync(self._execute_rows, sql, {**(params or {}), **keys},
+                                                                  self._timeout(timeout))
+                    except asyncio.CancelledError:
+                        await self.cancel_backend(pid, connection.engine)
+                        raise
+            except ProgrammingError:
+                if after is not None:
+                    raise
+                plan = None
+            else:
+                count = plan.cut(columns, rows, page_size)
+                if count:
+                    return self._cache_page(key, query, query_key,
+                                            self._keyset_page(plan, columns, rows, count, page_size, query_key,
+                                                              result_format))
+
+        sql, keys = plan.statement(after) if plan else (query, {})
+        connection, replica = await self._checkout(read_only = True)
+        cursor = HeldCursor(connection, None, [], replica)
+        try:
+            cursor.columns, cursor.result = await connection.run_sync(self._open_result, sql,
+                                                                      {**(params or {}), **keys},
+                                                                      self._timeout(timeout))
+        except BaseException:
+            await self._close_cursors([cursor])
+            raise
+        return self._cache_page(key, query, query_key,
+                                await self._cursor_page(cursor, page_size, query_key, result_format))
+
+    async def _cursor_page(self, cursor, page_size, query_key, result_format):
+        try:
+            rows = cursor.pending + await cursor.connection.run_sync(
+                self._fetch_rows, cursor.result, page_size + 1 - len(cursor.pending))
+        except BaseException:
+            await self._close_cursors([cursor])
+            raise
+        page, token = self._split_cursor_page(cursor, rows, page_size, query_key)
+        if token is None:
+            await self._close_cursors([cursor])
+        return format_page(cursor.columns, page, result_format), token
+
+    def _split_cursor_page(self, cursor, rows, page_size, query_key):
+        page, cursor.pending = rows[:page_size], rows[page_size:]
+        if not cursor.pending:
+            return page, None
+        # Evicted cursors are closed in the background; this path is synchronous
+        evicted = self.cursors.sweep(reserve = 1)
+        if evicted:
+            asyncio.ensure_future(self._close_cursors(evicted))
+        return page, encode_token(query_key, cursor = self.cursors.put(cursor))
+
+    async def _close_cursors(self, cursors):
+        for cursor in cursors:
+            try:
+                await cursor.connection.close()
+            except Exception as e:
+                logger.warning(f"Failed to close held cursor: {e}")
+            finally:
+                if cursor.replica is not None:
+                    self.router.release(cursor.replica)
+
+    async def close_cursors(self):
+        """Close all held page cursors"""
+        await self._close_cursors(self.cursors.clear())
 
 class SchemaManager:
-    """Database schema managing class"""
+    """
+    Database schema managing class
+
+    Reflected schema is kept as a versioned SchemaSnapshot. A snapshot older
+    than SCHEMA_MAX_AGE is revalidated with one catalog fingerprint query,
+    and only tables whose fingerprint changed are reflected again. Nothing
+    is reflected until first use or warm_up().
+
+    With SCHEMA_SNAPSHOT_PATH set, every new version is written to disk and
+    a restart starts from that file, so only the fingerprint query and the
+    tables changed in between hit the catalog. If the database is down, the
+    file is served as is and stale stays True until a revalidation succeeds.
+    """
     
-    def __init__(self, database: Database):
-        self.engine = database.engine
-        self.inspector = inspect(self.engine)
-        self.metadata = MetaData()
-        self.metadata.reflect(bind=self.engine)
+    def __init__(self, database: Database, snapshot_path=None):
+        self.database = database
+        self.snapshot_path = settings.SCHEMA_SNAPSHOT_PATH if snapshot_path is None else snapshot_path
+        self._metadata = None
+        self._snapshot = None
+        self._retry_at = 0.0
+        self.stale = False
+        self._refresh_lock = threading.Lock()
+        self.renderer = SchemaRenderer()
+        self.statistics = StatisticsCatalog()
+        self.search_index = SchemaSearch()
+        self.joins = JoinPlanner()
+
+    @property
+    def engine(self):
+        return self.database.engine
+
+    @property
+    def metadata(self):
+        """MetaData with all tables, reflected on first access"""
+        if self._metadata is None:
+            metadata = MetaData()
+            metadata.reflect(bind=self.engine)
+            self._metadata = metadata
+        return self._metadata
+
+    @property
+    def is_ready(self):
+        """Whether a schema snapshot is available to serve"""
+        return self._snapshot is not None
+
+    def warm_up(self):
+        """
+        Open pool connections and reflect the schema ahead of the first request
+
+        A persisted snapshot is served as soon as it is loaded, while it is
+        revalidated against the catalog.
+
+        Returns:
+            bool: True if the schema snapshot is ready
+        """
+        self.load_snapshot()
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.warning(f"Schema warm-up failed: {e}")
+            self.stale = self._snapshot is not None
+        self.database.warm_up_pool()
+        return self.is_ready
+
+    @property
+    def snapshot_source(self):
+        """Database identity stored with a persisted snapshot (URL without password or driver)"""
+        url = make_url(self.database.db_url)
+        return url.set(drivername=url.get_backend_name(), password=None).render_as_string()
+
+    def load_snapshot(self):
+        """
+        Adopt the snapshot persisted at snapshot_path, if there is no snapshot yet
+
+        Returns:
+            bool: True if a snapshot was loaded
+        """
+        if not self.snapshot_path or self._snapshot is not None:
+            return False
+        snapshot = load_snapshot(self.snapshot_path, self.snapshot_source)
+        if snapshot is None:
+            return False
+        self._snapshot = snapshot
+        logger.info(f"Loaded schema snapshot {snapshot.version} from {self.snapshot_path}")
+        return True
+
+    def save_snapshot(self):
+        """Persist the current snapshot to snapshot_path (no-op when unset)"""
+        if not self.snapshot_path or self._snapshot is None:
+            return
+        try:
+            save_snapshot(self._snapshot, self.snapshot_path, self.snapshot_source)
+        except OSError as e:
+            logger.warning(f"Could not persist schema snapshot to {self.snapshot_path}: {e}")
+
+    @property
+    def schema_version(self):
+        """Version of the current snapshot (None before the first reflection)"""
+        return self._snapshot.version if self._snapshot else None
+
+    def snapshot(self):
+        """
+        Return the schema snapshot, revalidating it when older than SCHEMA_MAX_AGE
+
+        While another caller is revalidating, the current snapshot is served
+        instead of waiting. When the catalog cannot be reached, the last
+        snapshot (possibly the persisted one) is served with stale set, and
+        revalidation is retried every SCHEMA_RETRY_INTERVAL seconds.
+        """
+        if self._snapshot is None:
+            self.load_snapshot()
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.is_stale(settings.SCHEMA_MAX_AGE):
+            if snapshot is not None and (self._refresh_lock.locked() or time.monotonic() < self._retry_at):
+                return snapshot
+            try:
+                snapshot = self.refresh(max_age=settings.SCHEMA_MAX_AGE)
+            except Exception as e:
+                if snapshot is None:
+                    raise
+                self._serve_stale(snapshot, e)
+        return snapshot
+
+    def _serve_stale(self, snapshot, error):
+        if not self.stale:
+            logger.warning(f"Schema revalidation failed, serving stale snapshot {snapshot.version}: {error}")
+        self.stale = True
+        self._retry_at = time.monotonic() + SCHEMA_RETRY_INTERVAL
+
+    def refresh(self, max_age=None):
+        """
+        Revalidate the snapshot against the catalog
+
+        Args:
+            max_age: (Optional) Skip the check if another caller validated
+                the snapshot within this many seconds
+        Returns:
+            SchemaSnapshot: current snapshot
+        """
+        with self._refresh_lock:
+            if max_age is not None and self._snapshot and not self._snapshot.is_stale(max_age):
+                return self._snapshot
+            previous = self._snapshot
+            with self.engine.connect() as connection:
+                self._snapshot = self._refresh(connection)
+            self.stale = False
+            if previous is None or previous.version != self._snapshot.version:
+                self.save_snapshot()
+        return self._snapshot
+
+    def _refresh(self, connection):
+        """Build the next snapshot on a sync connection (shared with AsyncSchemaManager via run_sync)"""
+        previous = self._snapshot
+        fingerprints = table_fingerprints(connection)
+        if fingerprints is None:
+            tables = inspect(connection).get_table_names()
+            return SchemaSnapshot(reflect_tables(connection, tables, engine=self._sync_engine()))
+
+        if previous is not None and previous.fingerprints == fingerprints:
+            return SchemaSnapshot(previous.schema, fingerprints, version=previous.version)
+
+        changed = previous.changed_tables(fingerprints) if previous else list(fingerprints)
+        if previous is not None:
+            # A renamed or dropped table leaves the fingerprints of tables referring to it as they were,
+            # but their foreign keys name it; reflect them again too
+            removed = set(previous.schema) - set(fingerprints)
+            changed += [table for table in previous.referencing_tables(removed)
+                        if table in fingerprints and table not in changed]
+        reflected = reflect_tables(connection, changed, engine=self._sync_engine())
+        schema = {table: reflected[table] if table in reflected else previous.schema[table]
+                  for table in fingerprints}
+        snapshot = SchemaSnapshot(schema, fingerprints)
+        logger.info(f"Schema snapshot {snapshot.version}: reflected {len(changed)} of {len(schema)} tables")
+        return snapshot
+
+    def _sync_engine(self):
+        """Engine for the thread-pool reflection fallback (None on async engines)"""
+        return self.engine
     
     def get_tables(self):
         """Check table list"""
-        return self.inspector.get_table_names()
+        return self.snapshot().tables
     
     def get_schema(self):
         """
         Check database schema info
 
+        Served from the snapshot; the returned dictionary is shared and must
+        not be mutated.
+
         Returns:
             Dictionary containing information of table, column, relation
         """
+        return self.snapshot().schema
+    
+    def get_schema_as_string(self, tables=None, max_chars=None, max_tokens=None):
+        """
+        Convert database schema into compact DDL-like text
+
+        Table fragments are memoized per schema version (see SchemaRenderer).
 
-        schema_info = {}
-        tables = self.get_tables()
-
-        for table in tables:
-            # Column info
-            columns = []
-            for column in self.inspector.get_columns(table):
-                columns.append({
-                    "name"    : column["name"],
-                    "type"    : str(column["type"]),
-                    "nullable": column.get("nullable", True),
-                    "default" : str(column.get("default", ""))
-                })
-            # Primary key
-            pk = self.inspector.get_pk_constraint(table)
-            primary_keys = pk.get("constrained_columns", [])
-
-            # Foreign key
-            foreign_keys = []
-            for fk in self.inspector.get_foreign_keys(table):
-                foreign_keys.append({
-                    "constrained_columns": fk.get("constrained_columns", []),
-                    "referred_table"     : fk.get("referred_table", ""),
-                    "referred_columns"   : fk.get("referred_columns", [])
-                })
-
-            # Index
-            indices = []
-            for index in self.inspector.get_indexes(table):
-                indices.append({
-                    "name"   : index.get("name", ""),
-                    "columns": index.get("column_names", []),
-                    "unique" : index.get("unique", False)
-                })
-
-            # Add table info
-            schema_info[table] = {
-                "columns"     : columns,
-                "primary_keys": primary_keys,
-                "foreign_keys": foreign_keys,
-                "indices"     : indices
-            }
-        return schema_info
+        Args:
+            tables: (Optional) table names to include, default all
+            max_chars: (Optional) character budget
+            max_tokens: (Optional) estimated token budget
+
+        Returns:
+            str: Schema information, one CREATE TABLE line per table
+        """
+        return self.renderer.render(self.snapshot(), tables, max_chars=max_chars, max_tokens=max_tokens)
     
-    def get_schema_as_string(self):
+    def get_table_sample_data(self, table_name, limit=5, result_format="rows"):
         """
-        Convert database schema into string format
+        Check sample data of table
 
+        Rows are drawn at random (see sampling.sample_rows) and cached in the
+        query cache per table, limit and schema version; writes to the table
+        through the same database invalidate them.
+
+        Args:
+            table_name: name of table
+            limit: max row number to check
+            result_format: "rows" or "columnar" (see Database.execute_query)
+        
         Returns:
-            str: Schema information
+            list: sample data
+        Raises:
+            ValueError: the table does not exist
         """
-        schema = self.get_schema()
-        result = []
+        snapshot = self.snapshot()
+        key = self._sample_key(snapshot, table_name, limit, result_format)
+        hit, sample = self.database.cache.get(key)
+        if hit:
+            return sample
+        try:
+            with self.database.connect(read_only = True) as connection:
+                columns, rows = self._sample(connection, table_name, limit)
+        except Exception as e:
+            logger.error(f"Failed to get sample data for table {table_name}: {e}")
+            return [] if result_format == "rows" else to_columnar([], [])
+        sample = format_page(columns, rows, result_format)
+        self.database.cache.set(key, sample, [table_name])
+        return sample
 
-        for table_name, table_info in schema.items():
-            table_str = f"Table: {table_name}\n"
+    def search_schema(self, query, limit=10):
+        """
+        Tables most relevant to a question, ranked by BM25
 
-            # Column info
-            table_str += "Columns:\n"
-            for col in table_info["columns"]:
-                nullable = "NULL" if col["nullable"] else "NOT NULL"
-                default  = f"DEFAULT {col['default']}" if col["default"] != "None" else ""
-                primary  = "PRIMARY KEY" if col["name"] in table_info["primary_keys"] else ""
+        Table and column names, comments and the names of FK neighbours are
+        indexed once per schema version (see search.SchemaSearch).
 
-                table_str += f"  - {col['name']} {col['type']} {nullable} {default} {primary}\n"
+        Args:
+            query: question or keywords
+            limit: number of tables to return
 
-            # Foreign key info
-            if table_info["foreign_keys"]:
-                table_str += "Foreign Keys: \n"
-                for fk in table_info["foreign_keys"]:
-                    table_str += f"  - {', '.join(fk['constrained_columns'])} REFERENCES {fk['referred_table']}({', '.join(fk['referred_columns'])})\n"
-            
-            result.append(table_str)
+        Returns:
+            list: [{"table", "score", "matched"}], best first
+        """
+        return self.search_index.search(self.snapshot(), query, limit)
 
-        return "\n".join(result)
-    
-    def get_table_sample_data(self, table_name, limit=5):
+    def find_joins(self, tables):
         """
-        Check sample data of table
+        Join tree connecting tables along foreign keys
+
+        The FK graph is built once per schema version and shortest paths are
+        cached per table (see joins.JoinGraph).
+
+        Args:
+            tables: table names; the first one is the root of the tree
+        Returns:
+            dict: tables in join order, joins with ON clauses, the FROM
+                clause, and tables no foreign key path reaches
+        """
+        return self.joins.join_tree(self.snapshot(), tables)
+
+    def get_column_stats(self, table_name, columns=None):
+        """
+        Planner statistics of a table's columns (PostgreSQL)
+
+        Row estimate, null fraction, distinct count, most common values and
+        histogram bounds, read from pg_stats and cached until the table is
+        analyzed again (see statistics.StatisticsCatalog). Read from the
+        primary, since standbys do not track ANALYZE times.
 
         Args:
             table_name: name of table
-            limit: max row number to check
-        
+            columns: (Optional) column names to include, default all
+
         Returns:
-            list: sample data
+            dict: table statistics
+        Raises:
+            ValueError: the table does not exist or the database is not PostgreSQL
         """
-        query = f"SELECT * FROM {table_name} LIMIT {limit}"
+        with self.engine.connect() as connection:
+            return self.statistics.get(connection, table_name, columns)
+
+    def _sample_key(self, snapshot, table_name, limit, result_format):
+        if table_name not in snapshot.schema:
+            raise ValueError(f"Unknown table: {table_name}")
+        return self.database.cache.make_key(f"sample {table_name}", {"limit": limit},
+                                            f"{snapshot.version}:{result_format}")
+
+    @staticmethod
+    def _sample(connection, table_name, limit):
+        with QueryTimer("sample") as timer:
+            set_statement_timeout(connection, settings.QUERY_TIMEOUT)
+            columns, rows = sample_rows(connection, table_name, limit)
+            timer.rows = len(rows)
+        return columns, rows
+
+class AsyncSchemaManager(SchemaManager):
+    """
+    Database schema managing class for AsyncDatabase
+
+    Reflection runs through run_sync on an async connection, so the
+    inspector logic is shared with SchemaManager. MetaData is only filled
+    by reflect_metadata().
+    """
+
+    def __init__(self, database: AsyncDatabase, snapshot_path=None):
+        self.database = database
+        self.snapshot_path = settings.SCHEMA_SNAPSHOT_PATH if snapshot_path is None else snapshot_path
+        self._metadata = MetaData()
+        self._snapshot = None
+        self._retry_at = 0.0
+        self.stale = False
+        self._refresh_lock = asyncio.Lock()
+        self.renderer = SchemaRenderer()
+        self.statistics = StatisticsCatalog()
+        self.search_index = SchemaSearch()
+        self.joins = JoinPlanner()
+
+    @property
+    def metadata(self):
+        return self._metadata
+
+    async def warm_up(self):
+        """Open pool connections and reflect the schema (see SchemaManager.warm_up)"""
+        await asyncio.to_thread(self.load_snapshot)
         try:
-            return db.execute_query(query)
+            await self.refresh()
+        except Exception as e:
+            logger.warning(f"Schema warm-up failed: {e}")
+            self.stale = self._snapshot is not None
+        await self.database.warm_up_pool()
+        return self.is_ready
+
+    def _sync_engine(self):
+        return None
+
+    async def snapshot(self):
+        """Return the schema snapshot (see SchemaManager.snapshot)"""
+        if self._snapshot is None:
+            await asyncio.to_thread(self.load_snapshot)
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.is_stale(settings.SCHEMA_MAX_AGE):
+            if snapshot is not None and (self._refresh_lock.locked() or time.monotonic() < self._retry_at):
+                return snapshot
+            try:
+                snapshot = await self.refresh(max_age=settings.SCHEMA_MAX_AGE)
+            except Exception as e:
+                if snapshot is None:
+                    raise
+                self._serve_stale(snapshot, e)
+        return snapshot
+
+    async def refresh(self, max_age=None):
+        """Revalidate the snapshot against the catalog (see SchemaManager.refresh)"""
+        async with self._refresh_lock:
+            if max_age is not None and self._snapshot and not self._snapshot.is_stale(max_age):
+                return self._snapshot
+            previous = self._snapshot
+            async with self.engine.connect() as connection:
+                self._snapshot = await connection.run_sync(self._refresh)
+            self.stale = False
+            if previous is None or previous.version != self._snapshot.version:
+                await asyncio.to_thread(self.save_snapshot)
+        return self._snapshot
+
+    async def run_refresher(self, interval=None):
+        """Revalidate the snapshot every interval seconds until cancelled"""
+        interval = interval or settings.SCHEMA_REFRESH_INTERVAL
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Schema refresh failed: {e}")
+                self.stale = self._snapshot is not None
+            await asyncio.sleep(interval)
+
+    async def reflect_metadata(self):
+        """Reflect all tables into self.metadata"""
+        async with self.engine.connect() as connection:
+            await connection.run_sync(self.metadata.reflect)
+
+    async def get_tables(self):
+        """Check table list"""
+        return (await self.snapshot()).tables
+
+    async def get_schema(self):
+        """Check database schema info (see SchemaManager.get_schema)"""
+        return (await self.snapshot()).schema
+
+    async def get_schema_as_string(self, tables=None, max_chars=None, max_tokens=None):
+        """Convert database schema into compact DDL-like text (see SchemaManager.get_schema_as_string)"""
+        return self.renderer.render(await self.snapshot(), tables, max_chars=max_chars, max_tokens=max_tokens)
+
+    async def get_table_sample_data(self, table_name, limit=5, result_format="rows"):
+        """Check sample data of table (see SchemaManager.get_table_sample_data)"""
+        snapshot = await self.snapshot()
+        key = self._sample_key(snapshot, table_name, limit, result_format)
+        hit, sample = self.database.cache.get(key)
+        if hit:
+            return sample
+        try:
+            async with self.database.connect(read_only = True) as connection:
+                columns, rows = await connection.run_sync(self._sample, table_name, limit)
         except Exception as e:
             logger.error(f"Failed to get sample data for table {table_name}: {e}")
-            return []
-        
+            return [] if result_format == "rows" else to_columnar([], [])
+        sample = format_page(columns, rows, result_format)
+        self.database.cache.set(key, sample, [table_name])
+        return sample
+
+    async def search_schema(self, query, limit=10):
+        """Tables most relevant to a question (see SchemaManager.search_schema)"""
+        snapshot = await self.snapshot()
+        # Building the index for a new version is CPU work; keep it off the event loop
+        return await asyncio.to_thread(self.search_index.search, snapshot, query, limit)
+
+    async def find_joins(self, tables):
+        """Join tree connecting tables along foreign keys (see SchemaManager.find_joins)"""
+        snapshot = await self.snapshot()
+        return await asyncio.to_thread(self.joins.join_tree, snapshot, tables)
+
+    async def get_column_stats(self, table_name, columns=None):
+        """Planner statistics of a table's columns (see SchemaManager.get_column_stats)"""
+        async with self.engine.connect() as connection:
+            return await connection.run_sync(self.statistics.get, table_name, columns)
+
+# Sync instances for scripts and the agents (engines are created on first use)
 db = Database()
-schema_manager = SchemaManager(database=db)
\ No newline at end of file
+schema_manager = SchemaManager(database=db)
+
+# Async instances used by the API routers
+async_db = AsyncDatabase()
+async_schema_manager = AsyncSchemaManager(database=async_db)
\ No newline at end of file
@@ -0,0 +1,230 @@
+"""Constant-memory Excel workbooks of query results"""
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from datetime import datetime, time as time_of_day, timezone
+from uuid import UUID
+from .serialization import json_default
+
+logger = logging.getLogger(__name__)
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Rows per worksheet, header included, and characters per cell Excel accepts
+EXCEL_MAX_ROWS = 1048576
+EXCEL_MAX_CELL_CHARS = 32767
+
+_SHEET_TITLE_INVALID = re.compile(r"[\[\]:*?/\\]")
+# Control characters are not allowed in the XML of a worksheet
+_ILLEGAL_CHARACTERS = re.compile(r"[\000-\010]|[\013-\014]|[\016-\037]")
+
+def excel_value(value):
+    """Convert a database value to one a worksheet cell can hold"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        return _ILLEGAL_CHARACTERS.sub("", value)[:EXCEL_MAX_CELL_CHARS]
+    if isinstance(value, (datetime, time_of_day)) and value.tzinfo is not None:
+        # Excel has no time zones; write UTC wall-clock time
+        if isinstance(value, datetime):
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.replace(tzinfo=None)
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=json_default)[:EXCEL_MAX_CELL_CHARS]
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return json_default(value)[:EXCEL_MAX_CELL_CHARS]
+    return value
+
+def sheet_title(name, index=1):
+    """Valid worksheet title for the index-th sheet (1-based) of a result"""
+    name = _SHEET_TITLE_INVALID.sub("_", name or "").strip("'") or "Result"
+    if index == 1:
+        return name[:31]
+    suffix = f" ({index})"
+    return name[:31 - len(suffix)] + suffix
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+class WorkbookWriter:
+    """
+    Write-only xlsx workbook filled from row batches
+
+    Rows go through openpyxl's write-only mode, which streams every sheet
+    to disk with inline strings, so memory stays flat however many rows
+    are written. When a sheet reaches max_rows (header included), the
+    rest continues on a new sheet with the same header. Requires openpyxl,
+    imported lazily.
+    """
+
+    def __init__(self, path, sheet_name="Result", max_rows=EXCEL_MAX_ROWS):
+        try:
+            from openpyxl import Workbook
+            from openpyxl.cell import WriteOnlyCell
+        except ImportError as e:
+            raise RuntimeError("Excel export requires openpyxl to be installed") from e
+        self.path = path
+        self.sheet_name = sheet_name
+        self.max_rows = min(max(int(max_rows), 2), EXCEL_MAX_ROWS)
+        self.rows = 0
+        self.sheets = 0
+        self._cell = WriteOnlyCell
+        self._workbook = Workbook(write_only=True)
+        self._columns = None
+        self._sheet = None
+        self._sheet_rows = 0
+
+    def write(self, batch):
+        """Append a list of row dicts (see AsyncDatabase.stream_query)"""
+        if not batch:
+            return
+        if self._columns is None:
+            self._columns = list(batch[0].keys())
+        for row in batch:
+            if self._sheet is None or self._sheet_rows >= self.max_rows:
+                self._add_sheet()
+            self._sheet.append([self._cell_value(value) for value in row.values()])
+            self._sheet_rows += 1
+            self.rows += 1
+
+    def _add_sheet(self):
+        self.sheets += 1
+        self._sheet = self._workbook.create_sheet(sheet_title(self.sheet_name, self.sheets))
+        self._sheet.append(self._columns or [])
+        self._sheet_rows = 1
+
+    def _cell_value(self, value):
+        value = excel_value(value)
+        if isinstance(value, str) and value.startswith("="):
+            # openpyxl would store it as a formula
+            cell = self._cell(self._sheet, value=value)
+            cell.data_type = "s"
+            return cell
+        return value
+
+    def close(self):
+        """Finish the workbook and write it to path"""
+        if self._sheet is None:
+            self._add_sheet()
+        self._workbook.save(self.path)
+
+    def abort(self):
+        """Drop an unfinished workbook, closing its sheets and removing their temp files"""
+        for sheet in self._workbook.worksheets:
+            writer = sheet._writer
+            if writer is None:
+                continue
+            try:
+                if sheet._rows is not None:
+                    sheet._rows.close()
+                writer.close()
+                if os.path.exists(writer.out):
+                    writer.cleanup()
+            except Exception as e:
+                logger.warning(f"Failed to remove worksheet temp file: {e}")
+
+class ExcelJob:
+    """A workbook being written in the background, and its progress"""
+
+    def __init__(self, path, sql_query):
+        self.path = path
+        self.sql_query = sql_query
+        self.state = "running"
+        self.rows = 0
+        self.sheets = 0
+        self.error = None
+        self.expires = 0.0
+        self.task = None
+
+    async def run(self, writer, batches):
+        """
+        Write row batches into a WorkbookWriter, tracking progress
+
+        Writing happens in a worker thread, one batch at a time, so the
+        event loop keeps serving requests (and status polls) meanwhile.
+        """
+        try:
+            async with contextlib.aclosing(batches):
+                async for batch in batches:
+                    await asyncio.to_thread(writer.write, batch)
+                    self.rows, self.sheets = writer.rows, writer.sheets
+            await asyncio.to_thread(writer.close)
+            self.sheets = writer.sheets
+            self.state = "completed"
+        except asyncio.CancelledError:
+            self.fail("Excel export was cancelled", writer)
+            raise
+        except Exception as e:
+            self.fail(e, writer)
+
+    def fail(self, error, writer=None):
+        """Mark the job failed and delete whatever part of the file, and of writer's sheets, was written"""
+        logger.error(f"Excel export failed: {error}")
+        self.state, self.error = "failed", str(error)
+        if writer is not None:
+            writer.abort()
+        remove_file(self.path)
+
+    def status(self):
+        return {
+            "state"     : self.state,
+            "rows"      : self.rows,
+            "sheets"    : self.sheets,
+            "error"     : self.error,
+            "excel_path": self.path,
+        }
+
+class ExcelJobs:
+    """
+    Excel jobs by id; files are deleted when their job expires
+
+    Expiry is counted from creation, so ttl should comfortably exceed the
+    time a large workbook takes to write.
+    """
+
+    def __init__(self, directory, ttl):
+        self.directory = directory
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, sql_query):
+        """Register a job with a fresh file path; returns (id, job)"""
+        self.sweep()
+        os.makedirs(self.directory, exist_ok=True)
+        excel_id = secrets.token_urlsafe(12)
+        job = ExcelJob(os.path.join(self.directory, f"{excel_id}.xlsx"), sql_query)
+        job.expires = time.monotonic() + self.ttl
+        with self._lock:
+            self._jobs[excel_id] = job
+        return excel_id, job
+
+    def get(self, excel_id):
+        """The job of an id, or None if it is unknown or expired"""
+        with self._lock:
+            job = self._jobs.get(excel_id)
+        if job is None or job.expires < time.monotonic():
+            return None
+        return job
+
+    def sweep(self):
+        """Forget expired jobs and delete their files"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [excel_id for excel_id, job in self._jobs.items() if job.expires < now]
+            jobs = [self._jobs.pop(excel_id) for excel_id in expired]
+        for job in jobs:
+            if job.task is not None:
+                job.task.cancel()
+            remove_file(job.path)
@@ -0,0 +1,200 @@
+"""Bulk export of query results as CSV (COPY) or Parquet"""
+import csv
+import io
+import json
+import secrets
+import threading
+import time
+from decimal import Decimal
+from sqlalchemy import text
+from .serialization import json_default
+
+EXPORT_MEDIA_TYPES = {
+    "csv"    : "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+def compile_statement(dialect, query, params=None):
+    """
+    Render a :name statement in the driver's own parameter style
+
+    Returns:
+        (SQL string, positional list or dict of values)
+    """
+    compiled = text(query).compile(dialect=dialect)
+    values = compiled.construct_params(params or {})
+    if compiled.positional:
+        return compiled.string, [values[name] for name in compiled.positiontup]
+    return compiled.string, values
+
+def copy_statement(query):
+    """COPY writing the rows of query to the client as CSV with a header line"""
+    # The newline keeps a trailing comment in the query from swallowing the parenthesis
+    return f"COPY ({query.strip().rstrip(';')}\n) TO STDOUT WITH (FORMAT csv, HEADER true)"
+
+class ChunkSink:
+    """Write-only file object whose contents are taken out after every write"""
+
+    def __init__(self):
+        self._chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+class CsvEncoder:
+    """
+    CSV encoding of row batches, for databases without COPY
+
+    Values are written the way COPY writes them where it matters: NULL as
+    an empty field, JSON and other structured values as JSON text.
+    """
+
+    def __init__(self):
+        self._columns = None
+
+    def write(self, batch) -> bytes:
+        """Encode a list of row dicts (see AsyncDatabase.stream_query)"""
+        if not batch:
+            return b""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        if self._columns is None:
+            self._columns = list(batch[0].keys())
+            writer.writerow(self._columns)
+        writer.writerows([self._value(value) for value in row.values()] for row in batch)
+        return buffer.getvalue().encode()
+
+    @staticmethod
+    def _value(value):
+        if value is None or isinstance(value, (str, int, float)):
+            return value
+        if isinstance(value, Decimal):
+            return str(value)
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, default=json_default)
+        return json_default(value)
+
+    def close(self) -> bytes:
+        return b""
+
+class ParquetEncoder:
+    """
+    Parquet encoding of row batches, one row group per batch
+
+    The file schema is taken from the first batch, with decimals widened to
+    full precision. Columns that are all NULL there are written as strings,
+    since their type is unknown. Every
+    batch is flushed as soon as it is written, so memory holds one row
+    group at a time. Requires pyarrow, imported lazily.
+    """
+
+    def __init__(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("The parquet format requires pyarrow to be installed") from e
+        self._pa = pa
+        self._pq = pq
+        self._sink = ChunkSink()
+        self._writer = None
+        self._schema = None
+        self._strings = []
+
+    def write(self, batch) -> bytes:
+        """Encode a list of row dicts as one row group"""
+        if not batch:
+            return b""
+        pa = self._pa
+        if self._schema is None:
+            inferred = pa.Table.from_pylist(batch).schema
+            self._schema = pa.schema([pa.field(field.name, self._widen(field.type)) for field in inferred])
+            self._strings = [field.name for field in inferred if pa.types.is_null(field.type)]
+            self._writer = self._pq.ParquetWriter(self._sink, self._schema, compression="snappy")
+        if self._strings:
+            batch = [{**row, **{name: None if row[name] is None else str(row[name]) for name in self._strings}}
+                     for row in batch]
+        self._writer.write_table(pa.Table.from_pylist(batch, schema=self._schema))
+        return self._sink.take()
+
+    def _widen(self, value_type):
+        """File type of a column inferred from the first batch, wide enough for later ones"""
+        pa = self._pa
+        if pa.types.is_null(value_type):
+            return pa.string()
+        if pa.types.is_decimal(value_type):
+            # Precision is inferred from the digits seen, so later values may need more
+            return pa.decimal128(38, value_type.scale)
+        return value_type
+
+    def close(self) -> bytes:
+        """Footer of the file (a complete empty file if no rows were written)"""
+        if self._writer is None:
+            self._pq.write_table(self._pa.table({}), self._sink)
+        else:
+            self._writer.close()
+        return self._sink.take()
+
+def encoder_for(export_format):
+    """Row batch encoder of an export format (see EXPORT_MEDIA_TYPES)"""
+    if export_format == "parquet":
+        return ParquetEncoder()
+    return CsvEncoder()
+
+class ExportJob:
+    """A statement registered for export, run when its URI is downloaded"""
+
+    def __init__(self, query, params, export_format, timeout=None):
+        self.query = query
+        self.params = params
+        self.format = export_format
+        self.timeout = timeout
+        self.expires = 0.0
+
+    @property
+    def media_type(self):
+        return EXPORT_MEDIA_TYPES[self.format]
+
+class ExportRegistry:
+    """
+    Export jobs by id until they expire
+
+    A job only holds the statement: every download runs it again and
+    streams the rows, so nothing is stored between requests.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def put(self, job) -> str:
+        now = time.monotonic()
+        job.expires = now + self.ttl
+        export_id = secrets.token_urlsafe(12)
+        with self._lock:
+            for key in [key for key, old in self._jobs.items() if old.expires < now]:
+                del self._jobs[key]
+            self._jobs[export_id] = job
+        return export_id
+
+    def get(self, export_id):
+        """The job of an id, or None if it is unknown or expired"""
+        with self._lock:
+            job = self._jobs.get(export_id)
+        if job is None or job.expires < time.monotonic():
+            return None
+        return job
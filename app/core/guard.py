@@ -0,0 +1,81 @@
+"""Planner-based cost guard for ad-hoc SQL"""
+import json
+import re
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from .sql import add_limit, is_select, strip_leading_comments
+
+# Statements EXPLAIN accepts without running them
+_EXPLAINABLE = re.compile(r"^\(*\s*(select|with|values|table|insert|update|delete|merge)\b", re.I)
+
+class QueryRejected(ValueError):
+    """A statement's planner estimate is over the configured limits"""
+
+    def __init__(self, message, decision):
+        super().__init__(message)
+        self.decision = decision
+
+def explain(connection, query, params=None):
+    """
+    Planner estimate of a statement, without executing it
+
+    Returns:
+        dict: top "Plan" node of EXPLAIN (FORMAT JSON)
+    """
+    output = connection.execute(text(f"EXPLAIN (FORMAT JSON) {query}"), params or {}).scalar()
+    if isinstance(output, str):
+        output = json.loads(output)
+    return output[0]["Plan"]
+
+def check_query(connection, query, params=None, max_cost=None, max_rows=None, mode="reject", inject_limit=True):
+    """
+    Decide whether a statement may run, before running it
+
+    Row statements without a LIMIT get LIMIT max_rows appended. The
+    (possibly limited) statement is then explained, and its estimated cost
+    and rows are compared with max_cost and max_rows. Only Postgres is
+    checked; other databases, and statements EXPLAIN fails on, get action
+    "unchecked" and are left for execution to report their errors.
+
+    Args:
+        connection: sync Connection (also the run_sync connection of an async engine)
+        query: SQL query string
+        params: (Optional) Query parameter
+        max_cost: (Optional) Planner cost limit, in Postgres cost units
+        max_rows: (Optional) Row limit for the LIMIT and the row estimate
+        mode: "reject" raises QueryRejected over the limits, "flag" only reports it
+        inject_limit: append LIMIT max_rows to unbounded row statements
+    Returns:
+        dict: decision with "action" (allow, limit, flag, unchecked), the
+        "query" to run, the estimates and the plan
+    Raises:
+        QueryRejected: over the limits in "reject" mode
+    """
+    decision = {"action": "allow", "query": query}
+    if connection.dialect.name != "postgresql" or not _EXPLAINABLE.match(strip_leading_comments(query)):
+        decision["action"] = "unchecked"
+        return decision
+
+    limited = add_limit(query, max_rows) if inject_limit and max_rows and is_select(query) else None
+    if limited:
+        decision.update(action="limit", query=limited, limit=max_rows)
+
+    try:
+        plan = explain(connection, decision["query"], params)
+    except DBAPIError as e:
+        return {"action": "unchecked", "query": query, "reason": f"EXPLAIN failed: {e.orig}"}
+    decision.update(estimated_cost=plan["Total Cost"], estimated_rows=plan["Plan Rows"], plan=plan)
+
+    problems = []
+    if max_cost and plan["Total Cost"] > max_cost:
+        problems.append(f"estimated cost {plan['Total Cost']:.0f} exceeds the limit of {max_cost:.0f}")
+    if max_rows and plan["Plan Rows"] > max_rows:
+        problems.append(f"estimated {plan['Plan Rows']} rows exceed the limit of {max_rows}")
+    if problems:
+        decision["reason"] = "; ".join(problems)
+        if mode == "reject":
+            decision["action"] = "reject"
+            raise QueryRejected(f"Query rejected: {decision['reason']}. Add filters or a LIMIT and try again.",
+                                decision)
+        decision["action"] = "flag"
+    return decision
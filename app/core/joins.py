@@ -0,0 +1,171 @@
+"""Join paths between tables, found on the foreign-key graph of a schema"""
+import threading
+from collections import deque
+from .schema_text import quote
+
+# Shortest-path trees kept per graph. Each is one BFS over the whole graph,
+# so a few hundred cover every table a session asks about at bounded memory.
+MAX_CACHED_SOURCES = 512
+
+class JoinEdge:
+    """One foreign key, walkable in both directions"""
+    __slots__ = ("table", "columns", "referred_table", "referred_columns")
+
+    def __init__(self, table, fk):
+        self.table = table
+        self.columns = fk["constrained_columns"]
+        self.referred_table = fk["referred_table"]
+        self.referred_columns = fk["referred_columns"]
+
+    def other(self, table):
+        return self.referred_table if table == self.table else self.table
+
+    def on_clause(self) -> str:
+        """e.g. "orders.customer_id = customers.id" """
+        return " AND ".join(
+            f"{quote(self.table)}.{quote(column)} = {quote(self.referred_table)}.{quote(referred)}"
+            for column, referred in zip(self.columns, self.referred_columns))
+
+class JoinGraph:
+    """
+    Undirected foreign-key graph of one schema snapshot
+
+    Shortest paths are searched on demand, one BFS per source table, and
+    cached for the life of the graph (one schema version).
+    """
+
+    def __init__(self, schema, version=None):
+        self.version = version
+        self._edges = {table: [] for table in schema}
+        for table, info in schema.items():
+            for fk in info["foreign_keys"]:
+                referred = fk["referred_table"]
+                # Self references never shorten a path; keys into other schemas are not joinable by name
+                if referred == table or referred not in self._edges or not fk["constrained_columns"]:
+                    continue
+                edge = JoinEdge(table, fk)
+                self._edges[table].append(edge)
+                self._edges[referred].append(edge)
+        for table, edges in self._edges.items():
+            edges.sort(key=lambda edge: (edge.other(table), edge.table, edge.columns))
+        self._paths = {}
+        self._lock = threading.Lock()
+
+    def shortest_paths(self, source):
+        """
+        BFS tree of a table
+
+        Returns:
+            dict: {table: (distance, edge to the next table towards source)}
+                for every table reachable from source
+        """
+        tree = self._paths.get(source)
+        if tree is not None:
+            return tree
+        tree = {source: (0, None)}
+        queue = deque([source])
+        while queue:
+            table = queue.popleft()
+            distance = tree[table][0] + 1
+            for edge in self._edges[table]:
+                other = edge.other(table)
+                if other not in tree:
+                    tree[other] = (distance, edge)
+                    queue.append(other)
+        with self._lock:
+            if len(self._paths) >= MAX_CACHED_SOURCES:
+                self._paths.pop(next(iter(self._paths)))
+            self._paths[source] = tree
+        return tree
+
+    def join_tree(self, tables):
+        """
+        Join tree connecting a set of tables
+
+        Tables are attached one at a time, always the one closest to the
+        tree so far, along its shortest path; intermediate tables are pulled
+        in as needed. This is the usual greedy approximation of the minimal
+        (Steiner) tree, and exact whenever the tables lie on one path.
+
+        Args:
+            tables: table names; the first one is the root of the tree
+        Returns:
+            dict: tables in join order, joins [{"table", "join_to", "on"}],
+                the FROM clause, and the requested tables that no foreign
+                key path reaches
+        Raises:
+            ValueError: a table is not in the schema
+        """
+        tables = list(dict.fromkeys(tables))
+        unknown = [table for table in tables if table not in self._edges]
+        if unknown:
+            raise ValueError(f"Unknown tables: {', '.join(unknown)}")
+        if not tables:
+            raise ValueError("No tables given")
+
+        root = tables[0]
+        order = [root]
+        joined = {root}
+        joins = []
+        remaining = tables[1:]
+        unreachable = []
+        while remaining:
+            best = None
+            for table in remaining:
+                if table in joined:
+                    best = (0, table, table)
+                    break
+                tree = self.shortest_paths(table)
+                # Nearest table already joined, ties to the earliest joined
+                for member in order:
+                    distance = tree.get(member, (None,))[0]
+                    if distance is not None and (best is None or distance < best[0]):
+                        best = (distance, table, member)
+            if best is None:
+                unreachable.extend(remaining)
+                break
+            _, table, member = best
+            remaining.remove(table)
+            # Walk from the tree towards the new table, joining each step
+            current = member
+            tree = self.shortest_paths(table)
+            while current != table:
+                edge = tree[current][1]
+                current = edge.other(current)
+                joins.append({"table": current, "join_to": edge.other(current), "on": edge.on_clause()})
+                order.append(current)
+                joined.add(current)
+
+        from_clause = " ".join([f"FROM {quote(root)}"] +
+                               [f"JOIN {quote(join['table'])} ON {join['on']}" for join in joins])
+        return {
+            "tables"     : order,
+            "joins"      : joins,
+            "from_clause": from_clause,
+            "unreachable": unreachable,
+        }
+
+class JoinPlanner:
+    """
+    Join graph of the current schema snapshot
+
+    The graph is built on the first lookup of each schema version and
+    replaced as a whole, with its cached paths, when the version changes.
+    """
+
+    def __init__(self):
+        self._graph = None
+        self._lock = threading.Lock()
+
+    def graph(self, snapshot) -> JoinGraph:
+        graph = self._graph
+        if graph is None or graph.version != snapshot.version:
+            with self._lock:
+                graph = self._graph
+                if graph is None or graph.version != snapshot.version:
+                    graph = self._graph = JoinGraph(snapshot.schema, snapshot.version)
+        return graph
+
+    def join_tree(self, snapshot, tables):
+        """Join tree of tables in a snapshot (see JoinGraph.join_tree)"""
+        return self.graph(snapshot).join_tree(tables)
@@ -0,0 +1,234 @@
+"""Prometheus metrics of the API and its queries
+
+A small registry that renders the Prometheus text exposition format
+itself, so no client library is needed. Metrics are recorded only while
+the registry is enabled (METRICS_ENABLED); otherwise every observation
+returns after one attribute check.
+"""
+import threading
+import time
+from bisect import bisect_left
+from sqlalchemy.exc import DBAPIError
+from .config import settings
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; from a cached lookup to a statement hitting the default timeout
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """A metric family; values are kept per tuple of label values"""
+    kind = ""
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._samples(items))
+        return lines
+
+    def _samples(self, items):
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in items]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, labels=(), amount=1):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+class Gauge(Metric):
+    """Gauge set at scrape time (see MetricsRegistry.on_collect)"""
+    kind = "gauge"
+
+    def set(self, labels, value):
+        with self._lock:
+            self._values[labels] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, labels=()):
+        if not self.registry.enabled:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self, items):
+        lines = []
+        bounds = [*self.buckets, float("inf")]
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """Metric families, rendered together by /metrics"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def on_collect(self, callback):
+        """Run callback before every render, e.g. to set gauges from live state"""
+        self._collectors.append(callback)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        for callback in self._collectors:
+            callback()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry(enabled=settings.METRICS_ENABLED)
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by route and status code", ("method", "route", "status"))
+HTTP_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time from request to the last response byte", ("method", "route"))
+HTTP_RESPONSE_BYTES = REGISTRY.histogram(
+    "http_response_size_bytes", "Serialized response body size", ("method", "route"), BYTE_BUCKETS)
+QUERY_LATENCY = REGISTRY.histogram(
+    "db_query_duration_seconds", "Statement execution and fetch time, without pool wait", ("operation",))
+QUERY_ROWS = REGISTRY.histogram(
+    "db_query_rows", "Rows returned per statement", ("operation",), ROW_BUCKETS)
+QUERY_ERRORS = REGISTRY.counter(
+    "db_query_errors_total", "Failed statements by error class", ("operation", "error"))
+POOL_WAIT = REGISTRY.histogram(
+    "db_pool_wait_seconds", "Time a checkout waited for a pooled connection")
+POOL_CONNECTIONS = REGISTRY.gauge(
+    "db_pool_connections", "Pooled connections by state", ("state",))
+
+def error_class(error):
+    """Metric label of an exception: the driver's error class when there is one"""
+    if isinstance(error, DBAPIError) and error.orig is not None:
+        # asyncpg errors arrive wrapped in the adapter's generic Error class
+        return type(error.orig.__cause__ or error.orig).__name__
+    return type(error).__name__
+
+class QueryTimer:
+    """
+    Record one statement's duration, row count and failure
+
+        with QueryTimer("execute") as timer:
+            ...
+            timer.rows = len(rows)
+
+    Streamed operations (stream, export) are timed until their last batch
+    is fetched, so a slow consumer counts too. A stream closed early by its
+    consumer is not a failure.
+    """
+    __slots__ = ("operation", "rows", "started")
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.rows = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not REGISTRY.enabled:
+            return False
+        labels = (self.operation,)
+        QUERY_LATENCY.observe(time.perf_counter() - self.started, labels)
+        if exc is not None and not isinstance(exc, GeneratorExit):
+            QUERY_ERRORS.inc((self.operation, error_class(exc)))
+        elif self.rows is not None:
+            QUERY_ROWS.observe(self.rows, labels)
+        return False
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status and body size per route
+
+    Routes are labelled with their path template (/api/sample/{table_name}),
+    so label values stay bounded; unmatched paths share one label. Streamed
+    bodies are counted as they are sent, without buffering.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not REGISTRY.enabled:
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        response = {"status": 500, "bytes": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", "unmatched"))
+            HTTP_LATENCY.observe(time.perf_counter() - started, labels)
+            HTTP_RESPONSE_BYTES.observe(response["bytes"], labels)
+            HTTP_REQUESTS.inc((*labels, str(response["status"])))
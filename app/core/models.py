@@ -21,18 +21,25 @@ class QueryResponse(BaseModel):
     guidance: Optional[str] = None
     metadata: Optional[Dict[str, Any]] = None
 
+# Columnar query result (column names sent once instead of per row)
+class ColumnarResult(BaseModel):
+    columns: List[str]
+    types: List[str]
+    rows: List[List[Any]]
+
 # SQL result message
 class SQLResultMessage(BaseModel):
     sql_query: str
-    result: List[Dict[str, Any]]
+    result: Union[List[Dict[str, Any]], ColumnarResult]
     error: Optional[str] = None
     metadata: Optional[Dict[str, Any]] = None
 
-# Excel request message
+# Excel request message (rows are streamed from sql_query unless result is given)
 class ExcelRequestMessage(BaseModel):
     query: str
     sql_query: str
-    result: List[Dict[str, Any]]
+    params: Optional[Dict[str, Any]] = None
+    result: Optional[List[Dict[str, Any]]] = None
     format_options: Optional[Dict[str, Any]] = None
 
 # Agent State - (Using in LangChain)
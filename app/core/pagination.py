@@ -0,0 +1,248 @@
+"""Continuation tokens, keyset plans and held cursors for paged query results"""
+import base64
+import json
+import secrets
+import threading
+import time
+from datetime import date, datetime, time as time_of_day, timedelta
+from decimal import Decimal
+from uuid import UUID
+
+from .schema_text import quote
+from .serialization import value_type
+from .sql import split_order_by
+
+TOKEN_VERSION = 1
+
+# Key values travel in tokens as [type name, JSON value] and are restored to
+# the same Python type, so drivers with strict parameter types accept them
+_KEY_DECODERS = {
+    "boolean" : bool,
+    "integer" : int,
+    "float"   : float,
+    "decimal" : Decimal,
+    "string"  : str,
+    "datetime": datetime.fromisoformat,
+    "date"    : date.fromisoformat,
+    "time"    : time_of_day.fromisoformat,
+    "interval": lambda seconds: timedelta(seconds=seconds),
+    "uuid"    : UUID,
+    "bytes"   : base64.b64decode,
+}
+
+def is_key_value(value) -> bool:
+    """Whether a value can bound a keyset page (NULLs and JSON cannot)"""
+    return value is not None and value_type(value) in _KEY_DECODERS
+
+def _encode_key_value(value):
+    kind = value_type(value)
+    if kind in ("datetime", "date", "time"):
+        return [kind, value.isoformat()]
+    if kind in ("decimal", "uuid"):
+        return [kind, str(value)]
+    if kind == "interval":
+        return [kind, value.total_seconds()]
+    if kind == "bytes":
+        return [kind, base64.b64encode(bytes(value)).decode()]
+    return [kind, value]
+
+def _decode_key_value(item):
+    kind, value = item
+    return _KEY_DECODERS[kind](value)
+
+def decode_params(params):
+    """
+    Restore typed query parameters
+
+    A value given as {"type": <type name>, "value": <JSON value>}, with one of
+    the type names of key values (e.g. "date", "datetime", "decimal", "uuid"),
+    is converted to that Python type, so it binds like a native value. Other
+    values are left as they are.
+
+    Raises:
+        ValueError: unknown type name, or a value that type cannot read
+    """
+    if not params:
+        return params
+    return {name: _decode_param(value) for name, value in params.items()}
+
+def _decode_param(value):
+    if not (isinstance(value, dict) and set(value) == {"type", "value"}):
+        return value
+    kind = value["type"]
+    if kind not in _KEY_DECODERS:
+        raise ValueError(f"Unknown parameter type: {kind}")
+    if value["value"] is None:
+        return None
+    try:
+        return _KEY_DECODERS[kind](value["value"])
+    except (TypeError, ValueError, ArithmeticError) as e:
+        raise ValueError(f"Invalid {kind} parameter: {value['value']!r}") from e
+
+def encode_token(query_key: str, after=None, cursor=None) -> str:
+    """
+    Build an opaque continuation token
+
+    Args:
+        query_key: identifies the statement and parameters the token belongs to
+        after: (Optional) key of the last row returned, for keyset paging
+        cursor: (Optional) id of a held cursor
+    """
+    state = {"v": TOKEN_VERSION, "q": query_key[:16]}
+    if after is not None:
+        state["after"] = [_encode_key_value(value) for value in after]
+    if cursor is not None:
+        state["cursor"] = cursor
+    raw = json.dumps(state, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_token(token: str, query_key: str) -> dict:
+    """
+    Read a token built by encode_token
+
+    Returns:
+        dict: "after" (tuple) and/or "cursor" (str)
+    Raises:
+        ValueError: the token is malformed or belongs to another statement
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        state = json.loads(raw)
+        if state.get("v") != TOKEN_VERSION:
+            raise ValueError
+        if "after" in state:
+            state["after"] = tuple(_decode_key_value(item) for item in state["after"])
+    except (ValueError, TypeError, KeyError, AttributeError, ArithmeticError):
+        raise ValueError("Invalid page token")
+    if state.get("q") != query_key[:16]:
+        raise ValueError("Page token does not belong to this query")
+    return state
+
+class KeysetPlan:
+    """
+    Paged form of a statement that ends in ORDER BY plain columns
+
+    Each page re-runs the statement as a subquery, filtered to rows after
+    the last key returned and limited to one row more than the page, which
+    tells whether another page exists.
+    """
+
+    def __init__(self, base, columns, descending):
+        self.base = base
+        self.columns = columns
+        self.descending = descending
+
+    @classmethod
+    def for_query(cls, query):
+        """Plan for query, or None when its ordering is not keyset-able (see sql.split_order_by)"""
+        split = split_order_by(query)
+        return cls(*split) if split else None
+
+    def statement(self, after=None, limit=None):
+        """
+        Returns:
+            (SQL string, bind parameters) for the page following key after
+        """
+        columns = ", ".join(quote(column) for column in self.columns)
+        # The newline keeps a trailing comment in the base statement from swallowing the parenthesis
+        sql = f"SELECT * FROM ({self.base}\n) AS _page"
+        params = {}
+        if after is not None:
+            names = [f"_page_after_{i}" for i in range(len(after))]
+            params = dict(zip(names, after))
+            keys = ", ".join(f":{name}" for name in names)
+            # Postgres sorts NULLs last ascending and first descending; an
+            # unknown comparison means a NULL that sorts after the key
+            if self.descending:
+                sql += f" WHERE ({columns}) < ({keys})"
+            else:
+                sql += f" WHERE (({columns}) <= ({keys})) IS NOT TRUE"
+        direction = " DESC" if self.descending else ""
+        sql += " ORDER BY " + ", ".join(f"{quote(column)}{direction}" for column in self.columns)
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return sql, params
+
+    def key(self, columns, row):
+        """Ordering key of a row"""
+        positions = {column: i for i, column in enumerate(columns)}
+        return tuple(row[positions[column]] for column in self.columns)
+
+    def cut(self, columns, rows, page_size):
+        """
+        Number of rows to return from a page fetched with limit page_size + 1
+
+        A page may only end between rows with different keys, otherwise the
+        rows sharing the last key would be skipped by the next page. Returns
+        0 if no such boundary exists within the page.
+        """
+        if len(rows) <= page_size:
+            return len(rows)
+        keys = [self.key(columns, row) for row in rows]
+        for i in range(page_size - 1, -1, -1):
+            if keys[i] != keys[i + 1] and all(is_key_value(value) for value in keys[i]):
+                return i + 1
+        return 0
+
+class HeldCursor:
+    """An open result kept on its own connection between page requests"""
+
+    def __init__(self, connection, result, columns, replica=None):
+        self.connection = connection
+        self.result = result
+        self.columns = columns
+        self.replica = replica
+        self.pending = []
+        self.expires = 0.0
+
+class CursorRegistry:
+    """
+    Held cursors by id, bounded in number and idle time
+
+    Every held cursor pins a pool connection, so the registry only keeps a
+    few of them. Cursors are taken out while a page is fetched and put back
+    under a new id, which also invalidates the previous token.
+    """
+
+    def __init__(self, max_cursors, ttl):
+        self.max_cursors = max_cursors
+        self.ttl = ttl
+        self._cursors = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._cursors)
+
+    def put(self, cursor) -> str:
+        cursor.expires = time.monotonic() + self.ttl
+        cursor_id = secrets.token_urlsafe(12)
+        with self._lock:
+            self._cursors[cursor_id] = cursor
+        return cursor_id
+
+    def take(self, cursor_id):
+        """Remove and return a cursor, or None if it expired or was evicted"""
+        with self._lock:
+            return self._cursors.pop(cursor_id, None)
+
+    def sweep(self, reserve=0):
+        """
+        Remove expired cursors, then the oldest ones until reserve slots are free
+
+        Returns:
+            list: removed cursors, for the caller to close
+        """
+        now = time.monotonic()
+        with self._lock:
+            by_age = sorted(self._cursors.items(), key=lambda item: item[1].expires)
+            removed = [cursor_id for cursor_id, cursor in by_age if cursor.expires < now]
+            excess = len(by_age) - len(removed) + reserve - self.max_cursors
+            removed += [cursor_id for cursor_id, cursor in by_age if cursor.expires >= now][:max(excess, 0)]
+            return [self._cursors.pop(cursor_id) for cursor_id in removed]
+
+    def clear(self):
+        """Remove all cursors, for the caller to close"""
+        with self._lock:
+            cursors = list(self._cursors.values())
+            self._cursors.clear()
+        return cursors
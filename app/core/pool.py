@@ -0,0 +1,80 @@
+"""Connection pool instrumentation"""
+import threading
+import time
+from sqlalchemy import event
+from .metrics import POOL_WAIT
+
+class PoolMonitor:
+    """
+    Live statistics of an engine's connection pool
+
+    Checkout counts and connect latency come from SQLAlchemy pool events;
+    wait time is reported by the caller around each checkout (see
+    Database.connect).
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.connects = 0
+        self.connect_total = 0.0
+        self.connect_max = 0.0
+        self.invalidations = 0
+
+        event.listen(engine, "do_connect", self._on_do_connect)
+        event.listen(engine.pool, "connect", self._on_connect)
+        event.listen(engine.pool, "invalidate", self._on_invalidate)
+
+    def _on_do_connect(self, dialect, connection_record, cargs, cparams):
+        connection_record.info["connect_started"] = time.perf_counter()
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        started = connection_record.info.pop("connect_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.connects += 1
+            self.connect_total += elapsed
+            self.connect_max = max(self.connect_max, elapsed)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def record_wait(self, seconds):
+        """Record the time one checkout spent waiting for a connection"""
+        POOL_WAIT.observe(seconds)
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def stats(self) -> dict:
+        """Pool usage and timing so far"""
+        pool = self.engine.pool
+        with self._lock:
+            return {
+                "pool_class"    : type(pool).__name__,
+                "size"          : _call(pool, "size"),
+                "checked_out"   : _call(pool, "checkedout"),
+                "checked_in"    : _call(pool, "checkedin"),
+                "overflow"      : _call(pool, "overflow"),
+                "checkouts"     : self.checkouts,
+                "wait_avg_ms"   : _avg_ms(self.wait_total, self.checkouts),
+                "wait_max_ms"   : round(self.wait_max * 1000, 3),
+                "connects"      : self.connects,
+                "connect_avg_ms": _avg_ms(self.connect_total, self.connects),
+                "connect_max_ms": round(self.connect_max * 1000, 3),
+                "invalidations" : self.invalidations,
+            }
+
+def _call(pool, name):
+    method = getattr(pool, name, None)
+    return method() if callable(method) else None
+
+def _avg_ms(total, count) -> float:
+    return round(total / count * 1000, 3) if count else 0.0
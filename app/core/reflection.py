@@ -0,0 +1,119 @@
+"""Schema reflection in bulk"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import inspect
+from sqlalchemy.engine.default import DefaultDialect
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_MULTI_METHODS = ("get_multi_columns", "get_multi_pk_constraint",
+                  "get_multi_foreign_keys", "get_multi_indexes")
+
+def supports_bulk_reflection(dialect) -> bool:
+    """
+    Check whether the dialect reflects many tables per catalog query
+
+    DefaultDialect implements get_multi_* as a per-table loop; dialects
+    such as PostgreSQL override them with set-based catalog queries.
+    """
+    return all(getattr(type(dialect), name) is not getattr(DefaultDialect, name)
+               for name in _MULTI_METHODS)
+
+def table_info(columns, pk, foreign_keys, indexes, comment=None):
+    """Format inspector output into the get_schema table entry"""
+    return {
+        "comment"     : comment,
+        "columns"     : [{
+            "name"    : column["name"],
+            "type"    : str(column["type"]),
+            "nullable": column.get("nullable", True),
+            "default" : str(column.get("default", "")),
+            "comment" : column.get("comment")
+        } for column in columns],
+        "primary_keys": (pk or {}).get("constrained_columns", []),
+        "foreign_keys": [{
+            "constrained_columns": fk.get("constrained_columns", []),
+            "referred_table"     : fk.get("referred_table", ""),
+            "referred_columns"   : fk.get("referred_columns", [])
+        } for fk in foreign_keys],
+        "indices"     : [{
+            "name"   : index.get("name", ""),
+            "columns": index.get("column_names", []),
+            "unique" : index.get("unique", False)
+        } for index in indexes]
+    }
+
+def reflect_tables(connection, tables, engine=None):
+    """
+    Reflect columns, keys and indexes of the given tables
+
+    Uses the dialect's bulk catalog queries when available (a handful of
+    round trips for any number of tables). Otherwise tables are reflected
+    one by one, in parallel on a thread pool when a sync engine is given.
+
+    Args:
+        connection: sync Connection (also the run_sync connection of an async engine)
+        tables: table names, in output order
+        engine: (Optional) sync Engine for the parallel fallback
+    Returns:
+        dict: {table: get_schema table entry}
+    """
+    if not tables:
+        return {}
+    if supports_bulk_reflection(connection.dialect):
+        return _reflect_bulk(inspect(connection), tables)
+    if engine is not None and len(tables) > 1 and not connection.dialect.is_async:
+        return _reflect_parallel(engine, tables)
+    inspector = inspect(connection)
+    return {table: _reflect_one(inspector, table) for table in tables}
+
+def _reflect_bulk(inspector, tables):
+    filter_names = list(tables)
+    columns = inspector.get_multi_columns(filter_names=filter_names)
+    pks     = inspector.get_multi_pk_constraint(filter_names=filter_names)
+    fks     = inspector.get_multi_foreign_keys(filter_names=filter_names)
+    indexes = inspector.get_multi_indexes(filter_names=filter_names)
+    comments = _table_comments(inspector, filter_names)
+
+    schema_info = {}
+    for table in tables:
+        key = (None, table)
+        schema_info[table] = table_info(columns.get(key, []), pks.get(key),
+                                        fks.get(key, []), indexes.get(key, []),
+                                        (comments.get(key) or {}).get("text"))
+    return schema_info
+
+def _table_comments(inspector, filter_names):
+    try:
+        return inspector.get_multi_table_comment(filter_names=filter_names)
+    except NotImplementedError:
+        return {}
+
+def _reflect_one(inspector, table):
+    try:
+        comment = inspector.get_table_comment(table).get("text")
+    except NotImplementedError:
+        # e.g. SQLite, which has no comments
+        comment = None
+    return table_info(inspector.get_columns(table),
+                      inspector.get_pk_constraint(table),
+                      inspector.get_foreign_keys(table),
+                      inspector.get_indexes(table),
+                      comment)
+
+def _reflect_parallel(engine, tables):
+    workers = max(1, min(settings.SCHEMA_REFLECTION_WORKERS, settings.DB_POOL_SIZE, len(tables)))
+    chunks = [tables[i::workers] for i in range(workers)]
+
+    def reflect_chunk(chunk):
+        # Inspectors are not thread-safe, so each worker gets its own connection
+        with engine.connect() as connection:
+            inspector = inspect(connection)
+            return {table: _reflect_one(inspector, table) for table in chunk}
+
+    reflected = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for part in executor.map(reflect_chunk, chunks):
+            reflected.update(part)
+    return {table: reflected[table] for table in tables}
@@ -0,0 +1,101 @@
+"""Routing of read-only statements to read replicas"""
+import itertools
+import threading
+import time
+from sqlalchemy import text
+
+# Seconds a Postgres standby is behind its primary. A standby that has
+# replayed everything it received counts as current even if the primary
+# has been idle since the last replayed transaction.
+REPLICA_LAG = text("""
+    SELECT CASE
+             WHEN NOT pg_is_in_recovery() THEN 0
+             WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+             ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+           END AS lag
+""")
+
+POLICIES = ("least_outstanding", "round_robin")
+
+def measure_lag(connection):
+    """Replication lag in seconds (0 on databases without a lag query)"""
+    if connection.dialect.name != "postgresql":
+        return 0.0
+    return float(connection.execute(REPLICA_LAG).scalar())
+
+class Replica:
+    """One read replica and its routing state"""
+
+    def __init__(self, url, engine):
+        self.url = url
+        self.engine = engine
+        self.outstanding = 0
+        self.requests = 0
+        self.lag = 0.0
+        self.available = True
+        self.checked_at = float("-inf")
+
+class ReplicaRouter:
+    """
+    Picks a replica for each read-only checkout
+
+    Replicas that failed to connect, or lag more than max_lag seconds, are
+    skipped until a later check (every check_interval seconds) clears them.
+    When no replica qualifies, callers fall back to the primary.
+    """
+
+    def __init__(self, replicas, policy="least_outstanding", max_lag=0, check_interval=10):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown replica policy {policy!r}; expected one of {', '.join(POLICIES)}")
+        self.replicas = replicas
+        self.policy = policy
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._turns = itertools.count()
+        self._lock = threading.Lock()
+
+    def due_for_check(self):
+        """Replicas whose lag or availability should be measured again"""
+        if not self.max_lag and all(replica.available for replica in self.replicas):
+            return []
+        deadline = time.monotonic() - self.check_interval
+        return [replica for replica in self.replicas if replica.checked_at < deadline]
+
+    def record_check(self, replica, lag=None):
+        """Store a lag measurement, or mark the replica unavailable when lag is None"""
+        replica.checked_at = time.monotonic()
+        replica.available = lag is not None
+        replica.lag = lag if lag is not None else replica.lag
+
+    def acquire(self):
+        """
+        Choose a replica and count the request as outstanding on it
+
+        Returns:
+            Replica, or None when no replica is eligible
+        """
+        with self._lock:
+            eligible = [replica for replica in self.replicas
+                        if replica.available and not (self.max_lag and replica.lag > self.max_lag)]
+            if not eligible:
+                return None
+            if self.policy == "round_robin":
+                replica = eligible[next(self._turns) % len(eligible)]
+            else:
+                replica = min(eligible, key=lambda candidate: candidate.outstanding)
+            replica.outstanding += 1
+            replica.requests += 1
+            return replica
+
+    def release(self, replica):
+        with self._lock:
+            replica.outstanding -= 1
+
+    def stats(self):
+        return [{
+            "url"        : replica.url,
+            "available"  : replica.available,
+            "lag"        : round(replica.lag, 3),
+            "outstanding": replica.outstanding,
+            "requests"   : replica.requests,
+        } for replica in self.replicas]
@@ -0,0 +1,93 @@
+"""Random row samples that stay cheap on large tables"""
+import math
+import random
+from sqlalchemy import text
+
+# Upper bound for one sample
+MAX_SAMPLE_ROWS = 1000
+
+# Tables up to this many pages (8 kB each) are shuffled whole
+SMALL_TABLE_PAGES = 1024
+# Up to this size BERNOULLI picks individual rows, which reads the whole
+# table; above it SYSTEM picks whole pages, so the cost no longer grows
+BERNOULLI_MAX_PAGES = 16384
+# Rows drawn per requested row, and pages read at least, before shuffling
+OVERSAMPLE = 4
+MIN_SAMPLE_PAGES = 16
+# Assumed page density of tables that were never analyzed
+DEFAULT_ROWS_PER_PAGE = 50
+# Rows scanned for reservoir sampling on databases without TABLESAMPLE
+RESERVOIR_SCAN_ROWS = 100000
+
+POSTGRES_TABLE_SIZE = text("""
+    SELECT greatest(c.reltuples, 0)::bigint AS row_estimate,
+           pg_relation_size(c.oid) / current_setting('block_size')::int AS pages
+      FROM pg_class c
+     WHERE c.oid = to_regclass(:table)
+""")
+
+def postgres_sample_query(quoted_table, limit, row_estimate, pages):
+    """
+    SELECT drawing limit random rows, chosen by table size
+
+    Small tables are shuffled whole. Larger ones are sampled with
+    TABLESAMPLE at a rate giving about OVERSAMPLE x limit rows, which are
+    then shuffled so the result is not in physical order.
+    """
+    if pages <= SMALL_TABLE_PAGES:
+        return f"SELECT * FROM {quoted_table} ORDER BY random() LIMIT {limit}"
+    rows = row_estimate or pages * DEFAULT_ROWS_PER_PAGE
+    if pages <= BERNOULLI_MAX_PAGES:
+        method, percent = "BERNOULLI", 100 * OVERSAMPLE * limit / rows
+    else:
+        sample_pages = max(MIN_SAMPLE_PAGES, math.ceil(OVERSAMPLE * limit * pages / rows))
+        method, percent = "SYSTEM", 100 * sample_pages / pages
+    percent = min(percent, 100.0)
+    return f"SELECT * FROM {quoted_table} TABLESAMPLE {method} ({percent:.6g}) ORDER BY random() LIMIT {limit}"
+
+def sample_rows(connection, table_name, limit):
+    """
+    Draw up to limit random rows of a table
+
+    Uses TABLESAMPLE on Postgres and reservoir sampling over the first
+    RESERVOIR_SCAN_ROWS rows elsewhere.
+
+    Args:
+        connection: sync Connection (also the run_sync connection of an async engine)
+        table_name: name of an existing table; quoted here
+        limit: rows wanted, capped at MAX_SAMPLE_ROWS
+    Returns:
+        (column names, row tuples)
+    """
+    limit = max(1, min(int(limit), MAX_SAMPLE_ROWS))
+    quoted_table = connection.dialect.identifier_preparer.quote(table_name)
+    if connection.dialect.name == "postgresql":
+        return _sample_postgres(connection, quoted_table, limit)
+    return _sample_reservoir(connection, quoted_table, limit)
+
+def _sample_postgres(connection, quoted_table, limit):
+    size = connection.execute(POSTGRES_TABLE_SIZE, {"table": quoted_table}).first()
+    row_estimate, pages = (size.row_estimate, size.pages) if size else (0, 0)
+    result = connection.execute(text(postgres_sample_query(quoted_table, limit, row_estimate, pages)))
+    columns, rows = list(result.keys()), result.fetchall()
+    if len(rows) < limit and pages > SMALL_TABLE_PAGES:
+        # Outdated statistics can make the sample come back short
+        result = connection.execute(text(f"SELECT * FROM {quoted_table} LIMIT {limit}"))
+        fallback = result.fetchall()
+        if len(fallback) > len(rows):
+            rows = fallback
+    return columns, rows
+
+def _sample_reservoir(connection, quoted_table, limit):
+    connection = connection.execution_options(stream_results=True)
+    result = connection.execute(text(f"SELECT * FROM {quoted_table} LIMIT {RESERVOIR_SCAN_ROWS}"))
+    reservoir = []
+    for seen, row in enumerate(result):
+        if seen < limit:
+            reservoir.append(row)
+        else:
+            slot = random.randint(0, seen)
+            if slot < limit:
+                reservoir[slot] = row
+    random.shuffle(reservoir)
+    return list(result.keys()), reservoir
@@ -0,0 +1,122 @@
+"""Compact, budgeted text rendering of the schema for LLM prompts"""
+import re
+
+# Rough characters per token for English/SQL text; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+# Detail levels, most verbose first. Over budget, the renderer steps down
+# until the text fits: defaults and comments go first, then nullability.
+# Keys are kept at every level because they are what joins are written from.
+LEVELS = ("full", "compact", "minimal")
+
+_PLAIN_IDENTIFIER = re.compile(r"^[a-z_][a-z0-9_$]*$")
+
+def quote(name: str) -> str:
+    """Quote an identifier unless Postgres would read it unquoted as is"""
+    if _PLAIN_IDENTIFIER.match(name):
+        return name
+    return '"' + name.replace('"', '""') + '"'
+
+def _column_list(names):
+    return ", ".join(quote(name) for name in names)
+
+def _comment(text) -> str:
+    """Inline /* */ comment on one line, or "" when there is no text"""
+    if not text:
+        return ""
+    return f" /* {' '.join(str(text).split()).replace('*/', '* /')} */"
+
+def render_table(table_name: str, table_info: dict, level: str = "full") -> str:
+    """
+    Render one table as a single CREATE TABLE line
+
+    Args:
+        table_name: name of table
+        table_info: get_schema entry of the table
+        level: one of LEVELS
+    Returns:
+        str: e.g. "CREATE TABLE orders /* comment */ (id INTEGER NOT NULL, ..., PRIMARY KEY (id));"
+    """
+    parts = []
+    for col in table_info["columns"]:
+        column = f"{quote(col['name'])} {col['type']}"
+        if level != "minimal" and not col["nullable"]:
+            column += " NOT NULL"
+        if level == "full":
+            if col["default"] not in ("", "None"):
+                column += f" DEFAULT {col['default']}"
+            column += _comment(col.get("comment"))
+        parts.append(column)
+
+    if table_info["primary_keys"]:
+        parts.append(f"PRIMARY KEY ({_column_list(table_info['primary_keys'])})")
+    for fk in table_info["foreign_keys"]:
+        parts.append(f"FOREIGN KEY ({_column_list(fk['constrained_columns'])}) "
+                     f"REFERENCES {quote(fk['referred_table'])}({_column_list(fk['referred_columns'])})")
+
+    comment = _comment(table_info.get("comment")) if level == "full" else ""
+    return f"CREATE TABLE {quote(table_name)}{comment} ({', '.join(parts)});"
+
+class SchemaRenderer:
+    """
+    Renders schema snapshots to text, memoizing every table fragment
+
+    Fragments are cached per (table, level) for the current schema version
+    and dropped together when a snapshot with a new version comes in, so
+    repeated prompts only pay for joining strings.
+    """
+
+    def __init__(self):
+        self._version = None
+        self._fragments = {}
+
+    def fragment(self, snapshot, table_name: str, level: str = "full") -> str:
+        """Rendered table of a snapshot (see render_table)"""
+        if snapshot.version != self._version:
+            self._fragments = {}
+            self._version = snapshot.version
+        fragments = self._fragments
+        key = (table_name, level)
+        text = fragments.get(key)
+        if text is None:
+            text = fragments[key] = render_table(table_name, snapshot.schema[table_name], level)
+        return text
+
+    def render(self, snapshot, tables=None, max_chars=None, max_tokens=None) -> str:
+        """
+        Render a snapshot as CREATE TABLE lines, within an optional budget
+
+        The most detailed level that fits is used for all tables. If even the
+        minimal form is too long, trailing tables are left out and a closing
+        comment says how many.
+
+        Args:
+            snapshot: SchemaSnapshot
+            tables: (Optional) table names to render, in output order; unknown names are skipped
+            max_chars: (Optional) character budget
+            max_tokens: (Optional) token budget, estimated at CHARS_PER_TOKEN characters each
+        Returns:
+            str: Schema information
+        """
+        names = snapshot.tables if tables is None else [t for t in tables if t in snapshot.schema]
+        limits = [limit for limit in (max_chars, max_tokens and max_tokens * CHARS_PER_TOKEN) if limit]
+        budget = min(limits) if limits else None
+
+        for level in LEVELS:
+            fragments = [self.fragment(snapshot, name, level) for name in names]
+            # One newline between consecutive fragments
+            size = sum(len(text) for text in fragments) + max(len(fragments) - 1, 0)
+            if budget is None or size <= budget:
+                return "\n".join(fragments)
+
+        # Reserve room for the closing comment, sized for the worst case
+        note = "-- {} more tables omitted; request them by name"
+        reserved = len(note.format(len(fragments))) + 1
+        kept, size = [], 0
+        for text in fragments:
+            if size + len(text) + 1 + reserved > budget:
+                break
+            kept.append(text)
+            size += len(text) + 1
+        kept.append(note.format(len(fragments) - len(kept)))
+        return "\n".join(kept)
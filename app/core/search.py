@@ -0,0 +1,138 @@
+"""BM25 search over the schema, to find the tables a question is about"""
+import math
+import re
+import threading
+from collections import defaultdict
+
+# BM25 parameters: term frequency saturation and document length normalization
+K1 = 1.2
+B = 0.75
+
+# Weight of a term by where it occurs in a table's document. The table's own
+# name says the most; names of FK neighbours only hint at a relationship.
+FIELD_WEIGHTS = {
+    "table"         : 3.0,
+    "table_comment" : 2.0,
+    "column"        : 1.0,
+    "column_comment": 1.0,
+    "neighbour"     : 0.5,
+}
+
+_WORD = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+_SPLIT = re.compile(r"[^0-9A-Za-z]+")
+
+def stem(word: str) -> str:
+    """Light English plural folding, so "orders" finds "order" and "categories" "category" """
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+def tokenize(text) -> list:
+    """
+    Search terms of a name or free text
+
+    Identifiers are split on underscores and camelCase, and a compound name
+    also counts as a term of its own: "customerOrders" gives customer,
+    order and customerorder.
+    """
+    if not text:
+        return []
+    terms = []
+    for chunk in _SPLIT.split(str(text)):
+        words = [word.lower() for word in _WORD.findall(chunk)]
+        terms.extend(stem(word) for word in words)
+        if len(words) > 1:
+            terms.append(stem("".join(words)))
+    return terms
+
+def table_fields(table_name, table_info, referenced_by):
+    """(field, text) pairs that make up the document of one table"""
+    fields = [("table", table_name), ("table_comment", table_info.get("comment"))]
+    for column in table_info["columns"]:
+        fields.append(("column", column["name"]))
+        fields.append(("column_comment", column.get("comment")))
+    neighbours = {fk["referred_table"] for fk in table_info["foreign_keys"]} | referenced_by
+    fields.extend(("neighbour", name) for name in sorted(neighbours - {table_name}))
+    return fields
+
+class SearchIndex:
+    """Inverted index with BM25 scoring over one schema snapshot"""
+
+    def __init__(self, schema, version=None):
+        self.version = version
+        referenced_by = defaultdict(set)
+        for table, info in schema.items():
+            for fk in info["foreign_keys"]:
+                referenced_by[fk["referred_table"]].add(table)
+
+        self._postings = defaultdict(dict)
+        self._lengths = {}
+        for table, info in schema.items():
+            frequencies = defaultdict(float)
+            for field, text in table_fields(table, info, referenced_by[table]):
+                weight = FIELD_WEIGHTS[field]
+                for term in tokenize(text):
+                    frequencies[term] += weight
+            for term, frequency in frequencies.items():
+                self._postings[term][table] = frequency
+            self._lengths[table] = sum(frequencies.values())
+        count = len(self._lengths)
+        self._average_length = sum(self._lengths.values()) / count if count else 0.0
+        self._idf = {term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                     for term, postings in self._postings.items()}
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def search(self, query, limit=10):
+        """
+        Tables ranked by BM25 relevance to a query
+
+        Args:
+            query: question or keywords
+            limit: number of tables to return
+        Returns:
+            list: [{"table", "score", "matched"}], best first; tables
+                matching no query term are left out
+        """
+        scores = defaultdict(float)
+        matched = defaultdict(list)
+        for term in dict.fromkeys(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf[term]
+            for table, frequency in postings.items():
+                norm = K1 * (1 - B + B * self._lengths[table] / self._average_length)
+                scores[table] += idf * frequency * (K1 + 1) / (frequency + norm)
+                matched[table].append(term)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [{"table": table, "score": round(score, 4), "matched": matched[table]}
+                for table, score in ranked]
+
+class SchemaSearch:
+    """
+    Search index of the current schema snapshot
+
+    The index is built on the first search of each schema version and
+    replaced as a whole when the version changes.
+    """
+
+    def __init__(self):
+        self._index = None
+        self._lock = threading.Lock()
+
+    def index(self, snapshot) -> SearchIndex:
+        index = self._index
+        if index is None or index.version != snapshot.version:
+            with self._lock:
+                index = self._index
+                if index is None or index.version != snapshot.version:
+                    index = self._index = SearchIndex(snapshot.schema, snapshot.version)
+        return index
+
+    def search(self, snapshot, query, limit=10):
+        """Tables of a snapshot ranked by relevance (see SearchIndex.search)"""
+        return self.index(snapshot).search(query, limit)
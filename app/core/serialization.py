@@ -0,0 +1,260 @@
+import json
+import base64
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from uuid import UUID
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Checked in order, so bool must come before int
+_VALUE_TYPES = (
+    (bool,                 "boolean"),
+    (int,                  "integer"),
+    (float,                "float"),
+    (Decimal,              "decimal"),
+    (str,                  "string"),
+    (datetime,             "datetime"),
+    (date,                 "date"),
+    (time,                 "time"),
+    (timedelta,            "interval"),
+    (UUID,                 "uuid"),
+    ((bytes, memoryview),  "bytes"),
+    ((dict, list),         "json"),
+)
+
+def json_default(value):
+    """
+    Convert database values that json cannot encode natively
+
+    Mirrors FastAPI's jsonable_encoder so streamed rows look the same as
+    regular responses.
+    """
+    if isinstance(value, Decimal):
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        value = bytes(value)
+        try:
+            return value.decode()
+        except UnicodeDecodeError:
+            return base64.b64encode(value).decode()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps_bytes(value) -> bytes:
+    """
+    Serialize a value containing database types to JSON bytes
+
+    Uses orjson when it is installed: it encodes rows, datetimes and UUIDs
+    natively and calls json_default only for the rest (Decimal, bytes,
+    timedelta), with the same output as the json module.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+        except orjson.JSONEncodeError:
+            # Integers beyond 64 bits (e.g. from wide NUMERICs) need the json module
+            pass
+    return json.dumps(value, default=json_default, separators=(",", ":")).encode()
+
+def dumps(value) -> str:
+    """Serialize a value containing database types to a JSON string"""
+    return dumps_bytes(value).decode()
+
+class ResultResponse(JSONResponse):
+    """
+    JSON response for bodies holding query results
+
+    Return an instance rather than a dict: FastAPI passes returned dicts
+    through jsonable_encoder value by value before rendering.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps_bytes(content)
+
+async def encode_ndjson(batches):
+    """
+    Encode row batches as newline-delimited JSON
+
+    Args:
+        batches: async iterable of row lists (see AsyncDatabase.stream_query)
+    Yields:
+        bytes: one chunk per batch
+    """
+    try:
+        async for batch in batches:
+            if batch:
+                yield b"\n".join(dumps_bytes(row) for row in batch) + b"\n"
+    except Exception as e:
+        # Headers are already sent, so the error travels in-band as a last line
+        yield dumps_bytes({"error": str(e)}) + b"\n"
+
+async def encode_json_array(batches):
+    """
+    Encode row batches as a single JSON array, one chunk per batch
+
+    Args:
+        batches: async iterable of row lists (see AsyncDatabase.stream_query)
+    Yields:
+        bytes: array fragments
+    """
+    yield b"["
+    first = True
+    try:
+        async for batch in batches:
+            if not batch:
+                continue
+            chunk = b",".join(dumps_bytes(row) for row in batch)
+            yield chunk if first else b"," + chunk
+            first = False
+    except Exception as e:
+        error = dumps_bytes({"error": str(e)})
+        yield error if first else b"," + error
+    yield b"]"
+
+async def encode_json_columnar(batches):
+    """
+    Encode row batches as one columnar JSON object, one chunk per batch
+
+    The body has the shape of a non-streamed columnar result,
+    {"columns", "types", "rows"}, with types inferred from the first batch.
+    An error after the first chunk is added as an "error" key.
+
+    Args:
+        batches: async iterable of row lists (see AsyncDatabase.stream_query)
+    Yields:
+        bytes: object fragments
+    """
+    header_sent = False
+    try:
+        async for batch in batches:
+            if not batch:
+                continue
+            rows = [tuple(row.values()) for row in batch]
+            chunk = b",".join(dumps_bytes(row) for row in rows)
+            if not header_sent:
+                columns = list(batch[0].keys())
+                header = dumps_bytes({"columns": columns, "types": infer_types(len(columns), rows)})
+                yield header[:-1] + b',"rows":[' + chunk
+                header_sent = True
+            else:
+                yield b"," + chunk
+        if not header_sent:
+            yield b'{"columns":[],"types":[],"rows":['
+            header_sent = True
+        yield b"]}"
+    except Exception as e:
+        if not header_sent:
+            yield b'{"columns":[],"types":[],"rows":['
+        yield b'],"error":' + dumps_bytes(str(e)) + b"}"
+
+def value_type(value) -> str:
+    """Return the columnar type name of a single value"""
+    for python_type, name in _VALUE_TYPES:
+        if isinstance(value, python_type):
+            return name
+    return type(value).__name__
+
+def infer_types(column_count, rows):
+    """Infer one type name per column from the first non-null value"""
+    types = ["null"] * column_count
+    pending = set(range(column_count))
+    for row in rows:
+        for i in list(pending):
+            if row[i] is not None:
+                types[i] = value_type(row[i])
+                pending.discard(i)
+        if not pending:
+            break
+    return types
+
+def to_columnar(columns, rows):
+    """
+    Build a columnar result
+
+    Args:
+        columns: column names
+        rows: row tuples in column order
+    Returns:
+        dict: {"columns": [...], "types": [...], "rows": [[...]]}
+    """
+    rows = [tuple(row) for row in rows]
+    return {
+        "columns": list(columns),
+        "types"  : infer_types(len(columns), rows),
+        "rows"   : rows
+    }
+
+def format_page(columns, rows, result_format="rows"):
+    """Format row tuples as a dictionary list ("rows") or a columnar result ("columnar")"""
+    if result_format == "columnar":
+        return to_columnar(columns, rows)
+    return [dict(zip(columns, row)) for row in rows]
+
+def rows_to_columnar(rows):
+    """Convert a dictionary list result into the columnar format"""
+    columns = list(rows[0].keys()) if rows else []
+    return to_columnar(columns, (tuple(row.values()) for row in rows))
+
+def to_arrow_ipc(columnar) -> bytes:
+    """
+    Encode a columnar result as an Arrow IPC stream
+
+    Requires pyarrow, which is imported lazily so the JSON formats work
+    without it.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise RuntimeError("The arrow format requires pyarrow to be installed") from e
+
+    columns = columnar["columns"]
+    values = list(zip(*columnar["rows"])) if columnar["rows"] else [()] * len(columns)
+    table = pa.table({name: pa.array(list(column)) for name, column in zip(columns, values)})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+async def encode_ndjson_columnar(batches):
+    """
+    Encode row batches as columnar NDJSON
+
+    The first line carries {"columns", "types"} and every following line is
+    a plain value array in column order.
+
+    Args:
+        batches: async iterable of row lists (see AsyncDatabase.stream_query)
+    Yields:
+        bytes: one chunk per batch
+    """
+    header_sent = False
+    try:
+        async for batch in batches:
+            if not batch:
+                continue
+            rows = [tuple(row.values()) for row in batch]
+            lines = [dumps_bytes(row) for row in rows]
+            if not header_sent:
+                columns = list(batch[0].keys())
+                lines.insert(0, dumps_bytes({"columns": columns,
+                                             "types"  : infer_types(len(columns), rows)}))
+                header_sent = True
+            yield b"\n".join(lines) + b"\n"
+        if not header_sent:
+            yield dumps_bytes({"columns": [], "types": []}) + b"\n"
+    except Exception as e:
+        yield dumps_bytes({"error": str(e)}) + b"\n"
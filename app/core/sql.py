@@ -0,0 +1,141 @@
+"""Lightweight SQL text helpers"""
+import re
+
+_LEADING_COMMENTS = re.compile(r"^(\s*(--[^\n]*(\n|$)|/\*.*?\*/))*\s*", re.S)
+_ROW_STATEMENT    = re.compile(r"^\(*\s*(select|with|values|table)\b", re.I)
+
+# String literals and quoted identifiers are kept verbatim by normalize()
+_QUOTED   = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_SPACES   = re.compile(r"\s+")
+
+# Words that can follow a table in FROM, never to be read as its alias
+_CLAUSE_KEYWORDS = r"join|inner|left|right|full|outer|cross|natural|on|using|where|group|having|order|limit|offset|fetch|for|window|union|intersect|except|tablesample|returning"
+_ALIAS           = rf"(?:\s*(?:as\s+)?(?!(?:{_CLAUSE_KEYWORDS})\b)\w+)?"
+
+_WRITE_KEYWORDS = re.compile(r"\b(insert|update|delete|merge|truncate|create|alter|drop|grant|revoke|copy|call|do|lock|vacuum|reindex|cluster|refresh)\b")
+_IDENTIFIER     = r'(?:"(?:[^"]|"")*"|\w+)(?:\.(?:"(?:[^"]|"")*"|\w+))*'
+_WRITE_TARGET   = re.compile(rf"\b(?:into|update|from|truncate(?:\s+table)?|table|view|on)\s+(?:only\s+|if\s+(?:not\s+)?exists\s+)?({_IDENTIFIER})")
+_QUALIFIER_DOT  = re.compile(r'\.(?=(?:[^"]*"[^"]*")*[^"]*$)')
+_READ_SOURCE    = re.compile(rf"\b(?:from|join)\s+(?:only\s+|lateral\s+)?({_IDENTIFIER}{_ALIAS}(?:\s*,\s*{_IDENTIFIER}{_ALIAS})*)")
+
+def strip_leading_comments(query: str) -> str:
+    """Drop whitespace and comments in front of the first keyword"""
+    return _LEADING_COMMENTS.sub("", query, count=1)
+
+def is_select(query: str) -> bool:
+    """Check whether the statement is a plain row-returning read"""
+    return bool(_ROW_STATEMENT.match(strip_leading_comments(query)))
+
+def normalize(query: str) -> str:
+    """
+    Canonical form of a statement for cache keys
+
+    Comments are dropped, whitespace is collapsed and unquoted text is
+    lowercased (Postgres folds unquoted identifiers anyway). Literals and
+    quoted identifiers are left untouched.
+    """
+    parts = _QUOTED.split(query)
+    for i in range(0, len(parts), 2):
+        parts[i] = _SPACES.sub(" ", _COMMENTS.sub(" ", parts[i])).lower()
+    return "".join(parts).strip().rstrip(";").strip()
+
+def _unquoted(query: str) -> str:
+    """Normalized statement with literals blanked out, for keyword scans"""
+    return _QUOTED.sub(lambda m: m.group(0) if m.group(0).startswith('"') else "''", normalize(query))
+
+def is_read_only(query: str) -> bool:
+    """Check whether the statement reads without writing (SELECT ... FOR UPDATE counts as a write)"""
+    return is_select(query) and not _WRITE_KEYWORDS.search(_unquoted(query))
+
+def _table_name(identifier: str) -> str:
+    """Bare, unquoted table name of a possibly schema-qualified identifier"""
+    name = _QUALIFIER_DOT.split(identifier)[-1]
+    return name[1:-1].replace('""', '"') if name.startswith('"') else name
+
+def read_tables(query: str) -> set:
+    """Tables referenced in FROM/JOIN clauses (CTE names included)"""
+    tables = set()
+    for source in _READ_SOURCE.findall(_unquoted(query)):
+        for item in source.split(","):
+            tables.add(_table_name(item.strip().split()[0]))
+    return tables
+
+def write_tables(query: str) -> set:
+    """
+    Tables a write statement may change
+
+    Returns:
+        set: table names, empty when they cannot be determined
+    """
+    return {_table_name(name) for name in _WRITE_TARGET.findall(_unquoted(query))}
+
+# Used by split_order_by: literals and comments blanked, same length as the query
+_MASKED      = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/", re.S)
+_ORDER_BY    = re.compile(r"\border\s+by\b", re.I)
+_ORDER_ITEMS = re.compile(rf"\s*({_IDENTIFIER}(?:\s+(?:asc|desc))?(?:\s*,\s*{_IDENTIFIER}(?:\s+(?:asc|desc))?)*)\s*;?\s*", re.I)
+_ORDER_ITEM  = re.compile(rf"({_IDENTIFIER})(?:\s+(asc|desc))?", re.I)
+_LIMIT       = re.compile(r"\b(?:limit|fetch\s+(?:first|next))\b", re.I)
+_LOCKING     = re.compile(r"\bfor\s+(?:update|no\s+key\s+update|share|key\s+share)\b", re.I)
+
+def _top_level(masked: str) -> str:
+    """Blank out everything inside parentheses"""
+    chars, depth = [], 0
+    for char in masked:
+        if char == "(":
+            depth += 1
+        chars.append(char if depth == 0 else " ")
+        if char == ")":
+            depth = max(depth - 1, 0)
+    return "".join(chars)
+
+def _top_level_text(query: str) -> str:
+    """Query with literals, comments and parenthesized parts blanked out"""
+    return _top_level(_MASKED.sub(lambda m: " " * len(m.group(0)), query))
+
+def add_limit(query: str, limit: int):
+    """
+    Append a LIMIT to a row statement
+
+    Returns:
+        str: the limited statement, or None when it already has a limit or
+        ends in a locking clause (FOR UPDATE/SHARE), which must come last
+    """
+    top_level = _top_level_text(query)
+    if _LIMIT.search(top_level) or _LOCKING.search(top_level):
+        return None
+    body = query.rstrip()
+    if body.endswith(";"):
+        body = body[:-1].rstrip()
+    # On its own line, so a trailing comment cannot swallow it
+    return f"{body}\nLIMIT {int(limit)}"
+
+def split_order_by(query: str):
+    """
+    Split off a trailing top-level ORDER BY over plain column names
+
+    Returns:
+        (statement without ORDER BY, [output column names], descending), or
+        None when there is no such clause, directions are mixed, it orders by
+        expressions or qualified names, or is followed by LIMIT/OFFSET/FETCH/FOR
+    """
+    masked = _top_level_text(query)
+    matches = list(_ORDER_BY.finditer(masked))
+    if not matches:
+        return None
+    order_by = matches[-1]
+    tail = query[order_by.end():]
+    if not _ORDER_ITEMS.fullmatch(tail):
+        return None
+
+    columns, directions = [], set()
+    for identifier, direction in _ORDER_ITEM.findall(tail):
+        if _QUALIFIER_DOT.search(identifier):
+            # o.id need not be the output column "id" of a join; only bare names are safe
+            return None
+        name = _table_name(identifier)
+        columns.append(name if identifier.endswith('"') else name.lower())
+        directions.add((direction or "asc").lower())
+    if len(directions) != 1:
+        return None
+    return query[:order_by.start()].rstrip(), columns, directions == {"desc"}
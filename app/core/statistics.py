@@ -0,0 +1,146 @@
+"""Column statistics from the planner's catalog (pg_stats)"""
+import threading
+from sqlalchemy import text
+
+# Row estimate and the time statistics were last gathered, per table. The
+# timestamp only moves on ANALYZE (manual or autovacuum), which is also the
+# only thing that rewrites pg_stats.
+POSTGRES_TABLE_STATS = text("""
+    SELECT c.relname AS table_name,
+           c.reltuples AS reltuples,
+           greatest(s.last_analyze, s.last_autoanalyze) AS analyzed_at
+      FROM pg_class c
+      JOIN pg_namespace n ON n.oid = c.relnamespace
+      LEFT JOIN pg_stat_all_tables s ON s.relid = c.oid
+     WHERE c.relkind IN ('r', 'p')
+       AND n.nspname = current_schema()
+       AND c.relname = :table_name
+""")
+
+# Value arrays are anyarray in pg_stats; going through text makes them plain
+# text[] whatever the column type. A table's own statistics are preferred
+# over the ones that include its inheritance children.
+POSTGRES_COLUMN_STATS = text("""
+    SELECT DISTINCT ON (a.attnum)
+           s.attname AS column_name,
+           s.null_frac,
+           s.n_distinct,
+           s.avg_width,
+           s.most_common_vals::text::text[] AS most_common_vals,
+           s.most_common_freqs,
+           s.histogram_bounds::text::text[] AS histogram_bounds,
+           s.correlation
+      FROM pg_stats s
+      JOIN pg_class c ON c.relname = s.tablename
+      JOIN pg_namespace n ON n.oid = c.relnamespace AND n.nspname = s.schemaname
+      JOIN pg_attribute a ON a.attrelid = c.oid AND a.attname = s.attname
+     WHERE s.schemaname = current_schema()
+       AND s.tablename = :table_name
+     ORDER BY a.attnum, s.inherited
+""")
+
+# Histograms hold up to default_statistics_target + 1 bounds (101 by default);
+# every 5th percentile is plenty for choosing a filter and far fewer tokens
+HISTOGRAM_BOUNDS = 21
+
+def sample_bounds(bounds, size=HISTOGRAM_BOUNDS):
+    """Evenly spaced subset of histogram bounds, keeping the first and last"""
+    if len(bounds) <= size:
+        return bounds
+    step = (len(bounds) - 1) / (size - 1)
+    return [bounds[round(i * step)] for i in range(size)]
+
+def table_statistics(connection, table_name):
+    """
+    Row estimate and last ANALYZE time of a table
+
+    Returns:
+        (reltuples or None if never vacuumed or analyzed, analyzed_at), or None when the
+        dialect has no statistics catalog or the table does not exist
+    """
+    if connection.dialect.name != "postgresql":
+        return None
+    row = connection.execute(POSTGRES_TABLE_STATS, {"table_name": table_name}).first()
+    if row is None:
+        return None
+    # reltuples is -1 until the table is first vacuumed or analyzed
+    return (row.reltuples if row.reltuples >= 0 else None), row.analyzed_at
+
+def column_statistics(connection, table_name):
+    """Raw pg_stats rows of a table's columns, in column order"""
+    return [dict(row._mapping) for row in connection.execute(POSTGRES_COLUMN_STATS, {"table_name": table_name})]
+
+def summarize_column(stats, reltuples):
+    """
+    Agent-facing form of a pg_stats row
+
+    A negative n_distinct is the planner's way of saying the number of
+    distinct values grows with the table (-1 means unique); it is turned
+    into a count with the current row estimate.
+    """
+    n_distinct = stats["n_distinct"]
+    if n_distinct is not None and n_distinct < 0:
+        n_distinct = round(-n_distinct * reltuples) if reltuples is not None else None
+    values = stats["most_common_vals"] or []
+    frequencies = stats["most_common_freqs"] or []
+    return {
+        "column"            : stats["column_name"],
+        "null_fraction"     : round(stats["null_frac"], 4),
+        "n_distinct"        : None if n_distinct is None else int(n_distinct),
+        "unique"            : stats["n_distinct"] == -1,
+        "avg_width"         : stats["avg_width"],
+        "most_common_values": [{"value": value, "frequency": round(frequency, 4)}
+                               for value, frequency in zip(values, frequencies)],
+        "histogram_bounds"  : sample_bounds(stats["histogram_bounds"] or []),
+        "correlation"       : None if stats["correlation"] is None else round(stats["correlation"], 4),
+    }
+
+class StatisticsCatalog:
+    """
+    Column statistics per table, reloaded only after the table is analyzed
+
+    Every lookup reads the table's row estimate and ANALYZE timestamp (one
+    catalog row); pg_stats is queried again only when the timestamp moved.
+    """
+
+    def __init__(self):
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def get(self, connection, table_name, columns=None):
+        """
+        Statistics of a table on a sync connection
+
+        Args:
+            connection: sync Connection
+            table_name: name of table
+            columns: (Optional) column names to include, default all
+        Returns:
+            dict: table, estimated_rows, analyzed_at and per-column statistics
+        Raises:
+            ValueError: the dialect has no statistics catalog, or the table does not exist
+        """
+        if connection.dialect.name != "postgresql":
+            raise ValueError("Column statistics are only available on PostgreSQL")
+        table = table_statistics(connection, table_name)
+        if table is None:
+            raise ValueError(f"Unknown table: {table_name}")
+        reltuples, analyzed_at = table
+        with self._lock:
+            cached = self._tables.get(table_name)
+        if cached is None or cached[0] != analyzed_at:
+            cached = (analyzed_at, column_statistics(connection, table_name))
+            with self._lock:
+                self._tables[table_name] = cached
+        stats = [summarize_column(column, reltuples) for column in cached[1]
+                 if not columns or column["column_name"] in columns]
+        return {
+            "table"         : table_name,
+            "estimated_rows": None if reltuples is None else int(reltuples),
+            "analyzed_at"   : analyzed_at.isoformat() if analyzed_at else None,
+            "columns"       : stats,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
@@ -1,21 +1,75 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.api import sample, query, schema
+from fastapi.responses import JSONResponse, Response
+from app.api import sample, query, schema, export, excel
+from app.core.database import async_db, async_schema_manager
+from app.core import metrics
+
+async def warm_up():
+    """Open pool connections and reflect the schema, then keep the snapshot fresh"""
+    await async_schema_manager.warm_up()
+    await async_schema_manager.run_refresher()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so the server accepts requests immediately; see /ready
+    background = asyncio.create_task(warm_up())
+    yield
+    background.cancel()
+    if async_db.initialized:
+        await async_db.close_cursors()
+        await async_db.dispose()
 
 app = FastAPI(
     title="Database Agent API",
     description="API for the Database Agent project",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+if metrics.REGISTRY.enabled:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 # Include API routers
 app.include_router(sample.router, prefix="/api", tags=["sample"])
 app.include_router(query.router, prefix="/api", tags=["query"])
 app.include_router(schema.router, prefix="/api", tags=["schema"])
+app.include_router(export.router, prefix="/api", tags=["export"])
+app.include_router(excel.router, prefix="/api", tags=["excel"])
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Database Agent API"}
 
+@app.get("/ready", summary="Report whether schema reflection has finished")
+def read_ready():
+    if not async_schema_manager.is_ready:
+        return JSONResponse({"status": "starting"}, status_code=503)
+    return {"status": "ready", "schema_version": async_schema_manager.schema_version,
+            "stale": async_schema_manager.stale}
+
+@app.get("/pool", summary="Get connection pool statistics")
+def get_pool_stats():
+    return async_db.pool_stats()
+
+def collect_pool_metrics():
+    """Set the pool gauges from the primary's live pool state"""
+    if not async_db.initialized:
+        return
+    stats = async_db.pool_stats()
+    for state in ("checked_out", "checked_in", "overflow"):
+        if stats.get(state) is not None:
+            metrics.POOL_CONNECTIONS.set((state,), stats[state])
+
+metrics.REGISTRY.on_collect(collect_pool_metrics)
+
+@app.get("/metrics", summary="Get Prometheus metrics", include_in_schema=False)
+def get_metrics():
+    if not metrics.REGISTRY.enabled:
+        return JSONResponse({"error": "Metrics are disabled"}, status_code=404)
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
@@ -0,0 +1,30 @@
+import os
+import tempfile
+import unittest
+from app.core.database import Database
+
+
+async def batches(*items):
+    """Async stream of row batches; items that are exceptions are raised instead."""
+    for item in items:
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+class SQLiteTestCase(unittest.TestCase):
+    """Test case with a Database on a temporary SQLite file, filled by populate."""
+
+    def setUp(self) -> None:
+        handle, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.database = Database(f"sqlite:///{self.path}", replica_urls=[])
+        with self.database.engine.begin() as connection:
+            self.populate(connection)
+
+    def tearDown(self) -> None:
+        self.database.engine.dispose()
+        os.remove(self.path)
+
+    def populate(self, connection) -> None:
+        """Create and fill the tables the tests read."""
@@ -0,0 +1,59 @@
+import unittest
+from sqlalchemy import text
+from app.core.sql import read_tables
+from app.tests.base import SQLiteTestCase
+
+
+class StreamQueryTest(SQLiteTestCase):
+    """Tests for Database.stream_query batching on SQLite."""
+
+    def populate(self, connection) -> None:
+        connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+        connection.execute(text("INSERT INTO items (id, name) VALUES (:id, :name)"),
+                           [{"id": i, "name": f"item-{i}"} for i in range(250)])
+
+    def test_batches_have_batch_size_rows(self):
+        """Test that rows are fetched batch_size at a time, not one by one."""
+        batches = list(self.database.stream_query("SELECT * FROM items ORDER BY id", batch_size=100))
+        self.assertEqual([len(batch) for batch in batches], [100, 100, 50])
+        self.assertEqual(batches[2][-1], {"id": 249, "name": "item-249"})
+
+
+class CacheInvalidationTest(SQLiteTestCase):
+    """Tests that writes drop cached results of every table the query read."""
+
+    def populate(self, connection) -> None:
+        connection.execute(text("CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT)"))
+        connection.execute(text("CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER)"))
+        connection.execute(text("INSERT INTO customers VALUES (1, 'ann')"))
+        connection.execute(text("INSERT INTO orders VALUES (10, 1)"))
+
+    def test_read_tables_of_joins(self):
+        """Test that JOIN keywords are not taken for table aliases."""
+        self.assertEqual(read_tables("select * from orders join customers on orders.customer_id = customers.id"),
+                         {"orders", "customers"})
+        self.assertEqual(read_tables("SELECT * FROM orders o LEFT OUTER JOIN customers AS c USING (id)"),
+                         {"orders", "customers"})
+        self.assertEqual(read_tables("select * from orders o, customers c where o.customer_id = c.id"),
+                         {"orders", "customers"})
+        self.assertEqual(read_tables("select * from orders, customers"), {"orders", "customers"})
+
+    def assert_invalidated(self, query):
+        cache = self.database.cache
+        self.database.execute_query(query, use_cache=True)
+        self.assertEqual(cache.stats()["entries"], 1)
+        self.database.execute_query("UPDATE customers SET name = 'bob' WHERE id = 1")
+        self.assertEqual(cache.stats()["entries"], 0, "a write to the second table drops the entry")
+
+    def test_join_invalidated_by_write_to_joined_table(self):
+        """Test that a write to the JOINed table drops the cached result."""
+        self.assert_invalidated("SELECT o.id, c.name FROM orders o JOIN customers c ON c.id = o.customer_id")
+        self.assert_invalidated("select orders.id, name from orders join customers on customers.id = orders.customer_id")
+
+    def test_comma_join_invalidated_by_write_to_second_table(self):
+        """Test that a write to the second table of a comma join drops the cached result."""
+        self.assert_invalidated("SELECT o.id, c.name FROM orders o, customers c WHERE c.id = o.customer_id")
+
+
+if __name__ == "__main__":
+    unittest.main()
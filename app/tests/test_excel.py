@@ -0,0 +1,78 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from app.core.excel import ExcelJobs, WorkbookWriter
+from app.tests.base import batches
+
+
+class FailingWriter(WorkbookWriter):
+    """Writer whose save fails after part of the file is on disk."""
+
+    def close(self):
+        with open(self.path, "wb") as f:
+            f.write(b"PK\x03\x04partial")
+        raise OSError("No space left on device")
+
+
+class ExcelJobTest(unittest.TestCase):
+    """Tests for ExcelJob failure handling."""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.jobs = ExcelJobs(self.directory.name, ttl=60)
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_completed(self):
+        """Test that a job writes every row and ends completed."""
+        _, job = self.jobs.create("SELECT 1")
+        asyncio.run(job.run(WorkbookWriter(job.path), batches([{"id": 1}, {"id": 2}], [{"id": 3}])))
+        self.assertEqual((job.state, job.rows, job.sheets), ("completed", 3, 1))
+        self.assertTrue(os.path.exists(job.path))
+
+    def test_writer_failure_marks_failed_and_removes_file(self):
+        """Test that a failing save marks the job failed and deletes the partial file."""
+        _, job = self.jobs.create("SELECT 1")
+        asyncio.run(job.run(FailingWriter(job.path), batches([{"id": 1}])))
+        self.assertEqual(job.state, "failed")
+        self.assertEqual(job.error, "No space left on device")
+        self.assertFalse(os.path.exists(job.path))
+
+    def test_query_failure_marks_failed(self):
+        """Test that an error from the row stream marks the job failed."""
+        _, job = self.jobs.create("SELECT 1")
+        asyncio.run(job.run(WorkbookWriter(job.path), batches([{"id": 1}], RuntimeError("statement timeout"))))
+        self.assertEqual((job.state, job.error), ("failed", "statement timeout"))
+
+    def test_failure_removes_sheet_temp_files(self):
+        """Test that a failed job removes the temp files its sheets streamed to."""
+        _, job = self.jobs.create("SELECT 1")
+        writer = WorkbookWriter(job.path, max_rows=2)
+        asyncio.run(job.run(writer, batches([{"id": 1}, {"id": 2}], RuntimeError("statement timeout"))))
+        sheets = writer._workbook.worksheets
+        self.assertEqual(len(sheets), 2)
+        self.assertFalse(any(os.path.exists(sheet._writer.out) for sheet in sheets))
+
+    def test_cancelled_marks_failed(self):
+        """Test that a cancelled job does not stay running."""
+        _, job = self.jobs.create("SELECT 1")
+
+        async def run():
+            async def endless():
+                while True:
+                    yield [{"id": 1}]
+                    await asyncio.sleep(0.01)
+            task = asyncio.create_task(job.run(WorkbookWriter(job.path), endless()))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(run())
+        self.assertEqual(job.state, "failed")
+        self.assertFalse(os.path.exists(job.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
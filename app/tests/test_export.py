@@ -0,0 +1,45 @@
+import io
+import unittest
+from unittest import mock
+import pyarrow.parquet as pq
+from sqlalchemy import text
+from app.core.config import settings
+from app.tests.base import SQLiteTestCase
+
+
+class ExportQueryTest(SQLiteTestCase):
+    """Tests for Database.export_query on SQLite, where rows go through stream_query."""
+
+    def populate(self, connection) -> None:
+        connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+        connection.execute(text("INSERT INTO items (id, name) VALUES (:id, :name)"),
+                           [{"id": i, "name": f"item-{i}"} for i in range(300)])
+
+    def export(self, export_format) -> bytes:
+        output = io.BytesIO()
+        self.database.export_query("SELECT * FROM items ORDER BY id", export_format=export_format, output=output)
+        return output.getvalue()
+
+    def test_parquet_one_row_group_per_batch(self):
+        """Test that a result smaller than EXPORT_ROW_GROUP_ROWS is a single row group."""
+        parquet = pq.ParquetFile(io.BytesIO(self.export("parquet")))
+        self.assertEqual(parquet.metadata.num_row_groups, 1)
+        self.assertEqual(parquet.metadata.num_rows, 300)
+
+    def test_parquet_row_groups_of_configured_size(self):
+        """Test that row groups hold EXPORT_ROW_GROUP_ROWS rows each."""
+        with mock.patch.object(settings, "EXPORT_ROW_GROUP_ROWS", 128):
+            parquet = pq.ParquetFile(io.BytesIO(self.export("parquet")))
+        sizes = [parquet.metadata.row_group(i).num_rows for i in range(parquet.metadata.num_row_groups)]
+        self.assertEqual(sizes, [128, 128, 44])
+
+    def test_csv(self):
+        """Test that CSV has one header line and every row."""
+        lines = self.export("csv").decode().splitlines()
+        self.assertEqual(lines[0], "id,name")
+        self.assertEqual(len(lines), 301)
+        self.assertEqual(lines[-1], "299,item-299")
+
+
+if __name__ == "__main__":
+    unittest.main()
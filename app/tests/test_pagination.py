@@ -0,0 +1,145 @@
+import sqlite3
+import unittest
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from uuid import UUID
+from app.core.pagination import CursorRegistry, HeldCursor, KeysetPlan, decode_params, decode_token, encode_token
+
+
+class DecodeParamsTest(unittest.TestCase):
+    """Tests for decode_params, which restores typed query parameters."""
+
+    def test_typed_values(self):
+        """Test that typed values become native Python values and others pass through."""
+        params = decode_params({
+            "since": {"type": "date", "value": "2024-01-01"},
+            "at"   : {"type": "datetime", "value": "2024-01-01T12:30:00+00:00"},
+            "total": {"type": "decimal", "value": "10.50"},
+            "ref"  : {"type": "uuid", "value": "12345678-1234-5678-1234-567812345678"},
+            "none" : {"type": "date", "value": None},
+            "id"   : 42,
+            "doc"  : {"type": "date"},
+        })
+        self.assertEqual(params["since"], date(2024, 1, 1))
+        self.assertEqual(params["at"], datetime.fromisoformat("2024-01-01T12:30:00+00:00"))
+        self.assertEqual(params["total"], Decimal("10.50"))
+        self.assertEqual(params["ref"], UUID("12345678-1234-5678-1234-567812345678"))
+        self.assertIsNone(params["none"])
+        self.assertEqual((params["id"], params["doc"]), (42, {"type": "date"}))
+        self.assertIsNone(decode_params(None))
+
+    def test_invalid(self):
+        """Test that unknown types and unreadable values raise ValueError."""
+        with self.assertRaises(ValueError):
+            decode_params({"since": {"type": "timestamp", "value": "2024-01-01"}})
+        with self.assertRaises(ValueError):
+            decode_params({"since": {"type": "date", "value": "yesterday"}})
+        with self.assertRaises(ValueError):
+            decode_params({"total": {"type": "decimal", "value": "ten"}})
+
+
+class KeysetPlanTest(unittest.TestCase):
+    """Tests for the SQL and page boundaries of keyset plans."""
+
+    def setUp(self) -> None:
+        self.connection = sqlite3.connect(":memory:")
+        self.connection.execute("CREATE TABLE t (id INTEGER, grp INTEGER)")
+        self.connection.executemany("INSERT INTO t VALUES (?, ?)",
+                                    [(1, 1), (2, 1), (3, 2), (4, None), (5, 3), (6, None)])
+
+    def tearDown(self) -> None:
+        self.connection.close()
+
+    def ids_after(self, plan, after):
+        sql, params = plan.statement(after)
+        return {row[0] for row in self.connection.execute(sql, params)}
+
+    def test_first_page(self):
+        """Test that the first page only wraps, orders and limits the statement."""
+        plan = KeysetPlan("SELECT * FROM t -- all", ["grp", "id"], False)
+        self.assertEqual(plan.statement(limit=3),
+                         ('SELECT * FROM (SELECT * FROM t -- all\n) AS _page ORDER BY grp, id LIMIT 3', {}))
+
+    def test_ascending_keeps_nulls_after_the_key(self):
+        """Test that ascending pages use IS NOT TRUE, so NULLs (sorted last) still follow the key."""
+        plan = KeysetPlan("SELECT * FROM t", ["grp", "id"], False)
+        sql, params = plan.statement((1, 2), limit=10)
+        self.assertIn('WHERE ((grp, id) <= (:_page_after_0, :_page_after_1)) IS NOT TRUE', sql)
+        self.assertEqual(params, {"_page_after_0": 1, "_page_after_1": 2})
+        self.assertEqual(self.ids_after(plan, (1, 2)), {3, 4, 5, 6})
+        self.assertEqual(self.ids_after(plan, (3, 5)), {4, 6})
+
+    def test_descending_skips_nulls(self):
+        """Test that descending pages use <, so NULLs (sorted first) are not returned again."""
+        plan = KeysetPlan("SELECT * FROM t", ["grp", "id"], True)
+        sql, _ = plan.statement((2, 3))
+        self.assertIn('WHERE (grp, id) < (:_page_after_0, :_page_after_1) ORDER BY grp DESC, id DESC', sql)
+        self.assertEqual(self.ids_after(plan, (2, 3)), {1, 2})
+
+    def test_cut(self):
+        """Test that a page only ends between rows with different, non-NULL keys."""
+        plan = KeysetPlan("SELECT * FROM t", ["grp"], False)
+        columns = ["id", "grp"]
+        self.assertEqual(plan.cut(columns, [(1, 1), (2, 2)], 2), 2)
+        self.assertEqual(plan.cut(columns, [(1, 1), (2, 2), (3, 2), (4, 2)], 3), 1)
+        self.assertEqual(plan.cut(columns, [(1, 1), (2, 2), (3, 3)], 2), 2)
+        self.assertEqual(plan.cut(columns, [(1, 2), (2, 2), (3, 2)], 2), 0)
+        self.assertEqual(plan.cut(columns, [(1, None), (2, None), (3, 1)], 2), 0)
+
+
+class PageTokenTest(unittest.TestCase):
+    """Tests for continuation tokens."""
+
+    def test_round_trip(self):
+        """Test that keys come back with their Python types."""
+        after = (7, "ann", Decimal("1.50"), date(2024, 1, 1), datetime(2024, 1, 1, 12, tzinfo=timezone.utc),
+                 UUID("12345678-1234-5678-1234-567812345678"), b"\x00\xff")
+        self.assertEqual(decode_token(encode_token("a" * 64, after=after), "a" * 64),
+                         {"v": 1, "q": "a" * 16, "after": after})
+        self.assertEqual(decode_token(encode_token("a" * 64, cursor="c1"), "a" * 64)["cursor"], "c1")
+
+    def test_rejects_other_query(self):
+        """Test that a token of another statement or parameters is rejected."""
+        token = encode_token("a" * 64, after=(1,))
+        with self.assertRaisesRegex(ValueError, "does not belong"):
+            decode_token(token, "b" * 64)
+
+    def test_rejects_malformed(self):
+        """Test that garbage is an invalid token."""
+        for token in ("not-a-token", encode_token("a" * 64)[:-3], "e30"):
+            with self.assertRaisesRegex(ValueError, "Invalid page token"):
+                decode_token(token, "a" * 64)
+
+
+class CursorRegistryTest(unittest.TestCase):
+    """Tests for CursorRegistry.sweep."""
+
+    def setUp(self) -> None:
+        self.registry = CursorRegistry(max_cursors=3, ttl=60)
+        self.cursors = [HeldCursor(None, None, []) for _ in range(3)]
+        self.ids = [self.registry.put(cursor) for cursor in self.cursors]
+        for i, cursor in enumerate(self.cursors):
+            cursor.expires += i
+
+    def test_expired_first(self):
+        """Test that expired cursors are removed even with free slots."""
+        self.cursors[1].expires = 0
+        self.assertEqual(self.registry.sweep(), [self.cursors[1]])
+        self.assertEqual(len(self.registry), 2)
+
+    def test_reserve_evicts_oldest(self):
+        """Test that reserving slots evicts the cursors closest to expiry."""
+        self.assertEqual(self.registry.sweep(), [])
+        self.assertEqual(self.registry.sweep(reserve=2), self.cursors[:2])
+        self.assertIsNone(self.registry.take(self.ids[0]))
+        self.assertIs(self.registry.take(self.ids[2]), self.cursors[2])
+
+    def test_reserve_counts_expired(self):
+        """Test that expired cursors count towards the reserved slots."""
+        self.cursors[2].expires = 0
+        self.assertEqual(self.registry.sweep(reserve=1), [self.cursors[2]])
+        self.assertEqual(len(self.registry), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from app.core.schema_text import render_table
+
+CUSTOMERS = {
+    "comment"     : "People who placed\nat least one order",
+    "columns"     : [
+        {"name": "id", "type": "INTEGER", "nullable": False, "default": "None", "comment": None},
+        {"name": "email", "type": "TEXT", "nullable": True, "default": "None", "comment": "Billing */ address"},
+    ],
+    "primary_keys": ["id"],
+    "foreign_keys": [],
+}
+
+
+class RenderTableTest(unittest.TestCase):
+    """Tests for render_table detail levels."""
+
+    def test_full_level_renders_comments(self):
+        """Test that table and column comments are rendered inline at the full level."""
+        self.assertEqual(
+            render_table("customers", CUSTOMERS, "full"),
+            "CREATE TABLE customers /* People who placed at least one order */ "
+            "(id INTEGER NOT NULL, email TEXT /* Billing * / address */, PRIMARY KEY (id));")
+
+    def test_compact_level_drops_comments(self):
+        """Test that comments are dropped below the full level."""
+        self.assertEqual(render_table("customers", CUSTOMERS, "compact"),
+                         "CREATE TABLE customers (id INTEGER NOT NULL, email TEXT, PRIMARY KEY (id));")
+
+
+if __name__ == "__main__":
+    unittest.main()
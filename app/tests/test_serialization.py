@@ -0,0 +1,35 @@
+import asyncio
+import json
+import unittest
+from app.core.serialization import encode_json_columnar
+from app.tests.base import batches
+
+
+def encode(*items) -> dict:
+    async def collect():
+        return b"".join([chunk async for chunk in encode_json_columnar(batches(*items))])
+    return json.loads(asyncio.run(collect()))
+
+
+class EncodeJsonColumnarTest(unittest.TestCase):
+    """Tests for the streamed columnar JSON body."""
+
+    def test_batches_form_one_columnar_result(self):
+        """Test that batches are joined into a single {"columns", "types", "rows"} object."""
+        body = encode([{"id": 1, "name": "a"}, {"id": 2, "name": None}], [], [{"id": 3, "name": "c"}])
+        self.assertEqual(body, {"columns": ["id", "name"], "types": ["integer", "string"],
+                                "rows": [[1, "a"], [2, None], [3, "c"]]})
+
+    def test_empty_result(self):
+        """Test that no rows give an empty columnar result."""
+        self.assertEqual(encode(), {"columns": [], "types": [], "rows": []})
+
+    def test_error_after_first_batch(self):
+        """Test that a failure mid-stream still closes the object, with an error key."""
+        body = encode([{"id": 1}], RuntimeError("canceling statement due to statement timeout"))
+        self.assertEqual(body["rows"], [[1]])
+        self.assertEqual(body["error"], "canceling statement due to statement timeout")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from app.core.pagination import KeysetPlan
+from app.core.sql import split_order_by
+
+
+class SplitOrderByTest(unittest.TestCase):
+    """Tests for split_order_by, which decides whether a query is keyset-paged."""
+
+    def test_plain_columns(self):
+        """Test that bare output-column names are split off."""
+        self.assertEqual(split_order_by("SELECT id, name FROM customers ORDER BY name, id"),
+                         ("SELECT id, name FROM customers", ["name", "id"], False))
+        self.assertEqual(split_order_by('SELECT * FROM t ORDER BY "Created" DESC'),
+                         ("SELECT * FROM t", ["Created"], True))
+
+    def test_qualified_column(self):
+        """Test that a qualified ORDER BY item falls back to the cursor path."""
+        query = "SELECT p.id, c.name FROM customers c JOIN orders p ON p.customer_id = c.id ORDER BY c.id"
+        self.assertIsNone(split_order_by(query))
+        self.assertIsNone(KeysetPlan.for_query(query))
+        self.assertIsNone(split_order_by('SELECT * FROM t ORDER BY name, "t"."id"'))
+
+    def test_not_keyset_able(self):
+        """Test that expressions, mixed directions and trailing LIMIT are left alone."""
+        self.assertIsNone(split_order_by("SELECT * FROM t ORDER BY lower(name)"))
+        self.assertIsNone(split_order_by("SELECT * FROM t ORDER BY a ASC, b DESC"))
+        self.assertIsNone(split_order_by("SELECT * FROM t ORDER BY id LIMIT 10"))
+        self.assertIsNone(split_order_by("SELECT * FROM t"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,288 @@
+"""
+Database layer benchmark on a generated schema
+
+    python -m benchmarks.database --tables 500 --rows 200
+    python -m benchmarks.database --url postgresql://postgres@localhost/bench --tables 5000 --rows 50
+
+Creates --tables tables named bench_t0000, bench_t0001, ... in the target
+database, each with a foreign key to the previous table, two secondary
+indexes and --rows generated rows. It then measures:
+
+- reflection: a cold snapshot, a revalidation with nothing changed, and
+  one after a single table changed (see AsyncSchemaManager.refresh)
+- get_schema_as_string: full and token-budgeted rendering, cold and memoized
+- sample latency: GET /api/sample on distinct tables, one at a time
+- query throughput and latency percentiles: a mix of point lookups, joins
+  and aggregates through POST /api/query at --concurrency
+
+The API runs in-process through httpx's ASGI transport, so no server or
+network is involved. Without --url a temporary SQLite file is used; a
+Postgres URL should point at a scratch database, since the bench_ tables
+are dropped and recreated (and dropped again unless --keep). Results are
+printed as JSON and written to --output for comparison between runs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+TABLE_PREFIX = "bench_t"
+STATUSES = ("new", "paid", "shipped", "void")
+
+def table_name(index):
+    return f"{TABLE_PREFIX}{index:04d}"
+
+def row_source(dialect, rows):
+    """FROM clause yielding n = 1..rows"""
+    if dialect == "postgresql":
+        return f"generate_series(1, {rows}) AS seq(n)"
+    return f"(WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < {rows}) SELECT n FROM seq)"
+
+def create_statements(dialect, index, rows):
+    """DDL and data for one generated table; each table refers to the one before it"""
+    name = table_name(index)
+    timestamp = "TIMESTAMP" if dialect == "postgresql" else "DATETIME"
+    parent = f" REFERENCES {table_name(index - 1)}(id)" if index else ""
+    created = ("TIMESTAMP '2024-01-01' + n * INTERVAL '1 minute'" if dialect == "postgresql"
+               else "datetime('2024-01-01', '+' || n || ' minutes')")
+    statuses = ", ".join(f"'{status}'" for status in STATUSES)
+    status = (f"(ARRAY[{statuses}])[1 + n % {len(STATUSES)}]" if dialect == "postgresql"
+              else f"CASE n % {len(STATUSES)} " + " ".join(f"WHEN {i} THEN '{s}'" for i, s in enumerate(STATUSES)) + " END")
+    return [
+        f"""CREATE TABLE {name} (
+                id INTEGER PRIMARY KEY,
+                parent_id INTEGER{parent},
+                code VARCHAR(32) NOT NULL,
+                status VARCHAR(16) NOT NULL,
+                amount NUMERIC(12, 2),
+                quantity INTEGER DEFAULT 0,
+                active BOOLEAN DEFAULT TRUE,
+                created_at {timestamp}
+            )""",
+        f"CREATE INDEX ix_{name}_parent ON {name} (parent_id)",
+        f"CREATE INDEX ix_{name}_status_created ON {name} (status, created_at)",
+        f"""INSERT INTO {name} (id, parent_id, code, status, amount, quantity, active, created_at)
+            SELECT n, {"n" if index else "NULL"}, 'C' || n, {status}, (n % 10000) / 100.0, n % 7, n % 2 = 0, {created}
+              FROM {row_source(dialect, rows)}""",
+    ]
+
+def drop_tables(engine):
+    from sqlalchemy import inspect, text
+    tables = [name for name in inspect(engine).get_table_names() if name.startswith(TABLE_PREFIX)]
+    cascade = " CASCADE" if engine.dialect.name == "postgresql" else ""
+    # Children first, so SQLite's foreign keys never dangle. One transaction
+    # per table: thousands of tables in one would run out of lock slots.
+    for name in sorted(tables, reverse=True):
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP TABLE IF EXISTS {name}{cascade}"))
+    return len(tables)
+
+def generate(engine, tables, rows):
+    """Create the bench tables; returns seconds taken"""
+    from sqlalchemy import text
+    started = time.perf_counter()
+    drop_tables(engine)
+    for index in range(tables):
+        with engine.begin() as connection:
+            for statement in create_statements(engine.dialect.name, index, rows):
+                connection.execute(text(statement))
+            if engine.dialect.name == "postgresql":
+                connection.execute(text(f"ANALYZE {table_name(index)}"))
+    return time.perf_counter() - started
+
+def percentiles(samples):
+    """Latency summary in milliseconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def at(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 3)
+
+    return {
+        "count"  : len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms" : at(0.50),
+        "p95_ms" : at(0.95),
+        "p99_ms" : at(0.99),
+        "max_ms" : round(ordered[-1] * 1000, 3),
+    }
+
+def timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+async def timed_async(coroutine):
+    started = time.perf_counter()
+    result = await coroutine
+    return result, time.perf_counter() - started
+
+async def bench_reflection(database, engine, changed_table):
+    """Cold reflection, no-op revalidation and revalidation after one ALTER TABLE"""
+    from sqlalchemy import text
+    from app.core.database import AsyncSchemaManager
+    manager = AsyncSchemaManager(database, snapshot_path="")
+    snapshot, cold = await timed_async(manager.refresh())
+    _, unchanged = await timed_async(manager.refresh())
+    with engine.begin() as connection:
+        connection.execute(text(f"ALTER TABLE {changed_table} ADD COLUMN bench_note VARCHAR(20)"))
+    after, one_changed = await timed_async(manager.refresh())
+    return {
+        "tables"         : len(snapshot.tables),
+        "cold_s"         : round(cold, 4),
+        "unchanged_s"    : round(unchanged, 4),
+        "one_changed_s"  : round(one_changed, 4),
+        "version_changed": after.version != snapshot.version,
+    }, after
+
+def bench_schema_text(snapshot, max_tokens):
+    from app.core.schema_text import SchemaRenderer
+    renderer = SchemaRenderer()
+    text, cold = timed(renderer.render, snapshot)
+    _, warm = timed(renderer.render, snapshot)
+    budgeted, budget_time = timed(SchemaRenderer().render, snapshot, max_tokens=max_tokens)
+    return {
+        "chars"        : len(text),
+        "cold_s"       : round(cold, 4),
+        "memoized_s"   : round(warm, 4),
+        "budget_tokens": max_tokens,
+        "budget_chars" : len(budgeted),
+        "budget_cold_s": round(budget_time, 4),
+    }
+
+async def bench_samples(client, tables, count, rng):
+    latencies, errors = [], 0
+    for name in rng.sample(tables, min(count, len(tables))):
+        started = time.perf_counter()
+        response = await client.get(f"/api/sample/{name}", params={"limit": 5})
+        latencies.append(time.perf_counter() - started)
+        errors += response.status_code != 200 or "error" in response.json()
+    return {**percentiles(latencies), "errors": errors}
+
+def query_mix(tables, rows, rng):
+    """Endless statements: point lookups, joins with their parent table, aggregates"""
+    while True:
+        index = rng.randrange(len(tables))
+        name = tables[index]
+        kind = rng.random()
+        if kind < 0.5:
+            yield "point", f"SELECT * FROM {name} WHERE id = {rng.randint(1, rows)}"
+        elif kind < 0.8 and index:
+            yield "join", (f"SELECT c.id, c.status, p.code AS parent_code FROM {name} c "
+                           f"JOIN {tables[index - 1]} p ON p.id = c.parent_id "
+                           f"WHERE c.status = '{rng.choice(STATUSES)}' ORDER BY c.id LIMIT 50")
+        else:
+            yield "aggregate", f"SELECT status, count(*) AS n, sum(amount) AS total FROM {name} GROUP BY status"
+
+async def bench_queries(client, tables, rows, requests, concurrency, rng):
+    statements = query_mix(tables, rows, rng)
+    latencies = {"point": [], "join": [], "aggregate": []}
+    errors = {}
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            kind, query = next(statements)
+            started = time.perf_counter()
+            response = await client.post("/api/query", json={"query": query})
+            elapsed = time.perf_counter() - started
+            body = response.json()
+            if response.status_code != 200 or "error" in body:
+                errors[kind] = errors.get(kind, 0) + 1
+            latencies[kind].append(elapsed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    everything = [sample for samples in latencies.values() for sample in samples]
+    return {
+        "requests"      : requests,
+        "concurrency"   : concurrency,
+        "elapsed_s"     : round(elapsed, 4),
+        "throughput_rps": round(requests / elapsed, 1),
+        "latency"       : percentiles(everything),
+        "by_kind"       : {kind: percentiles(samples) for kind, samples in latencies.items()},
+        "errors"        : errors,
+    }
+
+async def run(args):
+    import httpx
+    from sqlalchemy import create_engine
+    from sqlalchemy.engine import make_url
+    from app.core.config import settings
+    from app.core.database import async_db, async_schema_manager
+    from app.main import app
+
+    engine = create_engine(settings.DATABASE_URL)
+    rng = random.Random(args.seed)
+    tables = [table_name(index) for index in range(args.tables)]
+    report = {
+        "benchmark" : "database",
+        "database"  : make_url(settings.DATABASE_URL).get_backend_name(),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("url", "output")},
+        "python"    : sys.version.split()[0],
+        "platform"  : platform.platform(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+    try:
+        report["generate_s"] = round(generate(engine, args.tables, args.rows), 3)
+        report["reflection"], snapshot = await bench_reflection(async_db, engine, tables[len(tables) // 2])
+        report["schema_text"] = bench_schema_text(snapshot, args.max_tokens)
+
+        # The app's own manager, as the lifespan warm-up would leave it
+        await async_schema_manager.refresh()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            report["sample"] = await bench_samples(client, tables, args.samples, rng)
+            report["query"] = await bench_queries(client, tables, args.rows, args.requests, args.concurrency, rng)
+        report["pool"] = async_db.pool_stats()
+    finally:
+        await async_db.close_cursors()
+        await async_db.dispose()
+        if not args.keep:
+            drop_tables(engine)
+        engine.dispose()
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="SQLAlchemy URL of a scratch database (default: temporary SQLite file)")
+    parser.add_argument("--tables", type=int, default=100, help="generated tables (10 to 5000)")
+    parser.add_argument("--rows", type=int, default=1000, help="rows per table")
+    parser.add_argument("--samples", type=int, default=50, help="sample requests, one table each")
+    parser.add_argument("--requests", type=int, default=1000, help="query requests in the throughput run")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent query requests")
+    parser.add_argument("--max-tokens", type=int, default=4000, help="budget of the budgeted schema text")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="keep the generated tables afterwards")
+    parser.add_argument("--output", help="also write the result JSON to this file")
+    args = parser.parse_args()
+    if not 10 <= args.tables <= 5000:
+        parser.error("--tables must be between 10 and 5000")
+
+    scratch = None
+    if args.url is None:
+        scratch = tempfile.NamedTemporaryFile(prefix="bench-", suffix=".db", delete=False).name
+    # Settings are read when the app modules are imported, so configure them first
+    os.environ["DATABASE_URL"] = args.url or f"sqlite:///{scratch}"
+    os.environ["SCHEMA_SNAPSHOT_PATH"] = ""
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        if scratch:
+            os.unlink(scratch)
+    output = json.dumps(report, indent=2, default=str)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Serialization benchmark: query result bodies through jsonable_encoder vs ResultResponse
+
+    python -m benchmarks.serialization --rows 1000000
+
+Builds an in-memory result shaped like a typical table (integers, NUMERICs,
+text, timestamps, dates, UUIDs, booleans and NULLs) and renders the
+/api/query body both ways, as FastAPI did before (jsonable_encoder, then
+JSONResponse) and through ResultResponse, in the rows and columnar
+formats. Both bodies are checked to decode to the same value. Prints the
+timings as JSON.
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.core.serialization import ResultResponse, orjson, rows_to_columnar
+
+def make_rows(count):
+    """Result rows as the database driver returns them"""
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    statuses = ("new", "paid", "shipped", "void")
+    return [{
+        "id"        : i,
+        "customer"  : f"customer-{i % 5000}",
+        "status"    : statuses[i % 4],
+        "amount"    : Decimal(i % 100000) / 100,
+        "quantity"  : Decimal(i % 7),
+        "created_at": start + timedelta(seconds=i),
+        "ship_date" : date(2024, 1, 1) + timedelta(days=i % 365),
+        "order_uuid": uuid.UUID(int=i),
+        "paid"      : i % 2 == 0,
+        "note"      : None if i % 3 else "gift",
+    } for i in range(count)]
+
+def fastapi_body(content):
+    return JSONResponse(jsonable_encoder(content)).body
+
+def result_body(content):
+    return ResultResponse(content).body
+
+def measure(render, content, repeat):
+    """Best wall time of repeat renders, and the last body"""
+    best = float("inf")
+    body = b""
+    for _ in range(repeat):
+        body = None
+        gc.collect()
+        started = time.perf_counter()
+        body = render(content)
+        best = min(best, time.perf_counter() - started)
+    return best, body
+
+def run(rows, repeat):
+    fixture = make_rows(rows)
+    bodies = {
+        "rows"    : {"result": fixture},
+        "columnar": {"result": rows_to_columnar(fixture)},
+    }
+    results = {}
+    for name, content in bodies.items():
+        baseline, expected = measure(fastapi_body, content, repeat)
+        candidate, actual = measure(result_body, content, repeat)
+        if json.loads(expected) != json.loads(actual):
+            raise AssertionError(f"{name}: ResultResponse body differs from jsonable_encoder")
+        results[name] = {
+            "jsonable_encoder_s" : round(baseline, 3),
+            "result_response_s"  : round(candidate, 3),
+            "speedup"            : round(baseline / candidate, 2),
+            "rows_per_s"         : round(rows / candidate),
+            "body_bytes"         : len(actual),
+        }
+    return {
+        "benchmark": "serialization",
+        "rows"     : rows,
+        "repeat"   : repeat,
+        "orjson"   : orjson.__version__ if orjson is not None else None,
+        "python"   : sys.version.split()[0],
+        "results"  : results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=1, help="renders per path; the best time is kept")
+    parser.add_argument("--output", help="also write the result JSON to this file")
+    args = parser.parse_args()
+    report = json.dumps(run(args.rows, args.repeat), indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+
+if __name__ == "__main__":
+    main()